@@ -1,15 +1,16 @@
 # bibtex_analyzer.py
-from io import BytesIO
 import base64
-import random
+import zlib
 import networkx as nx
-from collections import Counter
 
-from BibtexReader import BibtexReader
-import os
+from CorpusFrame import CorpusFrame
+from CorpusStore import get_store
+from FrequencyIndex import FrequencyIndex
+from GraphEngine import GRAPH_KINDS, LayoutStore, build_graph, compute_layout
+import Metrics
+from TermMatcher import TermMatcher
 import logging
-from wordcloud import WordCloud
-import matplotlib.pyplot as plt
+import Renderer
 
 EQUIVALENCES = {
     "Classical Test Theory": ["Classical Test Theory", "CTT"],
@@ -84,21 +85,67 @@ CATEGORIES = {
     ]
 }
 
+# Formatos de imagen soportados por los métodos *_image
+IMAGE_FORMATS = ('png', 'webp', 'svg')
+
+# Motor de búsqueda compilado una sola vez a partir de la taxonomía
+TERM_MATCHER = TermMatcher(CATEGORIES, EQUIVALENCES)
+
+# Disposiciones de grafos en memoria, usadas si no se indica otro LayoutStore
+DEFAULT_LAYOUTS = LayoutStore()
+
+# Semilla de las disposiciones de los grafos, para que la misma entrada produzca la misma imagen
+GRAPH_SEED = 42
+
 
 class BibtexAnalyzer:
-    def __init__(self):
+    def __init__(self, store=None):
         """
         Inicializa el analizador con las entradas de BibTeX y las equivalencias de variables.
+
+        :param store: Almacén compartido del corpus. Si no se indica, se usa el del
+                      archivo todo_filtrado.bib junto a este módulo.
         """
-        # Asegúrate de que el archivo .bib esté en la ubicación correcta
-        file_path = os.path.join(os.path.dirname(__file__), 'todo_filtrado.bib')
-        self.reader = BibtexReader(file_path)
+        # Las entradas se parsean una sola vez por proceso y se comparten (solo lectura)
+        self.store = store or get_store()
+        self.reader, self.entries, self.corpus_version = self.store.snapshot()
         self.categories = CATEGORIES
         self.equivalences = EQUIVALENCES
+        self.matcher = TERM_MATCHER
         self.frequencyTable = None  # Inicializa como None o un diccionario vacío
-        self.entries = self.reader.load_entries()
         self.graph = nx.Graph()
 
+    @property
+    def frame(self):
+        """
+        Vista columnar del corpus, compartida por todos los analizadores de la misma versión.
+        """
+        return self.store.derived('frame', self.corpus_version, lambda: CorpusFrame(self.entries))
+
+    @property
+    def frequency_index(self):
+        """
+        Conteos de términos por entrada y tabla agregada, mantenidos de forma incremental
+        por el almacén del corpus cuando el archivo .bib crece.
+        """
+        return self.get_frequency_index()
+
+    def get_frequency_index(self, workers=None, chunk_size=None):
+        """
+        Devuelve el índice de frecuencias de esta versión del corpus, construyéndolo
+        (en paralelo si workers > 1) la primera vez. El índice se comparte por versión:
+        workers solo cuenta si esta llamada es la que lo construye.
+
+        :param workers: Procesos para contar los términos al construir el índice
+                        (por defecto, los index_workers del almacén).
+        :param chunk_size: Abstracts por bloque enviado a cada proceso.
+        """
+        workers = workers or self.store.index_workers
+        return self.store.derived(
+            'frequency', self.corpus_version,
+            lambda: FrequencyIndex.build(self.matcher, self.entries, workers, chunk_size),
+        )
+
 ##REQUISITO 2
 
     def plot_graph(self, variable1, variable2):
@@ -107,80 +154,89 @@ class BibtexAnalyzer:
         limitando a los 15 pares más frecuentes y devuelve el gráfico
         como una imagen en formato base64.
         """
-        # Inicializamos las listas de agrupación
-        var1_values = []
-        var2_values = []
-        
-        # Extraemos las variables correspondientes de cada entrada
-        for entry in self.entries:
-            if variable1 in entry and variable2 in entry:
-                var1_values.append(entry[variable1])
-                var2_values.append(entry[variable2])
+        return self._to_base64(self.plot_graph_image(variable1, variable2))
+
+    def plot_graph_image(self, variable1, variable2, fmt='png'):
+        """
+        Igual que plot_graph, pero devuelve los bytes de la imagen sin codificar.
+
+        :param fmt: Formato de la imagen ('png', 'webp' o 'svg').
+        """
+        return self._run_job(self.plot_graph_job(variable1, variable2, fmt))
 
-        # Contamos las ocurrencias de cada par de valores
-        data = Counter(zip(var1_values, var2_values))
+    def plot_graph_job(self, variable1, variable2, fmt='png'):
+        """
+        Prepara los datos del gráfico de pares y devuelve el trabajo de renderizado,
+        para ejecutarlo aquí o enviarlo a un RenderPool.
 
-        # Ordenamos los resultados por cantidad de publicaciones (en orden descendente)
-        top_data = data.most_common(15)
+        :return: Tupla (función, argumentos).
+        """
+        # Contamos los 15 pares de valores más frecuentes sobre la vista columnar
+        # (ordenados por cantidad de publicaciones, en orden descendente)
+        with Metrics.stage('pair_counts'):
+            top_data = self.frame.pair_counts(variable1, variable2, 15)
+        return self._pair_chart_job(variable1, variable2, top_data, fmt)
+
+    @staticmethod
+    def _pair_chart_job(variable1, variable2, top_data, fmt='png'):
+        """
+        Trabajo de renderizado del gráfico de barras de los pares ya contados.
 
+        :param top_data: Lista de tuplas ((valor1, valor2), cantidad), en orden descendente.
+        """
         # Separar los resultados para graficarlos
         labels = [f"{v[0][0]} - {v[0][1]}" for v in top_data]
         counts = [v[1] for v in top_data]
-        
-        # Crear el gráfico
-        plt.figure(figsize=(10, 6))
-        plt.barh(labels, counts, color='skyblue')
-        plt.title(f'Publicaciones por {variable1} y {variable2}')
-        plt.xlabel('Cantidad de Publicaciones')
-        plt.ylabel(f'{variable1} - {variable2}')
-        plt.tight_layout()
-
-        # Convertir la imagen del gráfico a base64
-        img_buffer = BytesIO()
-        plt.savefig(img_buffer, format='PNG')  # Guarda la imagen en el buffer de memoria
-        plt.close()  # Cerrar la figura para liberar memoria
-        img_buffer.seek(0)
-        
-        # Convertir el contenido del buffer en base64
-        img_base64 = base64.b64encode(img_buffer.getvalue()).decode('utf-8')
 
-        return img_base64
+        return Renderer.render_bar_chart, (
+            labels, counts, f'Publicaciones por {variable1} y {variable2}',
+            'Cantidad de Publicaciones', f'{variable1} - {variable2}', fmt,
+        )
+
+    @staticmethod
+    def _run_job(job):
+        """
+        Ejecuta un trabajo de renderizado en el hilo actual.
+
+        :param job: Tupla (función, argumentos).
+        :return: Bytes de la imagen.
+        """
+        function, args = job
+        return function(*args)
+
+    @staticmethod
+    def _to_base64(data):
+        """
+        Convierte los bytes de una imagen a una cadena base64.
+        """
+        with Metrics.stage('base64_encode'):
+            encoded = base64.b64encode(data).decode('utf-8')
+        Metrics.record_size('base64_encode', len(encoded))
+        return encoded
+
+    def cross_tab(self, variable1, variable2, limit=None):
+        """
+        Tabla cruzada dispersa de dos campos, para que el frontend la grafique.
+
+        :param limit: Número máximo de pares (None para todos).
+        :return: Lista de diccionarios {'variable1', 'variable2', 'count'}.
+        """
+        return self.frame.crosstab(variable1, variable2, limit)
 
 ##REQUISITO 3
-    def analyze_frequency(self):
+    @Metrics.stage('analyze_frequency')
+    def analyze_frequency(self, workers=None, chunk_size=None):
         """
         Analiza la frecuencia de aparición de las variables en los abstracts.
+        :param workers: Procesos para el conteo inicial (None o 1 para el modo serial).
+        :param chunk_size: Abstracts por bloque en el modo paralelo.
         :return: Diccionario con la frecuencia de las variables por categoría.
         """
         logging.debug("Iniciando la ejecución de analyze_frequency...")
-        
-        frequency_data = {}
-
-        # Inicializa el diccionario por cada categoría
-        for category in self.categories:
-            frequency_data[category] = {}
-
-        # Procesar los abstracts
-        for entry in self.entries:
-            abstract = entry.get('abstract', '').lower()  # Convertir el abstract a minúsculas
-
-            for category, variables in self.categories.items():
-                for variable in variables:
-                    # Unificar las equivalencias
-                    for eq in self.equivalences.get(variable, [variable]):
-                        eq_lower = eq.lower()
-
-                        # Si la variable contiene un guion, dividir en ambas partes y contar cada una
-                        if "-" in eq_lower:
-                            part1, part2 = map(str.strip, eq_lower.split("-", 1))
-                            count = abstract.count(part1) + abstract.count(part2)
-                        else:
-                            count = abstract.count(eq_lower)
-
-                        # Agregar el conteo al diccionario de frecuencias
-                        if eq_lower not in frequency_data[category]:
-                            frequency_data[category][eq_lower] = 0
-                        frequency_data[category][eq_lower] += count
+
+        # La tabla se mantiene por entrada en el índice de frecuencias: solo se procesan
+        # los abstracts que aún no se habían contado para esta versión del corpus
+        frequency_data = self.get_frequency_index(workers, chunk_size).table()
 
         logging.debug("Finalizando analyze_frequency...")
         self.frequencyTable = frequency_data  # Actualiza el atributo de instancia
@@ -192,21 +248,29 @@ class BibtexAnalyzer:
         """
         Genera y devuelve una nube de palabras en formato base64.
         """
+        return self._to_base64(self.plot_word_cloud_image())
+
+    def plot_word_cloud_image(self, fmt='png'):
+        """
+        Igual que plot_word_cloud, pero devuelve los bytes de la imagen sin codificar.
+
+        :param fmt: Formato de la imagen ('png', 'webp' o 'svg').
+        """
+        return self._run_job(self.plot_word_cloud_job(fmt))
+
+    def plot_word_cloud_job(self, fmt='png'):
+        """
+        Prepara las frecuencias combinadas y devuelve el trabajo de renderizado de la nube.
+
+        :return: Tupla (función, argumentos).
+        """
         # Combinar todas las frecuencias en un solo diccionario
         combined_frequencies = {}
         for category, words in self.frequencyTable.items():
             for word, freq in words.items():
                 combined_frequencies[word] = combined_frequencies.get(word, 0) + freq
 
-        # Generar la nube de palabras
-        wordcloud = WordCloud(width=800, height=400, background_color="white").generate_from_frequencies(combined_frequencies)
-
-        # Convertir la imagen de la nube de palabras a base64
-        img_buffer = BytesIO()
-        wordcloud.to_image().save(img_buffer, format="PNG")
-        img_base64 = base64.b64encode(img_buffer.getvalue()).decode('utf-8')
-        
-        return img_base64
+        return Renderer.render_word_cloud, (combined_frequencies, fmt)
 
 ##REQUISITO 5
     def get_top_10_journals(self):
@@ -216,21 +280,17 @@ class BibtexAnalyzer:
         
         :return: Lista de los 10 journals con más artículos publicados.
         """
-        journal_counts = {}
-
-        for entry in self.entries:
-            journal_name = entry.get('journal') or entry.get('issn')
-            if journal_name:
-                journal_counts[journal_name] = journal_counts.get(journal_name, 0) + 1
-
-        self.top_10_journals = sorted(journal_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+        # Columna combinada journal/ISSN contada de forma vectorizada
+        with Metrics.stage('top_journals'):
+            self.top_10_journals = self.frame.top_values(('journal', 'issn'), 10)
         
         return self.top_10_journals
 
     def get_top_articles_with_random_country(self):
         """
         Para cada uno de los 10 journals principales, selecciona los primeros 5 artículos
-        y asigna un país aleatorio a cada uno.
+        y asigna un país a cada uno. El país se elige a partir del ID del artículo, de
+        modo que el mismo artículo recibe siempre el mismo país y el grafo se puede cachear.
         
         :return: Diccionario con los journals y una lista de los 5 artículos con país asignado.
         """
@@ -252,13 +312,13 @@ class BibtexAnalyzer:
 
         for journal in self.top_10_journals:
             journal_id = journal[0]
-            articles = [entry for entry in self.entries if entry.get('journal') == journal_id or entry.get('issn') == journal_id]
-            selected_articles = articles[:5]
+            # Consulta indexada por journal/ISSN en lugar de recorrer todas las entradas
+            selected_articles = self.reader.get_entries_by_fields(['journal', 'issn'], journal_id, limit=5)
 
             articles_with_countries = [
                 {
                     'title': article.get('title', 'No title'),
-                    'country': random.choice(countries)
+                    'country': countries[self._article_hash(article) % len(countries)]
                 }
                 for article in selected_articles
             ]
@@ -267,6 +327,14 @@ class BibtexAnalyzer:
 
         return journal_articles
 
+    @staticmethod
+    def _article_hash(article):
+        """
+        Hash estable (igual en todos los procesos, a diferencia de hash()) del ID del artículo.
+        """
+        return zlib.crc32(str(article.get('ID', article.get('title', ''))).encode('utf-8'))
+
+    @Metrics.stage('create_graph')
     def create_graph(self):
         """
         Crea el grafo que relaciona journals, artículos y países.
@@ -292,24 +360,183 @@ class BibtexAnalyzer:
         """
         Genera y devuelve el grafo en formato base64.
         """
-        pos = nx.spring_layout(self.graph, k=1, iterations=50)
-        journals = [node for node, attr in self.graph.nodes(data=True) if attr["type"] == "journal"]
-        articles = [node for node, attr in self.graph.nodes(data=True) if attr["type"] == "article"]
-        countries = [node for node, attr in self.graph.nodes(data=True) if attr["type"] == "country"]
-
-        # Crear la figura del grafo
-        plt.figure(figsize=(25, 25))
-        nx.draw_networkx_nodes(self.graph, pos, nodelist=journals, node_color="lightcoral", node_size=2000, label="Journals")
-        nx.draw_networkx_nodes(self.graph, pos, nodelist=articles, node_color="skyblue", node_size=1500, label="Articles")
-        nx.draw_networkx_nodes(self.graph, pos, nodelist=countries, node_color="lightgreen", node_size=1000, label="Countries")
-        nx.draw_networkx_edges(self.graph, pos, edge_color="gray", alpha=0.5)
-        nx.draw_networkx_labels(self.graph, pos, font_size=5, font_weight="bold")
-
-        # Convertir la figura del grafo a base64 en lugar de guardarla en el disco
-        img_buffer = BytesIO()
-        plt.savefig(img_buffer, format='PNG')  # Guarda la imagen en el buffer de memoria
-        plt.close()  # Cerrar la figura para liberar memoria
-        img_buffer.seek(0)
-        img_base64 = base64.b64encode(img_buffer.getvalue()).decode('utf-8')
-
-        return img_base64
+        return self._to_base64(self.generate_graph_image())
+
+    def generate_graph_image(self, fmt='png'):
+        """
+        Igual que generate_graph, pero devuelve los bytes de la imagen sin codificar.
+
+        :param fmt: Formato de la imagen ('png', 'webp' o 'svg').
+        """
+        return self._run_job(self.generate_graph_job(fmt))
+
+    def generate_graph_job(self, fmt='png'):
+        """
+        Devuelve el trabajo de renderizado del grafo creado con create_graph. La
+        disposición (spring_layout) se calcula dentro del trabajo.
+
+        :return: Tupla (función, argumentos).
+        """
+        return Renderer.render_network, (self.graph, fmt, GRAPH_SEED)
+
+    def cooccurrence_graph(self, kind):
+        """
+        Grafo de co-ocurrencia de todo el corpus, sin umbrales, construido una sola vez
+        por versión del corpus a partir de matrices dispersas.
+
+        :param kind: Tipo de grafo ('terminos', 'journal_termino' o 'journal_articulo_termino').
+        :return: CooccurrenceGraph.
+        """
+        if kind not in GRAPH_KINDS:
+            raise ValueError(f"Tipo de grafo no soportado: {kind}")
+        return self.store.derived(
+            f'graph_{kind}', self.corpus_version,
+            lambda: build_graph(kind, self.entries, self.frame, self.matcher, self.frequency_index),
+        )
+
+    def cooccurrence_layout(self, kind, min_weight=1, min_degree=1, max_nodes=None, layouts=None):
+        """
+        Aplica los umbrales al grafo de co-ocurrencia y calcula (o reutiliza) su disposición.
+
+        :param min_weight: Peso mínimo de las aristas.
+        :param min_degree: Número mínimo de vecinos de cada nodo.
+        :param max_nodes: Número máximo de nodos (los de mayor grado ponderado).
+        :param layouts: LayoutStore donde se guardan las disposiciones (por defecto, en memoria).
+        :return: Tupla (CooccurrenceGraph filtrado, arreglo n x 2 de posiciones).
+        """
+        graph = self.cooccurrence_graph(kind).filtered(min_weight, min_degree, max_nodes)
+        positions = (layouts or DEFAULT_LAYOUTS).layout(graph, seed=GRAPH_SEED)
+        return graph, positions
+
+    def cooccurrence_data(self, kind, min_weight=1, min_degree=1, max_nodes=None, layouts=None):
+        """
+        Nodos (con su posición) y aristas del grafo de co-ocurrencia, para dibujarlo en el navegador.
+
+        :return: Diccionario {'nodes': [...], 'edges': [...]}.
+        """
+        graph, positions = self.cooccurrence_layout(kind, min_weight, min_degree, max_nodes, layouts)
+        return graph.to_json(positions)
+
+    def cooccurrence_job(self, kind, min_weight=1, min_degree=1, max_nodes=None, layouts=None, fmt='png',
+                         compute=None):
+        """
+        Trabajo de renderizado del grafo de co-ocurrencia. Si la disposición no está
+        guardada, se calcula con compute (por ejemplo, RenderPool.compute, para no
+        ocupar el hilo de la solicitud) y se guarda en layouts; el trabajo solo dibuja.
+
+        :param compute: Función que recibe un trabajo (función, argumentos) y devuelve su
+                        resultado; por defecto se ejecuta en el hilo actual.
+        :return: Tupla (función, argumentos).
+        """
+        graph = self.cooccurrence_graph(kind).filtered(min_weight, min_degree, max_nodes)
+        layouts = layouts or DEFAULT_LAYOUTS
+        key, positions = layouts.lookup(graph, seed=GRAPH_SEED)
+        if positions is None:
+            with Metrics.stage('graph_layout'):
+                positions = (compute or self._run_job)((compute_layout, (graph, GRAPH_SEED)))
+            layouts.put(key, positions)
+        sources, targets, weights = graph.edges()
+        return Renderer.render_cooccurrence, (
+            positions, sources, targets, weights, graph.labels, graph.types, fmt,
+        )
+
+##ANÁLISIS POR LOTES
+    @Metrics.stage('analyze_batch')
+    def analyze_batch(self, outputs, images=False, fmt='png', render_many=None):
+        """
+        Calcula varios resultados a la vez, con un solo recorrido del corpus.
+
+        Los campos que piden todas las salidas (los de cada par y journal/ISSN) se
+        codifican juntos en la vista columnar en una sola pasada sobre las entradas; los
+        conteos de pares y journals son después operaciones vectorizadas sobre esas
+        columnas, y las frecuencias salen del índice de frecuencias del corpus.
+
+        :param outputs: Lista de salidas pedidas, cada una un diccionario con 'tipo':
+                        - 'pares': 'variable1', 'variable2' y 'limite' opcional (por defecto 15).
+                        - 'frecuencia': tabla de frecuencias por categoría.
+                        - 'top_journals': 'limite' opcional (por defecto 10).
+        :param images: Si es True, cada salida incluye también su imagen en base64 (gráfico de
+                       barras, nube de palabras o grafo de journals, respectivamente).
+        :param fmt: Formato de las imágenes ('png', 'webp' o 'svg').
+        :param render_many: Función que recibe una lista de trabajos de renderizado y
+                            devuelve sus bytes (por ejemplo, RenderPool.render_many);
+                            por defecto se renderizan en el hilo actual.
+        :return: Lista de resultados en el mismo orden que outputs: cada uno es la salida
+                 pedida con 'datos' (y 'imagen' si images es True).
+        :raises ValueError: Si una salida tiene un tipo desconocido o le faltan parámetros.
+        """
+        fields = []
+        for output in outputs:
+            kind = output.get('tipo')
+            limit = output.get('limite')
+            if limit is not None and (type(limit) is not int or limit < 0):
+                raise ValueError(f"Límite no válido: {limit}")
+            if kind == 'pares':
+                if not all(isinstance(output.get(name), str) and output[name]
+                           for name in ('variable1', 'variable2')):
+                    raise ValueError("Las salidas 'pares' necesitan variable1 y variable2 (nombres de campo)")
+                fields += [output['variable1'], output['variable2']]
+            elif kind == 'top_journals':
+                fields.append(('journal', 'issn'))
+            elif kind != 'frecuencia':
+                raise ValueError(f"Tipo de salida no soportado: {kind}")
+
+        # Recorrido único: todas las columnas que faltan se construyen juntas
+        with Metrics.stage('batch_scan'):
+            self.frame.columns(fields)
+
+        results = []
+        jobs = []
+        for output in outputs:
+            kind = output['tipo']
+            result = dict(output)
+            if kind == 'pares':
+                variable1, variable2 = output['variable1'], output['variable2']
+                limit = output.get('limite', 15)
+                with Metrics.stage('pair_counts'):
+                    pairs = self.frame.pair_counts(
+                        variable1, variable2, None if limit is None else max(limit, 15))
+                result['datos'] = [
+                    {'variable1': value1, 'variable2': value2, 'count': count}
+                    for (value1, value2), count in pairs[:limit]
+                ]
+                job = self._pair_chart_job(variable1, variable2, pairs[:15], fmt)
+            elif kind == 'frecuencia':
+                result['datos'] = self.analyze_frequency()
+                job = self.plot_word_cloud_job(fmt)
+            else:
+                with Metrics.stage('top_journals'):
+                    top = self.frame.top_values(('journal', 'issn'), output.get('limite', 10))
+                result['datos'] = [[journal, count] for journal, count in top]
+                job = None
+            results.append(result)
+            jobs.append(job)
+
+        if images:
+            if any(output['tipo'] == 'top_journals' for output in outputs):
+                # El grafo de journals se crea una sola vez, aunque se pida varias veces
+                self.create_graph()
+                graph_job = self.generate_graph_job(fmt)
+                jobs = [graph_job if job is None else job for job in jobs]
+            render_many = render_many or (lambda pending: [self._run_job(job) for job in pending])
+            for result, data in zip(results, render_many(jobs)):
+                result['imagen'] = self._to_base64(data)
+        return results
+
+
+def preload(store=None):
+    """
+    Carga el corpus y construye las estructuras derivadas más usadas (índice de
+    frecuencias y columnas de journal/ISSN y año). Pensado para ejecutarse en el
+    proceso maestro de gunicorn antes de crear los workers, que las comparten. El
+    índice se construye con los index_workers del almacén (INDEX_WORKERS).
+
+    :param store: Almacén del corpus (por defecto, el de todo_filtrado.bib).
+    :return: Número de entradas cargadas.
+    """
+    analyzer = BibtexAnalyzer(store)
+    analyzer.get_frequency_index()
+    analyzer.frame.column(('journal', 'issn'))
+    analyzer.frame.column('year')
+    analyzer.frame.column('journal')
+    return len(analyzer.entries)
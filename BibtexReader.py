@@ -1,30 +1,282 @@
+import argparse
+import hashlib
+import io
+import os
+import pickle
+import re
+import sys
+import threading
+from itertools import islice
+
 import bibtexparser
+from bibtexparser.bparser import BibTexParser
+
+import Metrics
+from CompactEntries import CompactEntries
+
+# Se incrementa cuando cambia el formato de la caché binaria
+CACHE_FORMAT_VERSION = 2
+PARSER_VERSION = getattr(bibtexparser, "__version__", "desconocida")
+
+# Caracteres que delimitan las entradas al leer el archivo en modo streaming
+_STRUCTURE_RE = re.compile(rb"[@{}()]")
+
+# Tamaño de una posición (int) en los índices invertidos
+_INT_SIZE = sys.getsizeof(1 << 20)
 
 class BibtexReader:
-    def __init__(self, filepath):
+    def __init__(self, filepath, compact=False):
         """
         Inicializa el lector de BibTeX con la ruta del archivo.
 
         :param filepath: Ruta del archivo .bib a procesar.
+        :param compact: Si es True, las entradas se guardan en un CompactEntries (columnas
+                        codificadas, mucha menos memoria) en lugar de una lista de diccionarios.
         """
         self.filepath = filepath
-        self.entries = []  # Almacena las entradas cargadas desde el archivo
+        self.compact = compact
+        # Almacena las entradas cargadas desde el archivo
+        self.entries = CompactEntries() if compact else []
+        self.stream_offset = 0  # Byte hasta el que se ha procesado el archivo
+        self.strings = {}  # Macros @string conocidas, para continuar la lectura incremental
+        self._index_lock = threading.Lock()
+        self._invalidate_indexes()
 
-    def load_entries(self):
+    def _invalidate_indexes(self):
+        """
+        Descarta los índices construidos; se reconstruyen bajo demanda en la siguiente consulta.
+        """
+        self._id_index = None  # ID -> entrada
+        self._field_indexes = {}  # campo -> {valor: [posiciones]}
+        self._token_indexes = {}  # campo -> {trigrama: {posiciones}}
+
+    def load_entries(self, use_cache=True, rebuild_cache=False):
         """
         Carga y parsea el archivo BibTeX, almacenando las entradas en self.entries.
 
+        Si existe una caché binaria válida junto al archivo (mismo hash de contenido,
+        misma versión del parser y del formato), se usa y se omite el parseo.
+
+        :param use_cache: Si es False, se ignora la caché y no se escribe una nueva.
+        :param rebuild_cache: Si es True, se parsea siempre y se reescribe la caché.
         :return: Una lista de diccionarios, cada uno representando una entrada en el archivo BibTeX.
         """
         try:
-            with open(self.filepath, encoding="utf-8") as bibtex_file:
-                bib_database = bibtexparser.load(bibtex_file)
-                self.entries = bib_database.entries
+            with Metrics.stage('bibtex_read'):
+                with open(self.filepath, "rb") as bibtex_file:
+                    raw = bibtex_file.read()
+                digest = hashlib.sha256(raw).hexdigest()
+            Metrics.record_size('bibtex_read', len(raw))
+
+            cached = None
+            if use_cache and not rebuild_cache:
+                cached = self._read_cache(digest)
+                Metrics.record_cache('bibtex_cache', cached is not None)
+            if cached is not None:
+                entries, strings = cached
+            else:
+                with Metrics.stage('bibtex_parse'):
+                    # Mismo tratamiento de codificación y saltos de línea que open(..., encoding="utf-8")
+                    text = io.TextIOWrapper(io.BytesIO(raw), encoding="utf-8").read()
+                    bib_database = bibtexparser.loads(text)
+                    entries = bib_database.entries
+                    strings = dict(bib_database.strings)
+                    if self.compact:
+                        entries = CompactEntries(entries)
+                        del bib_database.entries[:]
+                if use_cache:
+                    self._write_cache(digest, entries, strings)
+
+            self.entries = entries
+            self.strings = strings
+            self.stream_offset = len(raw)
+            self._invalidate_indexes()
             return self.entries
         except Exception as e:
             print(f"Error al cargar el archivo: {e}")
             return []
 
+    def iter_entries(self, fields=None, offset=None, block_size=1 << 20):
+        """
+        Recorre el archivo BibTeX en modo streaming, entregando una entrada a la vez.
+
+        El archivo se lee por bloques y cada entrada se parsea por separado, de modo que
+        la memoria depende del tamaño del bloque y de la entrada más grande, no del
+        archivo completo. Las entradas no se guardan en self.entries. Una entrada
+        incompleta al final del archivo (aún en escritura) no se entrega, y
+        self.stream_offset queda apuntando a su inicio.
+
+        :param fields: Campos a conservar (por ejemplo, ["abstract", "journal", "year"]).
+                       "ID" y "ENTRYTYPE" se conservan siempre. None conserva todos.
+        :param offset: Byte desde el que empezar; por defecto, self.stream_offset.
+        :param block_size: Tamaño en bytes de cada lectura.
+        :return: Generador de diccionarios, uno por entrada.
+        """
+        if offset is None:
+            offset = self.stream_offset
+        keep = None if fields is None else set(fields) | {"ID", "ENTRYTYPE"}
+
+        # Un solo parser para todo el recorrido conserva las macros @string entre entradas;
+        # se parte de las macros ya conocidas para poder continuar desde un offset
+        parser = BibTexParser()
+        parser.expect_multiple_parse = True
+        parser.bib_database.strings.update(self.strings)
+
+        with open(self.filepath, "rb") as bibtex_file:
+            bibtex_file.seek(offset)
+            buffer = b""
+            base = offset  # Posición en el archivo de buffer[0]
+            start = None  # Inicio de la entrada en curso dentro del buffer
+            opener = closer = None
+            depth = 0
+
+            while True:
+                block = bibtex_file.read(block_size)
+                if not block:
+                    break
+                scan = len(buffer)
+                buffer += block
+
+                for match in _STRUCTURE_RE.finditer(buffer, scan):
+                    char = match.group()
+                    if start is None or opener is None:
+                        if char == b"@":
+                            start = match.start()
+                        elif start is not None and char in (b"{", b"("):
+                            opener = char
+                            closer = b"}" if char == b"{" else b")"
+                            depth = 1
+                        continue
+
+                    if char == opener:
+                        depth += 1
+                    elif char == closer:
+                        depth -= 1
+                        if depth == 0:
+                            chunk = buffer[start:match.end()]
+                            self.stream_offset = base + match.end()
+                            start = opener = None
+                            for entry in self._parse_chunk(parser, chunk):
+                                if keep is not None:
+                                    entry = {key: value for key, value in entry.items() if key in keep}
+                                yield entry
+
+                # Descarta lo ya procesado; se conserva solo la entrada en curso
+                cut = start if start is not None else len(buffer)
+                buffer = buffer[cut:]
+                base += cut
+                if start is not None:
+                    start = 0
+
+    def _parse_chunk(self, parser, chunk):
+        """
+        Parsea el texto de una sola entrada y vacía la base de datos del parser.
+
+        :param parser: BibTexParser reutilizado durante el streaming.
+        :param chunk: Bytes de la entrada.
+        :return: Lista de entradas obtenidas (vacía para @string o @comment).
+        """
+        # Mismo tratamiento de saltos de línea que la lectura en modo texto
+        text = chunk.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+        bib_database = parser.bib_database
+        try:
+            parser.parse(text, partial=True)
+            entries = list(bib_database.entries)
+        except Exception as e:
+            print(f"Error al parsear una entrada: {e}")
+            entries = []
+        del bib_database.entries[:]
+        del bib_database.comments[:]
+        self.strings = dict(bib_database.strings)
+        return entries
+
+    def clone(self):
+        """
+        Copia del lector que comparte los datos de las entradas pero tiene su propia
+        lista, su propio offset de lectura y sus propios índices.
+
+        :return: Nuevo BibtexReader.
+        """
+        reader = BibtexReader(self.filepath, self.compact)
+        reader.entries = self.entries.copy()
+        reader.stream_offset = self.stream_offset
+        reader.strings = dict(self.strings)
+        return reader
+
+    @Metrics.stage('bibtex_load_new_entries')
+    def load_new_entries(self, fields=None):
+        """
+        Agrega a self.entries las entradas escritas al final del archivo desde la última
+        lectura (archivos .bib que solo crecen por el final).
+
+        :param fields: Campos a conservar, como en iter_entries.
+        :return: Lista con las entradas nuevas.
+        """
+        new_entries = list(self.iter_entries(fields))
+        if new_entries:
+            self.entries.extend(new_entries)
+            self._invalidate_indexes()
+        return new_entries
+
+    @property
+    def cache_path(self):
+        """
+        Ruta de la caché binaria asociada al archivo .bib (una distinta para el
+        formato compacto, que se guarda ya en columnas).
+        """
+        return self.filepath + (".compact.cache" if self.compact else ".cache")
+
+    def _cache_header(self, digest):
+        """
+        Cabecera que identifica el contenido y la versión con que se generó la caché.
+        """
+        return {"format": CACHE_FORMAT_VERSION, "parser": PARSER_VERSION, "sha256": digest}
+
+    @Metrics.stage('bibtex_cache_read')
+    def _read_cache(self, digest):
+        """
+        Lee las entradas de la caché si su cabecera coincide con el archivo actual.
+
+        La cabecera se guarda como un pickle independiente antes de las entradas, de
+        modo que una caché obsoleta se descarta sin deserializar todo el corpus.
+
+        :param digest: Hash SHA-256 del contenido del archivo .bib.
+        :return: Tupla (entradas, macros @string), o None si no hay caché válida.
+        """
+        try:
+            with open(self.cache_path, "rb") as cache_file:
+                if pickle.load(cache_file) != self._cache_header(digest):
+                    return None
+                entries = pickle.load(cache_file)
+                strings = pickle.load(cache_file)
+                return entries, strings
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Caché inválida, se ignora: {e}")
+            return None
+
+    @Metrics.stage('bibtex_cache_write')
+    def _write_cache(self, digest, entries, strings):
+        """
+        Escribe la caché de forma atómica (archivo temporal + os.replace).
+
+        :param digest: Hash SHA-256 del contenido del archivo .bib.
+        :param entries: Entradas parseadas a guardar.
+        :param strings: Macros @string definidas en el archivo.
+        """
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as cache_file:
+                pickle.dump(self._cache_header(digest), cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(entries, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(strings, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            print(f"No se pudo escribir la caché: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
     def filter_entries(self, field, value):
         """
         Filtra las entradas según un campo específico y un valor dado.
@@ -37,8 +289,25 @@ class BibtexReader:
             print("No hay entradas cargadas. Carga las entradas primero con load_entries.")
             return []
 
-        # Filtra las entradas con el campo y valor especificados
-        filtered_entries = [entry for entry in self.entries if field in entry and value in entry[field]]
+        if not isinstance(value, str):
+            return [entry for entry in self.entries if field in entry and value in entry[field]]
+
+        # Candidatos: valores distintos del campo (cadenas cortas) o trigramas comunes
+        if len(value) < 3:
+            field_index = self._get_field_index(field)
+            positions = set()
+            for field_value, value_positions in field_index.items():
+                if value in field_value:
+                    positions.update(value_positions)
+        else:
+            positions = self._get_token_candidates(field, value)
+
+        # Filtra las entradas con el campo y valor especificados, en el orden original
+        filtered_entries = []
+        for position in sorted(positions):
+            entry = self.entries[position]
+            if value in entry[field]:
+                filtered_entries.append(entry)
         return filtered_entries
 
     def get_unique_values(self, field):
@@ -52,9 +321,8 @@ class BibtexReader:
             print("No hay entradas cargadas. Carga las entradas primero con load_entries.")
             return []
 
-        # Extrae valores únicos del campo especificado
-        unique_values = set(entry[field] for entry in self.entries if field in entry)
-        return list(unique_values)
+        # Los valores únicos son las claves del índice invertido del campo
+        return list(self._get_field_index(field))
 
     def get_entry_by_id(self, entry_id):
         """
@@ -63,11 +331,106 @@ class BibtexReader:
         :param entry_id: ID de la entrada (clave única del artículo en el archivo).
         :return: Diccionario con la entrada encontrada, o None si no existe.
         """
-        for entry in self.entries:
-            if entry.get("ID") == entry_id:
-                return entry
-        print(f"Entrada con ID {entry_id} no encontrada.")
-        return None
+        entry = self._get_id_index().get(entry_id)
+        if entry is None:
+            print(f"Entrada con ID {entry_id} no encontrada.")
+        return entry
+
+    def get_entries_by_fields(self, fields, value, limit=None):
+        """
+        Busca las entradas cuyo valor en alguno de los campos es exactamente el indicado.
+
+        :param fields: Lista de campos a evaluar (por ejemplo, ["journal", "issn"]).
+        :param value: Valor exacto a buscar.
+        :param limit: Número máximo de entradas a devolver (None para todas).
+        :return: Lista de entradas en el orden del archivo.
+        """
+        positions = set()
+        for field in fields:
+            positions.update(self._get_field_index(field).get(value, ()))
+        positions = sorted(positions)
+        if limit is not None:
+            positions = positions[:limit]
+        return [self.entries[position] for position in positions]
+
+    def _get_id_index(self):
+        """
+        Construye (una sola vez) el índice ID -> entrada. Si hay IDs repetidos se
+        conserva la primera entrada, igual que una búsqueda lineal.
+        """
+        if self._id_index is None:
+            with self._index_lock:
+                if self._id_index is None:
+                    id_index = {}
+                    for entry in self.entries:
+                        id_index.setdefault(entry.get("ID"), entry)
+                    self._id_index = id_index
+        return self._id_index
+
+    def _get_field_index(self, field):
+        """
+        Construye (una sola vez por campo) el índice invertido valor -> posiciones.
+        """
+        field_index = self._field_indexes.get(field)
+        if field_index is None:
+            with self._index_lock:
+                field_index = self._field_indexes.get(field)
+                if field_index is None:
+                    field_index = {}
+                    for position, entry in enumerate(self.entries):
+                        if field in entry:
+                            field_index.setdefault(entry[field], []).append(position)
+                    self._field_indexes[field] = field_index
+        return field_index
+
+    def _get_token_candidates(self, field, value):
+        """
+        Devuelve las posiciones de las entradas cuyo campo contiene todos los trigramas
+        de value. Es un superconjunto exacto de las coincidencias por subcadena.
+        """
+        token_index = self._token_indexes.get(field)
+        if token_index is None:
+            with self._index_lock:
+                token_index = self._token_indexes.get(field)
+                if token_index is None:
+                    token_index = {}
+                    for position, entry in enumerate(self.entries):
+                        text = entry.get(field)
+                        if isinstance(text, str):
+                            for i in range(len(text) - 2):
+                                token_index.setdefault(text[i:i + 3], set()).add(position)
+                    self._token_indexes[field] = token_index
+
+        # Se intersecan primero las listas más cortas
+        postings = sorted((token_index.get(value[i:i + 3], set()) for i in range(len(value) - 2)), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if not candidates:
+                break
+            candidates &= posting
+        return candidates
+
+    def index_nbytes(self, sample_size=200):
+        """
+        Memoria aproximada de los índices construidos (sin las entradas, que comparten),
+        en bytes. Las listas y conjuntos de posiciones se estiman a partir de una muestra.
+
+        :param sample_size: Listas de posiciones a medir por índice (se extrapola al total).
+        :return: Bytes estimados.
+        """
+        with self._index_lock:
+            indexes = list(self._field_indexes.values()) + list(self._token_indexes.values())
+            id_index = self._id_index
+        total = sys.getsizeof(id_index) if id_index is not None else 0
+        for index in indexes:
+            keys = list(islice(index, sample_size))
+            if not keys:
+                continue
+            # Cada posición es un int propio además de su referencia en la lista o conjunto
+            sampled = sum(sys.getsizeof(key) + sys.getsizeof(index[key]) + _INT_SIZE * len(index[key])
+                          for key in keys)
+            total += sys.getsizeof(index) + sampled * len(index) // len(keys)
+        return total
 
     def count_entries(self):
         """
@@ -88,4 +451,24 @@ class BibtexReader:
             return []
 
         abstracts = [entry.get("abstract", "") for entry in self.entries if "abstract" in entry]
-        return abstracts
\ No newline at end of file
+        return abstracts
+
+
+if __name__ == "__main__":
+    # Precalcula la caché binaria en el despliegue: python BibtexReader.py [archivo.bib ...]
+    arg_parser = argparse.ArgumentParser(description="Genera la caché binaria de archivos BibTeX.")
+    arg_parser.add_argument(
+        "--compacta", action="store_true",
+        help="Genera la caché del formato compacto (la que usa CorpusStore por defecto).",
+    )
+    arg_parser.add_argument(
+        "archivos", nargs="*",
+        default=[os.path.join(os.path.dirname(os.path.abspath(__file__)), "todo_filtrado.bib")],
+        help="Archivos .bib a procesar (por defecto todo_filtrado.bib).",
+    )
+    args = arg_parser.parse_args()
+
+    for path in args.archivos:
+        reader = BibtexReader(path, compact=args.compacta)
+        entries = reader.load_entries(rebuild_cache=True)
+        print(f"{path}: {len(entries)} entradas -> {reader.cache_path}")
@@ -0,0 +1,66 @@
+# chunked_entries.py
+from bisect import bisect_right
+from collections.abc import Sequence
+from itertools import chain
+
+
+class ChunkedEntries(Sequence):
+    def __init__(self, entries=()):
+        """
+        Secuencia de entradas (diccionarios) guardada en bloques inmutables, para que
+        agregar entradas al final no copie las existentes.
+
+        Cada extend agrega un bloque nuevo; la lista de bloques se reemplaza en lugar de
+        modificarse, por lo que las copias (copy) la comparten sin verse afectadas. Los
+        bloques pequeños del final se fusionan cuando alcanzan la mitad del anterior,
+        así que hay O(log n) bloques y cada entrada se copia O(log n) veces en total.
+
+        :param entries: Entradas iniciales.
+        """
+        self._chunks = []  # Tuplas de entradas
+        self._starts = []  # Posición de la primera entrada de cada bloque
+        self._size = 0
+        self.extend(entries)
+
+    def extend(self, entries):
+        """
+        Agrega entradas al final.
+
+        :param entries: Iterable de diccionarios.
+        """
+        chunk = tuple(entries)
+        if not chunk:
+            return
+        chunks = self._chunks + [chunk]
+        while len(chunks) > 1 and 2 * len(chunks[-1]) >= len(chunks[-2]):
+            chunks[-2:] = [chunks[-2] + chunks[-1]]
+        starts = []
+        position = 0
+        for chunk in chunks:
+            starts.append(position)
+            position += len(chunk)
+        self._chunks, self._starts, self._size = chunks, starts, position
+
+    def copy(self):
+        """
+        Copia que comparte los bloques; extender una no cambia la otra.
+        """
+        clone = ChunkedEntries.__new__(ChunkedEntries)
+        clone.__dict__.update(self.__dict__)
+        return clone
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(self._size))]
+        if position < 0:
+            position += self._size
+        if not 0 <= position < self._size:
+            raise IndexError("índice de entrada fuera de rango")
+        index = bisect_right(self._starts, position) - 1
+        return self._chunks[index][position - self._starts[index]]
+
+    def __iter__(self):
+        return chain.from_iterable(self._chunks)
@@ -0,0 +1,324 @@
+# compact_entries.py
+import sys
+from array import array
+from collections.abc import Mapping, Sequence
+
+# Un campo se codifica con diccionario si tiene a lo sumo esta proporción de valores distintos
+DICTIONARY_RATIO = 0.5
+
+# Valores presentes a partir de los cuales el tipo de una columna ya no se revisa; mientras
+# tenga menos (por ejemplo, si se creó en un agregado de pocas entradas) se vuelve a elegir
+TYPE_SAMPLE = 100
+
+# Marca de valor ausente en las columnas
+_MISSING = -1
+
+
+class _DictionaryColumn:
+    def __init__(self):
+        """
+        Columna de un campo con pocos valores distintos (journal, ISSN, año, tipo...):
+        cada valor distinto se guarda una sola vez y cada entrada guarda su código.
+        """
+        self.codes = array('i')
+        self.values = []  # código -> valor
+        self._index = {}  # valor -> código
+
+    def append(self, value):
+        if value is _ABSENT:
+            self.codes.append(_MISSING)
+            return
+        code = self._index.get(value)
+        if code is None:
+            code = len(self.values)
+            # Los valores repetidos comparten un único objeto str
+            self.values.append(sys.intern(value) if type(value) is str else value)
+            self._index[value] = code
+        self.codes.append(code)
+
+    def get(self, position):
+        code = self.codes[position]
+        return _ABSENT if code == _MISSING else self.values[code]
+
+    def nbytes(self):
+        return self.codes.itemsize * len(self.codes) + sum(sys.getsizeof(value) for value in self.values)
+
+    def truncated(self, size):
+        column = _DictionaryColumn()
+        column.codes = self.codes[:size]
+        column.values = list(self.values)
+        column._index = dict(self._index)
+        return column
+
+    def __getstate__(self):
+        return {'codes': self.codes, 'values': self.values}
+
+    def __setstate__(self, state):
+        self.codes = state['codes']
+        self.values = state['values']
+        self._index = {value: code for code, value in enumerate(self.values)}
+
+
+class _TextColumn:
+    def __init__(self):
+        """
+        Columna de un campo de texto con valores casi siempre distintos (abstract,
+        título, autores...): todos los textos se guardan en un único búfer UTF-8 y
+        cada entrada guarda el inicio y el fin de su texto.
+        """
+        self.buffer = bytearray()
+        self.starts = array('q')
+        self.ends = array('q')
+
+    def append(self, value):
+        if value is _ABSENT:
+            self.starts.append(_MISSING)
+            self.ends.append(_MISSING)
+            return
+        self.starts.append(len(self.buffer))
+        self.buffer += value.encode('utf-8')
+        self.ends.append(len(self.buffer))
+
+    def get(self, position):
+        start = self.starts[position]
+        if start == _MISSING:
+            return _ABSENT
+        return self.buffer[start:self.ends[position]].decode('utf-8')
+
+    def nbytes(self):
+        return len(self.buffer) + self.starts.itemsize * (len(self.starts) + len(self.ends))
+
+    def truncated(self, size):
+        column = _TextColumn()
+        column.starts = self.starts[:size]
+        column.ends = self.ends[:size]
+        end = max((e for e in column.ends if e != _MISSING), default=0)
+        column.buffer = self.buffer[:end]
+        return column
+
+
+class _Absent:
+    """
+    Valor ausente (distinto de None, que podría ser un valor válido).
+    """
+    __slots__ = ()
+
+
+_ABSENT = _Absent()
+
+
+class CompactEntry(Mapping):
+    # Solo dos referencias por entrada; los datos viven en las columnas del almacén
+    __slots__ = ('_store', '_position')
+
+    def __init__(self, store, position):
+        """
+        Vista de solo lectura de una entrada de un CompactEntries, con la misma interfaz
+        de lectura que el diccionario original (entry['campo'], entry.get, in, items...).
+        """
+        self._store = store
+        self._position = position
+
+    def __getitem__(self, field):
+        column = self._store._columns.get(field)
+        value = column.get(self._position) if column is not None else _ABSENT
+        if value is _ABSENT:
+            raise KeyError(field)
+        return value
+
+    def get(self, field, default=None):
+        column = self._store._columns.get(field)
+        if column is None:
+            return default
+        value = column.get(self._position)
+        return default if value is _ABSENT else value
+
+    def __contains__(self, field):
+        return field in self._fields()
+
+    def _fields(self):
+        """
+        Campos de la entrada, en el orden original.
+        """
+        store = self._store
+        return store._layouts[store._layout_codes[self._position]]
+
+    def __iter__(self):
+        return iter(self._fields())
+
+    def __len__(self):
+        return len(self._fields())
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def __reduce__(self):
+        # Se serializa como un diccionario común, sin arrastrar el almacén completo
+        return dict, (dict(self),)
+
+
+class CompactEntries(Sequence):
+    def __init__(self, entries=()):
+        """
+        Almacén columnar y compacto de entradas BibTeX, de solo lectura salvo por extend.
+
+        En lugar de un diccionario por entrada (que repite las claves y guarda cada
+        journal, ISSN o año como un str distinto), cada campo es una columna:
+        codificada con diccionario si tiene pocos valores distintos, o en un búfer de
+        texto compartido si casi todos son distintos (como los abstracts). El orden de
+        los campos de cada entrada también se codifica con diccionario.
+
+        Las entradas se leen con vistas CompactEntry que se comportan como diccionarios.
+
+        :param entries: Entradas iniciales (diccionarios).
+        """
+        self._columns = {}  # campo -> _DictionaryColumn o _TextColumn
+        self._layouts = []  # código -> tupla de campos (orden de la entrada)
+        self._layout_index = {}
+        self._layout_codes = array('i')
+        self._size = 0
+        # Tamaño de las columnas compartidas; otra copia pudo haberlas extendido
+        self._shared = [0]
+        self._provisional = {}  # Campo cuyo tipo de columna aún puede cambiar -> valores vistos
+        self.extend(entries)
+
+    @staticmethod
+    def _new_column(values):
+        """
+        Elige el tipo de columna de un campo a partir de sus primeros valores.
+        """
+        if values and all(type(value) is str for value in values) \
+                and len(set(values)) > DICTIONARY_RATIO * len(values):
+            return _TextColumn()
+        return _DictionaryColumn()
+
+    def extend(self, entries):
+        """
+        Agrega entradas al final.
+
+        :param entries: Iterable de diccionarios.
+        """
+        entries = list(entries)
+        if not entries:
+            return
+        if self._shared[0] != self._size:
+            # Las columnas ya fueron extendidas por otra copia: se separan antes de escribir
+            self._detach()
+
+        for field in dict.fromkeys(field for entry in entries for field in entry):
+            if field not in self._columns:
+                values = [entry[field] for entry in entries if field in entry]
+                column = self._new_column(values)
+                for _ in range(self._size):
+                    column.append(_ABSENT)
+                self._columns[field] = column
+                if len(values) < TYPE_SAMPLE:
+                    self._provisional[field] = []
+
+        for entry in entries:
+            layout = tuple(entry)
+            code = self._layout_index.get(layout)
+            if code is None:
+                code = len(self._layouts)
+                self._layouts.append(layout)
+                self._layout_index[layout] = code
+            self._layout_codes.append(code)
+            for field, column in self._columns.items():
+                column.append(entry.get(field, _ABSENT))
+
+        self._size += len(entries)
+        self._shared[0] = self._size
+        if self._provisional:
+            self._revise_columns(entries)
+
+    def _revise_columns(self, entries):
+        """
+        Vuelve a elegir el tipo de las columnas creadas con pocos valores (por ejemplo, en
+        un agregado de una o dos entradas) con los valores acumulados hasta TYPE_SAMPLE;
+        si cambia, la columna se reconstruye. Solo se recorren las entradas agregadas.
+        """
+        for field, sample in list(self._provisional.items()):
+            sample = sample + [entry[field] for entry in entries if field in entry][:TYPE_SAMPLE - len(sample)]
+            column = self._columns[field]
+            replacement = self._new_column(sample)
+            if type(replacement) is not type(column):
+                for position in range(self._size):
+                    replacement.append(column.get(position))
+                # Se reemplaza en el diccionario propio; las copias anteriores conservan la columna original
+                self._columns[field] = replacement
+            if len(sample) >= TYPE_SAMPLE:
+                del self._provisional[field]
+            else:
+                self._provisional[field] = sample
+
+    def _detach(self):
+        """
+        Copia las columnas hasta el tamaño propio, para no compartirlas con otra copia.
+        """
+        self._columns = {field: column.truncated(self._size) for field, column in self._columns.items()}
+        self._layouts = list(self._layouts)
+        self._layout_index = dict(self._layout_index)
+        self._layout_codes = self._layout_codes[:self._size]
+        self._shared = [self._size]
+
+    def copy(self):
+        """
+        Copia que comparte los búferes de las columnas (sin duplicar memoria). Si una de
+        las dos se extiende después, la otra sigue viendo solo sus propias entradas.
+
+        Los contenedores que extend modifica en el lugar (columnas por campo, órdenes de
+        campos) son propios de cada copia, para que una copia que se extiende en un hilo
+        no cambie los que otro hilo está recorriendo.
+        """
+        clone = CompactEntries.__new__(CompactEntries)
+        clone.__dict__.update(self.__dict__)
+        clone._columns = dict(self._columns)
+        clone._layouts = list(self._layouts)
+        clone._layout_index = dict(self._layout_index)
+        clone._provisional = dict(self._provisional)
+        return clone
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [CompactEntry(self, i) for i in range(*position.indices(self._size))]
+        if position < 0:
+            position += self._size
+        if not 0 <= position < self._size:
+            raise IndexError("índice de entrada fuera de rango")
+        return CompactEntry(self, position)
+
+    def __iter__(self):
+        for position in range(self._size):
+            yield CompactEntry(self, position)
+
+    def values(self, field):
+        """
+        Valores de un campo en todas las entradas (None donde falta), sin crear vistas.
+        """
+        column = self._columns.get(field)
+        if column is None:
+            return [None] * self._size
+        return [None if value is _ABSENT else value for value in map(column.get, range(self._size))]
+
+    def nbytes(self):
+        """
+        Memoria aproximada de las columnas, en bytes (sin contar las vistas, que se crean al leer).
+        """
+        return (sum(column.nbytes() for column in self._columns.values())
+                + self._layout_codes.itemsize * len(self._layout_codes)
+                + sum(sys.getsizeof(layout) for layout in self._layouts))
+
+    def __getstate__(self):
+        if self._shared[0] != self._size:
+            self._detach()
+        state = dict(self.__dict__)
+        del state['_layout_index']
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault('_provisional', {})
+        self.__dict__.update(state)
+        self._layout_index = {layout: code for code, layout in enumerate(self._layouts)}
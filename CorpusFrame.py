@@ -0,0 +1,153 @@
+# corpus_frame.py
+import threading
+
+import numpy as np
+import pandas as pd
+
+from CompactEntries import CompactEntries
+
+
+class CorpusFrame:
+    def __init__(self, entries):
+        """
+        Vista columnar del corpus: cada campo se codifica como una columna categórica
+        (códigos enteros + categorías) la primera vez que se consulta, y se reutiliza
+        en todas las consultas siguientes de la misma versión del corpus.
+
+        :param entries: Entradas del corpus (secuencia de diccionarios).
+        """
+        self.entries = entries
+        self.size = len(entries)
+        self._columns = {}  # campo -> pd.Categorical
+        self._lock = threading.Lock()
+
+    def column(self, field):
+        """
+        Columna categórica de un campo. Las entradas sin el campo tienen código -1.
+
+        :param field: Nombre del campo, o tupla de campos: en ese caso se toma el
+                      primer valor no vacío (como entry.get('journal') or entry.get('issn')).
+        :return: pd.Categorical con los valores del campo.
+        """
+        column = self._columns.get(field)
+        if column is None:
+            column = self.columns([field])[0]
+        return column
+
+    def columns(self, fields):
+        """
+        Columnas categóricas de varios campos. Las que aún no existen se construyen
+        juntas, en un único recorrido de las entradas (ver column).
+
+        :param fields: Lista de campos (o tuplas de campos).
+        :return: Lista de pd.Categorical, en el mismo orden que fields.
+        """
+        missing = [field for field in dict.fromkeys(fields) if field not in self._columns]
+        if missing:
+            with self._lock:
+                missing = [field for field in missing if field not in self._columns]
+                compact = isinstance(self.entries, CompactEntries)
+                values = {}
+                scanned = []  # (campo, lista de valores) que se llenan recorriendo las entradas
+                for field in missing:
+                    if compact and not isinstance(field, tuple):
+                        # Lectura directa de la columna, sin crear una vista por entrada
+                        values[field] = self.entries.values(field)
+                    else:
+                        values[field] = []
+                        scanned.append((field, values[field]))
+                if scanned:
+                    for entry in self.entries:
+                        for field, field_values in scanned:
+                            if isinstance(field, tuple):
+                                field_values.append(self._coalesce(entry, field))
+                            else:
+                                field_values.append(entry.get(field) if field in entry else None)
+                for field in missing:
+                    self._columns[field] = pd.Categorical(values[field])
+        return [self._columns[field] for field in fields]
+
+    def nbytes(self):
+        """
+        Memoria aproximada de las columnas categóricas construidas, en bytes.
+        """
+        return sum(column.memory_usage(deep=True) for column in list(self._columns.values()))
+
+    @staticmethod
+    def _coalesce(entry, fields):
+        """
+        Primer valor no vacío de los campos indicados, o None.
+        """
+        for field in fields:
+            value = entry.get(field)
+            if value:
+                return value
+        return None
+
+    @staticmethod
+    def _rank(codes, limit):
+        """
+        Cuenta los códigos y los ordena por frecuencia descendente; los empates se
+        resuelven por primera aparición, igual que Counter.most_common.
+
+        :return: Tupla (códigos únicos, conteos) ya ordenados y recortados.
+        """
+        unique, first_index, counts = np.unique(codes, return_index=True, return_counts=True)
+        order = np.lexsort((first_index, -counts))
+        if limit is not None:
+            order = order[:limit]
+        return unique[order], counts[order]
+
+    def top_values(self, field, limit=None):
+        """
+        Valores más frecuentes de un campo.
+
+        :param field: Campo (o tupla de campos, ver column).
+        :param limit: Número máximo de valores (None para todos).
+        :return: Lista de tuplas (valor, cantidad).
+        """
+        column = self.column(field)
+        codes = column.codes
+        codes = codes[codes >= 0]
+        unique, counts = self._rank(codes, limit)
+        categories = column.categories
+        return [(categories[code], int(count)) for code, count in zip(unique, counts)]
+
+    def pair_counts(self, field1, field2, limit=None):
+        """
+        Cuenta los pares de valores (field1, field2) de las entradas que tienen ambos campos.
+
+        Los pares se codifican como un único entero (código1 * n2 + código2), por lo que
+        el conteo es una sola operación vectorizada sobre el corpus.
+
+        :param limit: Número máximo de pares (None para todos).
+        :return: Lista de tuplas ((valor1, valor2), cantidad), como Counter.most_common.
+        """
+        column1 = self.column(field1)
+        column2 = self.column(field2)
+        codes1 = column1.codes.astype(np.int64)
+        codes2 = column2.codes.astype(np.int64)
+        mask = (codes1 >= 0) & (codes2 >= 0)
+
+        width = max(len(column2.categories), 1)
+        combined = codes1[mask] * width + codes2[mask]
+        unique, counts = self._rank(combined, limit)
+
+        categories1 = column1.categories
+        categories2 = column2.categories
+        return [
+            ((categories1[code // width], categories2[code % width]), int(count))
+            for code, count in zip(unique, counts)
+        ]
+
+    def crosstab(self, field1, field2, limit=None):
+        """
+        Tabla cruzada dispersa de dos campos, lista para serializar a JSON.
+
+        :param limit: Número máximo de pares (None para todos los pares no nulos).
+        :return: Lista de diccionarios {'variable1', 'variable2', 'count'} ordenada por cantidad.
+        """
+        return [
+            {'variable1': value1, 'variable2': value2, 'count': count}
+            for (value1, value2), count in self.pair_counts(field1, field2, limit)
+        ]
@@ -0,0 +1,307 @@
+# corpus_registry.py
+import logging
+import os
+import threading
+import time
+
+from CorpusStore import CorpusStore
+from ResultCache import ResultCache
+
+# Resultado de CorpusRegistry.reload
+RELOAD_STARTED = 'iniciada'
+RELOAD_RUNNING = 'en_curso'
+NOT_LOADED = 'no_cargado'
+
+
+class CorpusNotFound(KeyError):
+    """
+    El identificador de corpus solicitado no está registrado.
+    """
+
+
+class Corpus:
+    def __init__(self, corpus_id, path, result_cache, on_change=None):
+        """
+        Corpus registrado: un archivo .bib o un directorio de archivos .bib, con su
+        propio almacén (entradas, índices y estructuras derivadas). Sus resultados se
+        guardan en la caché compartida por todos los corpus, con claves creadas por
+        result_key.
+
+        :param corpus_id: Identificador usado en la API (?corpus=...).
+        :param path: Ruta del archivo .bib o del directorio.
+        :param result_cache: ResultCache compartida por los corpus del registro.
+        :param on_change: Función que recibe este corpus cuando su memoria pudo cambiar
+                          (recarga o estructura derivada nueva).
+        """
+        self.id = corpus_id
+        self.path = os.path.abspath(path)
+        self.result_cache = result_cache
+        self.on_change = on_change
+        self.last_used = 0.0
+        self._store = None
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        """
+        Almacén del corpus; se crea la primera vez que se usa (la carga ocurre en snapshot).
+        """
+        with self._lock:
+            if self._store is None:
+                # Almacén propio del registro; las recargas no bloquean a las solicitudes en curso
+                self._store = CorpusStore(self.path, background=True, on_change=self._changed)
+            return self._store
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change(self)
+
+    @property
+    def loaded(self):
+        store = self._store
+        return store is not None and store.loaded
+
+    def result_key(self, version, endpoint, params=None):
+        """
+        Clave de un resultado de este corpus en la caché compartida: incluye el corpus
+        además de su versión, para que los resultados de corpus distintos nunca se confundan.
+        """
+        return ResultCache.make_key((self.id, version), endpoint, params)
+
+    def _owns_result(self, key):
+        return key[0][0] == self.id
+
+    def memory(self):
+        """
+        Memoria estimada del corpus cargado (entradas, índices y estructuras derivadas),
+        en bytes (0 si no está cargado).
+        """
+        store = self._store
+        if store is None or not store.loaded:
+            return 0
+        return store.memory_estimate()
+
+    def unload(self):
+        """
+        Libera el almacén y los resultados cacheados. Las solicitudes en curso conservan
+        su snapshot; la siguiente que use el corpus lo vuelve a cargar.
+        """
+        with self._lock:
+            self._store = None
+        self.result_cache.clear(self._owns_result)
+
+    def status(self):
+        """
+        Estado del corpus para la ruta /corpus.
+        """
+        store = self._store
+        loaded = store is not None and store.loaded
+        return {
+            'id': self.id,
+            'ruta': self.path,
+            'directorio': os.path.isdir(self.path),
+            'cargado': loaded,
+            'entradas': len(store.snapshot()[1]) if loaded else None,
+            'memoria_estimada': self.memory(),
+            'recargando': loaded and store.reloading,
+            'resultados_cacheados': self.result_cache.count(self._owns_result),
+        }
+
+
+class CorpusRegistry:
+    def __init__(self, paths, default=None, max_bytes=None, result_cache=None):
+        """
+        Registro de los corpus que la API puede analizar.
+
+        Cada corpus se carga la primera vez que se pide. Si la memoria estimada de todos
+        los corpus cargados supera max_bytes, se descargan los usados hace más tiempo
+        (nunca el que se acaba de pedir). El límite se revisa también cuando un corpus
+        crece después de cargarse: al construir una estructura derivada o al recargarse.
+
+        :param paths: Diccionario identificador -> ruta del archivo .bib o directorio.
+        :param default: Identificador usado cuando la solicitud no indica corpus
+                        (por defecto, el primero registrado).
+        :param max_bytes: Memoria máxima de los corpus cargados (None para no limitar).
+        :param result_cache: ResultCache compartida por todos los corpus, con un único
+                             límite de tamaño (por defecto, una ResultCache nueva).
+        """
+        if not paths:
+            raise ValueError("Debe registrarse al menos un corpus")
+        self.default = default or next(iter(paths))
+        if self.default not in paths:
+            raise ValueError(f"El corpus por defecto no está registrado: {self.default}")
+        self.max_bytes = max_bytes
+        self.result_cache = result_cache or ResultCache()
+        self._corpora = {
+            corpus_id: Corpus(corpus_id, path, self.result_cache, self._corpus_changed)
+            for corpus_id, path in paths.items()
+        }
+        self._lock = threading.Lock()
+        self._watcher_pid = None
+        self._preloading = False
+
+    @staticmethod
+    def parse(spec):
+        """
+        Lee la configuración de corpus en el formato "id=ruta,id2=ruta2".
+
+        :return: Diccionario identificador -> ruta, en el orden de la configuración.
+        """
+        paths = {}
+        for item in spec.split(','):
+            if not item.strip():
+                continue
+            corpus_id, separator, path = item.partition('=')
+            if not separator or not corpus_id.strip() or not path.strip():
+                raise ValueError(f"Corpus mal configurado (se espera id=ruta): {item}")
+            paths[corpus_id.strip()] = path.strip()
+        return paths
+
+    def get(self, corpus_id=None):
+        """
+        Devuelve un corpus registrado, cargándolo si hace falta, y descarga otros si
+        se supera el límite de memoria.
+
+        :param corpus_id: Identificador (None para el corpus por defecto).
+        :return: Corpus.
+        :raises CorpusNotFound: Si el identificador no está registrado.
+        """
+        corpus = self._corpora.get(corpus_id or self.default)
+        if corpus is None:
+            raise CorpusNotFound(corpus_id)
+        corpus.last_used = time.monotonic()
+        if not corpus.loaded:
+            corpus.store.snapshot()
+            self._evict(corpus)
+        return corpus
+
+    def _evict(self, keep):
+        """
+        Descarga los corpus usados hace más tiempo hasta volver al límite de memoria.
+        """
+        if self.max_bytes is None:
+            return
+        # Las memorias se miden sin tomar _lock: medir espera los locks de los almacenes,
+        # y un almacén puede llamar a _evict mientras tiene el suyo tomado
+        loaded = sorted((corpus for corpus in self.corpora() if corpus.loaded),
+                        key=lambda corpus: corpus.last_used)
+        sizes = {corpus.id: corpus.memory() for corpus in loaded}
+        with self._lock:
+            total = sum(sizes.values())
+            for corpus in loaded:
+                if total <= self.max_bytes:
+                    break
+                if corpus is keep:
+                    continue
+                logging.info("Descargando el corpus %s para liberar memoria", corpus.id)
+                total -= sizes[corpus.id]
+                corpus.unload()
+
+    def _corpus_changed(self, corpus):
+        """
+        Un corpus cargado creció (estructura derivada nueva o recarga): se vuelve a
+        aplicar el límite de memoria, sin descargar ese corpus.
+        """
+        if not self._preloading and corpus.loaded:
+            self._evict(corpus)
+
+    def memory(self):
+        """
+        Memoria estimada de todos los corpus cargados, en bytes.
+        """
+        return sum(corpus.memory() for corpus in self.corpora())
+
+    def preload(self, load):
+        """
+        Carga los corpus por adelantado, empezando por el predeterminado y siguiendo el
+        orden de la configuración, solo mientras quepan en el límite de memoria: el
+        primero que lo supera se vuelve a descargar (salvo el predeterminado) y los
+        siguientes se cargarán cuando se pidan.
+
+        :param load: Función que recibe el almacén de un corpus, construye sus estructuras
+                     derivadas y devuelve el número de entradas.
+        :return: Número total de entradas precargadas.
+        """
+        ordered = sorted(self.corpora(), key=lambda corpus: corpus.id != self.default)
+        total = 0
+        # La precarga aplica el límite por su cuenta, sin desalojar los corpus ya precargados
+        self._preloading = True
+        try:
+            for corpus in ordered:
+                # Sin pasar por get: su desalojo descargaría los corpus ya precargados
+                corpus.last_used = time.monotonic()
+                count = load(corpus.store)
+                if self.max_bytes is not None and self.memory() > self.max_bytes and corpus.id != self.default:
+                    logging.info("El corpus %s no cabe en el límite de memoria; se cargará al pedirlo", corpus.id)
+                    corpus.unload()
+                    break
+                total += count
+                if self.max_bytes is not None and self.memory() >= self.max_bytes:
+                    break
+        finally:
+            self._preloading = False
+        return total
+
+    def corpora(self):
+        """
+        Corpus registrados, en el orden de la configuración.
+        """
+        return list(self._corpora.values())
+
+    def reload(self, corpus_id):
+        """
+        Vuelve a parsear un corpus en segundo plano; las solicitudes siguen usando la
+        versión anterior hasta que la nueva está lista. Un corpus no cargado no se recarga:
+        se cargará con su contenido actual la próxima vez que se pida.
+
+        :return: RELOAD_STARTED, RELOAD_RUNNING si ya había una recarga en curso, o
+                 NOT_LOADED si el corpus no está cargado.
+        :raises CorpusNotFound: Si el identificador no está registrado.
+        """
+        corpus = self._corpora.get(corpus_id)
+        if corpus is None:
+            raise CorpusNotFound(corpus_id)
+        if not corpus.loaded:
+            return NOT_LOADED
+        return RELOAD_STARTED if corpus.store.reload_async(force=True) else RELOAD_RUNNING
+
+    def status(self):
+        """
+        Estado de todos los corpus y del límite de memoria.
+        """
+        corpora = [corpus.status() for corpus in self.corpora()]
+        return {
+            'predeterminado': self.default,
+            'memoria_maxima': self.max_bytes,
+            'memoria_estimada': sum(corpus['memoria_estimada'] for corpus in corpora),
+            'resultados_cacheados': len(self.result_cache),
+            'corpus': corpora,
+        }
+
+    def start_watcher(self, interval):
+        """
+        Inicia (una vez por proceso) un hilo que revisa cada interval segundos si los
+        archivos de los corpus cargados cambiaron y, en ese caso, los recarga en segundo
+        plano. Los hilos no sobreviven a un fork, así que cada worker inicia el suyo.
+
+        :param interval: Segundos entre revisiones (0 o None para no vigilar).
+        """
+        if not interval:
+            return
+        with self._lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+        threading.Thread(target=self._watch, args=(interval,), name="vigilancia-corpus", daemon=True).start()
+
+    def _watch(self, interval):
+        while True:
+            time.sleep(interval)
+            for corpus in self.corpora():
+                store = corpus._store
+                try:
+                    if store is not None and store.changed():
+                        logging.info("El corpus %s cambió en disco; recargando", corpus.id)
+                        store.reload_async()
+                except Exception:
+                    logging.exception("Error al revisar el corpus %s", corpus.id)
@@ -0,0 +1,408 @@
+# corpus_store.py
+import hashlib
+import os
+import sys
+import threading
+import logging
+
+import Metrics
+from BibtexReader import BibtexReader
+from ChunkedEntries import ChunkedEntries
+from CompactEntries import CompactEntries
+
+DEFAULT_BIB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'todo_filtrado.bib')
+
+# Formato compacto de las entradas (columnas codificadas); CORPUS_COMPACT=0 usa diccionarios
+COMPACT_ENTRIES = os.environ.get('CORPUS_COMPACT', '1') != '0'
+
+# Procesos con los que se construye el índice de frecuencias de cada versión (1 = en este proceso)
+INDEX_WORKERS = int(os.environ.get('INDEX_WORKERS', 1))
+
+
+class CorpusStore:
+    def __init__(self, filepath, compact=None, background=False, on_change=None, index_workers=None):
+        """
+        Almacén compartido del corpus parseado para todo el proceso.
+
+        El archivo .bib se parsea una sola vez y se vuelve a cargar únicamente
+        cuando cambian su fecha de modificación (mtime) o su tamaño. Si el archivo
+        solo creció por el final, se leen únicamente las entradas nuevas y las
+        estructuras derivadas que lo soportan (método extended) se actualizan con ellas;
+        las entradas se guardan en estructuras que se extienden sin copiar las existentes
+        (CompactEntries o ChunkedEntries). Si el archivo cambió de otra forma se vuelve a
+        parsear completo, y las estructuras que lo soportan (método revised) actualizan
+        solo las entradas que cambiaron.
+
+        La ruta también puede ser un directorio: el corpus son todos sus archivos .bib
+        (en orden alfabético) y se recarga completo cuando cualquiera cambia.
+
+        :param filepath: Ruta del archivo .bib (o directorio) a procesar.
+        :param compact: Guardar las entradas en un CompactEntries (por defecto, COMPACT_ENTRIES).
+        :param background: Si es True, cuando el archivo cambia se sigue sirviendo la
+                           versión cargada mientras la nueva se construye en un hilo aparte.
+        :param on_change: Función sin argumentos que se llama cuando puede haber cambiado la
+                          memoria del corpus: al publicar una versión nueva y al guardar una
+                          estructura derivada (CorpusRegistry la usa para aplicar su límite).
+        :param index_workers: Procesos para construir el índice de frecuencias de una versión
+                              nueva (por defecto, INDEX_WORKERS).
+        """
+        self.filepath = filepath
+        self.compact = COMPACT_ENTRIES if compact is None else compact
+        self.background = background
+        self.on_change = on_change
+        self.index_workers = INDEX_WORKERS if index_workers is None else index_workers
+        # Reentrante: una estructura derivada puede construirse a partir de otras (derived anidado)
+        self._lock = threading.RLock()
+        # Serializa las recargas; se toma sin _lock para no bloquear a los lectores mientras se parsea
+        self._reload_lock = threading.Lock()
+        self._reloading = None  # Hilo de la recarga en segundo plano en curso
+        # (reader, entries, version) se reemplaza en bloque para que los lectores
+        # nunca vean una mezcla de dos versiones del corpus
+        self._state = None
+        self._derived = {}  # (versión, nombre) -> estructura derivada del corpus
+        self._digest = None  # Hash del contenido cargado, para detectar agregados al final
+
+    def _bib_files(self):
+        """
+        Archivos .bib del corpus: el archivo mismo, o los del directorio en orden alfabético.
+        """
+        if not os.path.isdir(self.filepath):
+            return [self.filepath]
+        return sorted(
+            os.path.join(self.filepath, name) for name in os.listdir(self.filepath)
+            if name.endswith('.bib') and os.path.isfile(os.path.join(self.filepath, name))
+        )
+
+    def _stat_version(self):
+        """
+        Obtiene la firma actual del archivo (mtime en nanosegundos y tamaño).
+
+        :return: Tupla (mtime_ns, size), o None si el archivo no existe. Para un
+                 directorio, una tupla con (nombre, mtime_ns, size) de cada archivo .bib.
+        """
+        if os.path.isdir(self.filepath):
+            try:
+                return tuple(
+                    (os.path.basename(path), stat.st_mtime_ns, stat.st_size)
+                    for path, stat in ((path, os.stat(path)) for path in self._bib_files())
+                )
+            except OSError:
+                return None
+        try:
+            stat = os.stat(self.filepath)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def snapshot(self):
+        """
+        Devuelve una vista consistente del corpus, cargándolo si aún no se ha cargado
+        o si el archivo cambió en disco.
+
+        En modo background, si ya hay una versión cargada se devuelve esa y la nueva se
+        construye en otro hilo; las solicitudes nunca esperan una recarga.
+
+        :return: Tupla (reader, entries, version).
+        """
+        state = self._state
+        current = self._stat_version()
+        if state is not None and current == state[2]:
+            return state
+        if state is not None and self.background:
+            self.reload_async()
+            return state
+        return self._reload()
+
+    def reload_async(self, force=False):
+        """
+        Recarga el corpus en un hilo aparte y lo reemplaza de forma atómica al terminar.
+
+        :param force: Si es True, se vuelve a parsear aunque el archivo no haya cambiado.
+        :return: False si ya había una recarga en curso.
+        """
+        with self._lock:
+            if self._reloading is not None and self._reloading.is_alive():
+                return False
+            self._reloading = threading.Thread(
+                target=self._reload_logged, args=(force,), name="recarga-corpus", daemon=True)
+            self._reloading.start()
+            return True
+
+    @property
+    def reloading(self):
+        """
+        Indica si hay una recarga en segundo plano en curso.
+        """
+        return self._reloading is not None and self._reloading.is_alive()
+
+    def _reload_logged(self, force):
+        try:
+            self._reload(force)
+        except Exception:
+            logging.exception("Error al recargar el corpus %s", self.filepath)
+
+    def _reload(self, force=False):
+        """
+        Carga la versión actual del archivo (si cambió) y la publica.
+
+        El parseo ocurre fuera de _lock: mientras tanto, los lectores siguen usando el
+        estado anterior y pueden construir estructuras derivadas sin esperar.
+        """
+        with self._reload_lock:
+            # Otro hilo pudo haber recargado mientras esperábamos el lock
+            state = self._state
+            current = self._stat_version()
+            if state is not None and current == state[2] and not force:
+                return state
+
+            hasher = self._append_hasher(state[2], current) if state is not None and not force else None
+            if hasher is not None:
+                logging.info("Leyendo entradas nuevas de %s", self.filepath)
+                with Metrics.stage('corpus_append'):
+                    reader = state[0].clone()
+                    new_entries = reader.load_new_entries()
+                    # El clon extendió su propia copia de las entradas; el snapshot anterior no cambia.
+                    # Se publica otra copia para que cambios posteriores en el lector no lo alteren
+                    entries = reader.entries.copy()
+                    derived = {
+                        (current, name): value.extended(new_entries, len(state[1]))
+                        for (version, name), value in list(self._derived.items())
+                        if version == state[2] and hasattr(value, 'extended')
+                    }
+            else:
+                logging.info("Cargando corpus desde %s", self.filepath)
+                with Metrics.stage('corpus_load'):
+                    reader, entries = self._load()
+                derived = {}
+                if state is not None:
+                    # Edición o eliminación: se actualizan solo las entradas que cambiaron
+                    with Metrics.stage('corpus_revise'):
+                        revised = {
+                            (current, name): value.revised(state[1], entries)
+                            for (version, name), value in list(self._derived.items())
+                            if version == state[2] and hasattr(value, 'revised')
+                        }
+                    derived = {key: value for key, value in revised.items() if value is not None}
+
+            if hasher is not None:
+                # El hash del prefijo ya verificado se continúa solo con los bytes agregados
+                hasher = self._hash_file(current, hasher, start=state[2][1])
+            else:
+                hasher = self._hash_file(current)
+            digest = hasher.digest() if hasher is not None else None
+            with self._lock:
+                self._digest = digest
+                self._state = (reader, entries, current)
+                self._derived = derived
+                state = self._state
+            self._notify()
+            return state
+
+    def _load(self):
+        """
+        Parsea el corpus completo.
+
+        :return: Tupla (reader, entries).
+        """
+        reader = BibtexReader(self.filepath, self.compact)
+        if not os.path.isdir(self.filepath):
+            reader.load_entries()
+        else:
+            # Directorio: cada archivo usa su propia caché y las entradas se concatenan
+            for path in self._bib_files():
+                file_reader = BibtexReader(path, self.compact)
+                reader.entries.extend(file_reader.load_entries())
+                reader.strings.update(file_reader.strings)
+        if not self.compact:
+            # Lista de diccionarios -> bloques, para que los agregados no copien el corpus
+            reader.entries = ChunkedEntries(reader.entries)
+        return reader, reader.entries.copy()
+
+    def _hash_file(self, version, hasher=None, start=0, block_size=1 << 20):
+        """
+        Agrega al hash los bytes del archivo desde start hasta el tamaño registrado en version.
+
+        :param hasher: Hash a continuar (por defecto, uno nuevo).
+        :return: El hash, o None para un directorio o si el archivo no se puede leer completo.
+        """
+        if version is None or os.path.isdir(self.filepath):
+            return None
+        hasher = hasher or hashlib.sha1()
+        remaining = version[1] - start
+        try:
+            with open(self.filepath, "rb") as bibtex_file:
+                bibtex_file.seek(start)
+                while remaining > 0:
+                    block = bibtex_file.read(min(block_size, remaining))
+                    if not block:
+                        return None
+                    hasher.update(block)
+                    remaining -= len(block)
+        except OSError:
+            return None
+        return hasher
+
+    def _append_hasher(self, previous, current):
+        """
+        Indica si el archivo solo creció por el final desde la versión anterior: es más
+        grande y sus primeros bytes (tantos como tenía la versión cargada) no cambiaron.
+
+        Se compara el hash de todo ese prefijo, no solo sus últimos bytes: una edición
+        anterior que deja el archivo más grande no debe tomarse como un agregado.
+
+        :return: El hash del prefijo (para continuarlo con los bytes nuevos), o None si
+                 no es un agregado.
+        """
+        if previous is None or current is None or os.path.isdir(self.filepath) or current[1] <= previous[1]:
+            return None
+        if self._digest is None:
+            return None
+        hasher = self._hash_file(previous)
+        return hasher if hasher is not None and hasher.digest() == self._digest else None
+
+    @property
+    def loaded(self):
+        """
+        Indica si el corpus ya se cargó (sin provocar la carga).
+        """
+        return self._state is not None
+
+    def changed(self):
+        """
+        Indica si el archivo cambió en disco desde la versión cargada (False si no está cargado).
+        """
+        state = self._state
+        return state is not None and self._stat_version() != state[2]
+
+    @property
+    def reader(self):
+        """
+        Lector de BibTeX asociado a la versión actual del corpus.
+        """
+        return self.snapshot()[0]
+
+    @property
+    def entries(self):
+        """
+        Entradas parseadas de la versión actual del corpus.
+
+        Se devuelven como una secuencia compartida por todos los analizadores (una
+        ChunkedEntries de diccionarios o un CompactEntries); las entradas no deben modificarse.
+        """
+        return self.snapshot()[1]
+
+    @property
+    def version(self):
+        """
+        Identificador de la versión cargada del corpus (mtime_ns, size).
+        """
+        return self.snapshot()[2]
+
+    def derived(self, name, version, build):
+        """
+        Devuelve una estructura derivada del corpus (índices, vistas columnares...),
+        construyéndola una sola vez por versión del corpus.
+
+        :param name: Nombre de la estructura.
+        :param version: Versión del corpus para la que se pide (la del snapshot del llamador).
+        :param build: Función sin argumentos que construye la estructura.
+        :return: La estructura derivada.
+        """
+        key = (version, name)
+        value = self._derived.get(key)
+        if value is not None:
+            Metrics.record_cache('corpus_derived', True)
+            return value
+
+        stored = False
+        with self._lock:
+            value = self._derived.get(key)
+            Metrics.record_cache('corpus_derived', value is not None)
+            if value is None:
+                with Metrics.stage(f'corpus_build_{name}'):
+                    value = build()
+                # Solo se guarda si corresponde a la versión vigente del corpus
+                if self._state is not None and self._state[2] == version:
+                    self._derived[key] = value
+                    stored = True
+        if stored:
+            self._notify()
+        return value
+
+    def _notify(self):
+        """
+        Avisa a on_change que la memoria del corpus pudo cambiar (fuera de _lock).
+        """
+        if self.on_change is not None:
+            try:
+                self.on_change()
+            except Exception:
+                logging.exception("Error al notificar el cambio del corpus %s", self.filepath)
+
+    def memory_estimate(self, sample_size=200):
+        """
+        Memoria aproximada del corpus cargado, en bytes: las entradas, los índices del
+        lector y las estructuras derivadas de la versión vigente (índice de frecuencias,
+        vista columnar, grafos). Usada por CorpusRegistry para decidir qué corpus
+        descargar cuando se supera el límite.
+
+        :param sample_size: Entradas a medir cuando son diccionarios (se extrapola al total).
+        :return: Bytes estimados (0 si el corpus no está cargado).
+        """
+        with self._lock:
+            state = self._state
+            derived = [value for (version, _), value in self._derived.items()
+                       if state is not None and version == state[2]]
+        if state is None:
+            return 0
+        reader, entries, _ = state
+        total = reader.index_nbytes() + sum(value.nbytes() for value in derived if hasattr(value, 'nbytes'))
+        if isinstance(entries, CompactEntries):
+            return total + entries.nbytes()
+        if not entries:
+            return total
+        step = max(1, len(entries) // sample_size)
+        sample = entries[::step]
+        sampled = sum(
+            sys.getsizeof(entry) + sum(sys.getsizeof(value) for value in entry.values())
+            for entry in sample
+        )
+        return total + sampled * len(entries) // len(sample)
+
+    def warm_up(self):
+        """
+        Fuerza la carga del corpus para no pagar el parseo en la primera solicitud.
+
+        :return: Número de entradas cargadas.
+        """
+        return len(self.entries)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(filepath=DEFAULT_BIB_PATH):
+    """
+    Devuelve el almacén compartido del proceso para un archivo .bib.
+
+    :param filepath: Ruta del archivo .bib (o directorio de archivos .bib).
+    :return: Instancia única de CorpusStore para esa ruta.
+    """
+    filepath = os.path.abspath(filepath)
+    with _stores_lock:
+        store = _stores.get(filepath)
+        if store is None:
+            store = CorpusStore(filepath)
+            _stores[filepath] = store
+        return store
+
+
+def warm_up(filepath=DEFAULT_BIB_PATH):
+    """
+    Carga el corpus por adelantado (usado por los hooks de gunicorn).
+
+    :param filepath: Ruta del archivo .bib.
+    :return: Número de entradas cargadas.
+    """
+    return get_store(filepath).warm_up()
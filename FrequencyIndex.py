@@ -0,0 +1,285 @@
+# frequency_index.py
+import copy
+import multiprocessing
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+
+# Motor de búsqueda de cada proceso del pool (se recibe una vez, en el initializer)
+_worker_matcher = None
+
+
+def _init_worker(matcher):
+    """
+    Inicializa un proceso del pool con el motor de búsqueda.
+    """
+    global _worker_matcher
+    _worker_matcher = matcher
+
+
+def _count_chunk(abstracts):
+    """
+    Cuenta los términos de un bloque de abstracts en un proceso del pool.
+
+    :param abstracts: Lista de textos (solo el abstract, no la entrada completa).
+    :return: Lista de vectores dispersos, uno por abstract, en el mismo orden.
+    """
+    return [tuple(_worker_matcher.count(abstract.lower()).items()) for abstract in abstracts]
+
+
+class FrequencyIndex:
+    def __init__(self, matcher):
+        """
+        Tabla de frecuencias mantenida de forma incremental.
+
+        Guarda, por cada entrada, su vector disperso de conteos de términos, y una tabla
+        agregada que se actualiza sumando o restando esos vectores cuando las entradas
+        se agregan, cambian o eliminan. El resultado es siempre igual al de recalcular
+        analyze_frequency sobre todas las entradas.
+
+        Los vectores se guardan en capas: las de versiones anteriores del índice se
+        comparten sin copiarse (ver extended) y solo la capa propia se modifica.
+
+        :param matcher: TermMatcher con el que se cuentan los términos.
+        """
+        self.matcher = matcher
+        # Capas compartidas, de la más antigua a la más reciente (no se modifican);
+        # en ellas y en la capa propia, None marca una clave eliminada
+        self._layers = []
+        self._vectors = {}  # Capa propia: clave -> tupla de (índice de patrón, conteo)
+        self._size = 0
+        self._table = matcher.new_table()
+        self._own_rows = set(self._table)  # Categorías de la tabla que no comparte con otro índice
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, matcher, entries, workers=None, chunk_size=None):
+        """
+        Construye el índice completo a partir de una secuencia de entradas; la clave
+        de cada entrada es su posición.
+
+        Con workers > 1 los abstracts se dividen en bloques y se cuentan en un pool de
+        procesos (a cada proceso solo se le envía el texto de los abstracts). Los
+        vectores se combinan en el orden original, por lo que el resultado es idéntico
+        al del modo serial.
+
+        :param workers: Número de procesos (None o 1 para contar en este proceso).
+        :param chunk_size: Abstracts por bloque (por defecto, unos 4 bloques por proceso).
+        """
+        index = cls(matcher)
+        if not workers or workers <= 1 or not entries:
+            index.add_many(enumerate(entries))
+            return index
+
+        abstracts = [entry.get('abstract', '') for entry in entries]
+        chunk_size = chunk_size or max(1, -(-len(abstracts) // (workers * 4)))
+        chunks = [abstracts[i:i + chunk_size] for i in range(0, len(abstracts), chunk_size)]
+
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker, initargs=(matcher,),
+        ) as executor:
+            vectors = [vector for chunk in executor.map(_count_chunk, chunks) for vector in chunk]
+
+        with index._lock:
+            for key, vector in enumerate(vectors):
+                index._set(key, vector)
+        return index
+
+    def _vector(self, entry):
+        """
+        Vector disperso de conteos de términos del abstract de una entrada.
+        """
+        abstract = entry.get('abstract', '').lower()
+        return tuple(self.matcher.count(abstract).items())
+
+    def add_many(self, keyed_entries):
+        """
+        Agrega (o reemplaza) varias entradas.
+
+        :param keyed_entries: Iterable de tuplas (clave, entrada).
+        """
+        # Los abstracts se procesan fuera del lock; solo la actualización es exclusiva
+        vectors = [(key, self._vector(entry)) for key, entry in keyed_entries]
+        with self._lock:
+            for key, vector in vectors:
+                self._set(key, vector)
+
+    def add(self, key, entry):
+        """
+        Agrega una entrada, o la reemplaza si la clave ya existía.
+        """
+        self.add_many([(key, entry)])
+
+    update = add
+
+    def remove(self, key):
+        """
+        Elimina una entrada del índice y resta sus conteos de la tabla agregada.
+        """
+        with self._lock:
+            vector = self._lookup(key)
+            if vector is None:
+                return
+            self._accumulate(vector, sign=-1)
+            self._size -= 1
+            if self._layers:
+                self._vectors[key] = None  # La clave puede seguir en una capa compartida
+            else:
+                del self._vectors[key]
+
+    def _lookup(self, key):
+        """
+        Vector vigente de una clave, o None si no está indexada (el lock debe estar tomado).
+        """
+        if key in self._vectors:
+            return self._vectors[key]
+        for layer in reversed(self._layers):
+            if key in layer:
+                return layer[key]
+        return None
+
+    def _set(self, key, vector):
+        """
+        Reemplaza el vector de una clave aplicando solo la diferencia (el lock debe estar tomado).
+        """
+        previous = self._lookup(key)
+        if previous is not None:
+            self._accumulate(previous, sign=-1)
+        else:
+            self._size += 1
+        self._vectors[key] = vector
+        self._accumulate(vector)
+
+    def _accumulate(self, vector, sign=1):
+        """
+        Suma (o resta) un vector a la tabla, copiando antes las filas compartidas que modifica.
+        """
+        for pattern_id, _ in vector:
+            for category, _, _ in self.matcher.contributions[pattern_id]:
+                if category not in self._own_rows:
+                    self._table[category] = dict(self._table[category])
+                    self._own_rows.add(category)
+        self.matcher.accumulate(self._table, dict(vector), sign)
+
+    @staticmethod
+    def _merge_layers(layers):
+        """
+        Fusiona las capas más recientes mientras la última tenga al menos la mitad del
+        tamaño de la anterior: quedan O(log n) capas y cada vector se copia O(log n) veces.
+        Las fusiones crean diccionarios nuevos; las capas compartidas no se modifican.
+        """
+        layers = list(layers)
+        while len(layers) > 1 and 2 * len(layers[-1]) >= len(layers[-2]):
+            merged = dict(layers[-2])
+            merged.update(layers[-1])
+            if len(layers) == 2:
+                # En la capa más antigua ya no hacen falta las marcas de eliminación
+                merged = {key: vector for key, vector in merged.items() if vector is not None}
+            layers[-2:] = [merged]
+        return layers
+
+    def extended(self, new_entries, start):
+        """
+        Copia del índice con entradas nuevas agregadas al final del corpus. Usado por
+        CorpusStore cuando el archivo .bib solo creció.
+
+        La copia comparte los vectores existentes (en capas que ya no se modifican) y
+        las filas de la tabla que las entradas nuevas no tocan, así que el costo es
+        proporcional a las entradas nuevas y no al corpus.
+
+        :param new_entries: Entradas nuevas.
+        :param start: Posición de la primera entrada nueva.
+        :return: Nuevo FrequencyIndex; el original no se modifica.
+        """
+        with self._lock:
+            if self._vectors:
+                # La capa propia pasa a ser compartida; el original escribirá en una nueva
+                self._layers = self._merge_layers(self._layers + [self._vectors])
+                self._vectors = {}
+            # Las filas de la tabla quedan compartidas por los dos: ambos las copian al modificarlas
+            self._own_rows = set()
+            index = FrequencyIndex(self.matcher)
+            index._layers = self._layers
+            index._size = self._size
+            index._table = dict(self._table)
+            index._own_rows = set()
+        index.add_many(enumerate(new_entries, start))
+        return index
+
+    def revised(self, old_entries, new_entries, max_changed=0.5):
+        """
+        Copia del índice para otra versión del corpus cuyas entradas se editaron,
+        eliminaron o agregaron (no solo al final). Usado por CorpusStore cuando el archivo
+        .bib cambió de otra forma que un agregado.
+
+        Las entradas se comparan por posición (ID y abstract): las que cambiaron o son
+        nuevas se actualizan y las posiciones que ya no existen se eliminan; el resto de
+        los vectores se comparte como en extended.
+
+        :param old_entries: Entradas de la versión indexada.
+        :param new_entries: Entradas de la versión nueva.
+        :param max_changed: Fracción máxima de posiciones cambiadas; por encima conviene
+                            reconstruir el índice completo.
+        :return: Nuevo FrequencyIndex, o None si cambiaron demasiadas entradas.
+        """
+        changed = []
+        for position, entry in enumerate(new_entries):
+            if position >= len(old_entries):
+                changed.append(position)
+                continue
+            old_entry = old_entries[position]
+            if entry.get('ID') != old_entry.get('ID') or entry.get('abstract', '') != old_entry.get('abstract', ''):
+                changed.append(position)
+        removed = range(len(new_entries), len(old_entries))
+        if len(changed) + len(removed) > max_changed * max(len(new_entries), 1):
+            return None
+
+        index = self.extended([], len(old_entries))
+        for position in changed:
+            index.update(position, new_entries[position])
+        for position in removed:
+            index.remove(position)
+        return index
+
+    def items(self):
+        """
+        Vectores de conteos de todas las entradas indexadas.
+
+        :return: Lista de tuplas (clave, tupla de (índice de patrón, conteo)).
+        """
+        with self._lock:
+            merged = {}
+            for layer in self._layers + [self._vectors]:
+                merged.update(layer)
+        return [(key, vector) for key, vector in merged.items() if vector is not None]
+
+    def __len__(self):
+        """
+        Número de entradas indexadas.
+        """
+        return self._size
+
+    def nbytes(self, sample_size=200):
+        """
+        Memoria aproximada de los vectores de todas las capas, en bytes (estimada a partir
+        de una muestra de sample_size vectores).
+        """
+        with self._lock:
+            layers = self._layers + [self._vectors]
+        count = sum(len(layer) for layer in layers)
+        sample = [vector for vector in islice(chain.from_iterable(layer.values() for layer in layers), sample_size)
+                  if vector is not None]
+        per_vector = (sum(sys.getsizeof(vector) + sum(sys.getsizeof(pair) for pair in vector) for vector in sample)
+                      // len(sample) if sample else 0)
+        return sum(sys.getsizeof(layer) for layer in layers) + per_vector * count
+
+    def table(self):
+        """
+        Copia de la tabla de frecuencias agregada, con la misma forma que analyze_frequency.
+        """
+        with self._lock:
+            if not self._size:
+                return self.matcher.new_table(populated=False)
+            return copy.deepcopy(self._table)
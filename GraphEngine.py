@@ -0,0 +1,446 @@
+# graph_engine.py
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+from itertools import chain
+
+import networkx as nx
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+from scipy.sparse.linalg import eigsh
+
+import Metrics
+
+# Tipos de grafo soportados
+TERM_GRAPH = 'terminos'  # término - término (co-ocurrencia en el mismo abstract)
+JOURNAL_TERM_GRAPH = 'journal_termino'  # journal - término (abstracts del journal que lo mencionan)
+JOURNAL_ARTICLE_TERM_GRAPH = 'journal_articulo_termino'  # journal - artículo - término
+GRAPH_KINDS = (TERM_GRAPH, JOURNAL_TERM_GRAPH, JOURNAL_ARTICLE_TERM_GRAPH)
+
+# Se incrementa cuando cambia el algoritmo de disposición, para no reutilizar disposiciones viejas
+LAYOUT_VERSION = 1
+
+
+class CooccurrenceGraph:
+    def __init__(self, node_ids, labels, types, adjacency):
+        """
+        Grafo no dirigido y ponderado representado con una matriz de adyacencia dispersa.
+
+        :param node_ids: Identificadores únicos de los nodos (cadenas).
+        :param labels: Texto a mostrar de cada nodo.
+        :param types: Tipo de cada nodo ('journal', 'article' o 'term').
+        :param adjacency: Matriz simétrica (n x n) con el peso de cada arista y diagonal nula.
+        """
+        self.node_ids = list(node_ids)
+        self.labels = list(labels)
+        self.types = list(types)
+        adjacency = sparse.csr_matrix(adjacency, dtype=np.int64)
+        adjacency = adjacency - sparse.diags(adjacency.diagonal(), dtype=np.int64, format='csr')
+        adjacency.eliminate_zeros()
+        adjacency.sort_indices()
+        self.adjacency = adjacency
+
+    def __len__(self):
+        """
+        Número de nodos.
+        """
+        return len(self.node_ids)
+
+    @property
+    def edge_count(self):
+        """
+        Número de aristas (cada arista aparece dos veces en la matriz simétrica).
+        """
+        return self.adjacency.nnz // 2
+
+    def degrees(self):
+        """
+        Número de vecinos de cada nodo.
+        """
+        return np.diff(self.adjacency.indptr)
+
+    def weighted_degrees(self):
+        """
+        Suma de los pesos de las aristas de cada nodo.
+        """
+        return np.asarray(self.adjacency.sum(axis=1)).ravel()
+
+    def edges(self):
+        """
+        Aristas del triángulo superior de la matriz.
+
+        :return: Tupla de arreglos (origen, destino, peso).
+        """
+        upper = sparse.triu(self.adjacency, k=1).tocoo()
+        return upper.row, upper.col, upper.data
+
+    def subgraph(self, nodes):
+        """
+        Subgrafo inducido por un conjunto de nodos, en su orden original.
+
+        :param nodes: Arreglo de índices de nodos a conservar.
+        """
+        nodes = np.sort(np.asarray(nodes, dtype=np.int64))
+        return CooccurrenceGraph(
+            [self.node_ids[i] for i in nodes],
+            [self.labels[i] for i in nodes],
+            [self.types[i] for i in nodes],
+            self.adjacency[nodes][:, nodes],
+        )
+
+    def filtered(self, min_weight=1, min_degree=1, max_nodes=None):
+        """
+        Aplica umbrales al grafo.
+
+        1. Se eliminan las aristas con peso menor que min_weight.
+        2. Si se indica max_nodes, se conservan los nodos con mayor grado ponderado
+           (los empates se resuelven por el orden original).
+        3. Se eliminan repetidamente los nodos con menos de min_degree vecinos, de modo
+           que todo nodo del resultado tiene al menos min_degree vecinos (k-core).
+
+        :return: Nuevo CooccurrenceGraph; el original no se modifica.
+        """
+        adjacency = self.adjacency.copy()
+        if min_weight > 1:
+            adjacency.data[adjacency.data < min_weight] = 0
+            adjacency.eliminate_zeros()
+        graph = CooccurrenceGraph(self.node_ids, self.labels, self.types, adjacency)
+
+        if max_nodes is not None and len(graph) > max_nodes:
+            order = np.lexsort((np.arange(len(graph)), -graph.weighted_degrees()))
+            graph = graph.subgraph(order[:max_nodes])
+
+        if min_degree > 0:
+            while len(graph):
+                keep = np.flatnonzero(graph.degrees() >= min_degree)
+                if len(keep) == len(graph):
+                    break
+                graph = graph.subgraph(keep)
+        return graph
+
+    def nbytes(self):
+        """
+        Memoria aproximada de la matriz de adyacencia y de los nodos, en bytes.
+        """
+        adjacency = self.adjacency.data.nbytes + self.adjacency.indices.nbytes + self.adjacency.indptr.nbytes
+        nodes = sum(sys.getsizeof(value) for value in chain(self.node_ids, self.labels))
+        return adjacency + nodes + sum(sys.getsizeof(values) for values in (self.node_ids, self.labels, self.types))
+
+    def digest(self):
+        """
+        Hash del grafo (nodos y aristas con sus pesos), usado como clave de la disposición guardada.
+        """
+        sha = hashlib.sha256()
+        for node_id in self.node_ids:
+            sha.update(node_id.encode('utf-8'))
+            sha.update(b"\0")
+        for array in (self.adjacency.indptr, self.adjacency.indices, self.adjacency.data):
+            sha.update(np.ascontiguousarray(array, dtype=np.int64).tobytes())
+        return sha.hexdigest()
+
+    def to_networkx(self):
+        """
+        Grafo de networkx equivalente, con el atributo "type" en cada nodo y "weight" en cada arista.
+        """
+        graph = nx.Graph()
+        for node_id, label, node_type in zip(self.node_ids, self.labels, self.types):
+            graph.add_node(node_id, label=label, type=node_type)
+        for source, target, weight in zip(*self.edges()):
+            graph.add_edge(self.node_ids[source], self.node_ids[target], weight=int(weight))
+        return graph
+
+    def to_json(self, positions=None):
+        """
+        Nodos y aristas listos para serializar a JSON y dibujar en el navegador.
+
+        :param positions: Arreglo (n x 2) con la disposición, o None para omitir x/y.
+        :return: Diccionario {'nodes': [...], 'edges': [...]}; las aristas refieren a los
+                 nodos por su posición en la lista.
+        """
+        degrees = self.degrees()
+        weighted = self.weighted_degrees()
+        nodes = []
+        for i, (node_id, label, node_type) in enumerate(zip(self.node_ids, self.labels, self.types)):
+            node = {'id': node_id, 'label': label, 'type': node_type,
+                    'degree': int(degrees[i]), 'weight': int(weighted[i])}
+            if positions is not None:
+                node['x'] = round(float(positions[i, 0]), 5)
+                node['y'] = round(float(positions[i, 1]), 5)
+            nodes.append(node)
+        sources, targets, weights = self.edges()
+        edges = [{'source': int(s), 'target': int(t), 'weight': int(w)} for s, t, w in zip(sources, targets, weights)]
+        return {'nodes': nodes, 'edges': edges}
+
+
+def term_matrix(matcher, frequency_index, size):
+    """
+    Matriz documento-término con el número de menciones de cada término en cada abstract.
+
+    Los conteos por patrón del índice de frecuencias se proyectan a las claves de la
+    taxonomía con las mismas contribuciones que usa analyze_frequency.
+
+    :param size: Número de entradas del corpus (filas de la matriz).
+    :return: Tupla (lista de (categoría, clave), matriz dispersa size x términos).
+    """
+    terms = [(category, key) for category, keys in matcher.layout.items() for key in keys]
+    term_ids = {term: i for i, term in enumerate(terms)}
+
+    rows, cols, data = [], [], []
+    for pattern_id, contributions in enumerate(matcher.contributions):
+        for category, key, weight in contributions:
+            rows.append(pattern_id)
+            cols.append(term_ids[(category, key)])
+            data.append(weight)
+    patterns_to_terms = sparse.csr_matrix(
+        (data, (rows, cols)), shape=(len(matcher.patterns), len(terms)), dtype=np.int64)
+
+    rows, cols, data = [], [], []
+    for key, vector in frequency_index.items():
+        for pattern_id, count in vector:
+            rows.append(key)
+            cols.append(pattern_id)
+            data.append(count)
+    documents = sparse.csr_matrix((data, (rows, cols)), shape=(size, len(matcher.patterns)), dtype=np.int64)
+
+    return terms, (documents @ patterns_to_terms).tocsr()
+
+
+def build_graph(kind, entries, frame, matcher, frequency_index):
+    """
+    Construye un grafo de co-ocurrencia sobre todo el corpus.
+
+    :param kind: Uno de GRAPH_KINDS.
+    :param entries: Entradas del corpus.
+    :param frame: CorpusFrame de las mismas entradas (columna journal/ISSN).
+    :param matcher: TermMatcher de la taxonomía.
+    :param frequency_index: FrequencyIndex de las mismas entradas.
+    :return: CooccurrenceGraph sin umbrales.
+    """
+    if kind not in GRAPH_KINDS:
+        raise ValueError(f"Tipo de grafo no soportado: {kind}")
+
+    terms, mentions = term_matrix(matcher, frequency_index, len(entries))
+    presence = mentions.copy()
+    presence.data[:] = 1
+    term_ids = [f"termino:{category}:{key}" for category, key in terms]
+    term_labels = [key for _, key in terms]
+
+    if kind == TERM_GRAPH:
+        # Co-ocurrencias: número de abstracts en los que aparecen ambos términos
+        adjacency = presence.T @ presence
+        return CooccurrenceGraph(term_ids, term_labels, ['term'] * len(terms), adjacency)
+
+    journals = frame.column(('journal', 'issn'))
+    codes = np.asarray(journals.codes, dtype=np.int64)
+    with_journal = np.flatnonzero(codes >= 0)
+    journal_ids = [f"journal:{name}" for name in journals.categories]
+    journal_labels = list(journals.categories)
+    # Matriz artículo-journal (una columna por journal)
+    membership = sparse.csr_matrix(
+        (np.ones(len(with_journal), dtype=np.int64), (with_journal, codes[with_journal])),
+        shape=(len(entries), len(journal_ids)),
+    )
+
+    if kind == JOURNAL_TERM_GRAPH:
+        # Peso journal-término: abstracts del journal que mencionan el término
+        bipartite = membership.T @ presence
+        adjacency = sparse.bmat([[None, bipartite], [bipartite.T, None]],
+                                format='csr', dtype=np.int64)
+        return CooccurrenceGraph(journal_ids + term_ids, journal_labels + term_labels,
+                                 ['journal'] * len(journal_ids) + ['term'] * len(terms), adjacency)
+
+    # Peso artículo-término: menciones del término en el abstract
+    article_ids = [f"articulo:{entry.get('ID', i)}:{i}" for i, entry in enumerate(entries)]
+    article_labels = [entry.get('title', 'No title') for entry in entries]
+    adjacency = sparse.bmat([
+        [None, membership.T, None],
+        [membership, None, mentions],
+        [None, mentions.T, None],
+    ], format='csr', dtype=np.int64)
+    return CooccurrenceGraph(
+        journal_ids + article_ids + term_ids, journal_labels + article_labels + term_labels,
+        ['journal'] * len(journal_ids) + ['article'] * len(entries) + ['term'] * len(terms), adjacency,
+    )
+
+
+def _spectral_layout(adjacency, seed):
+    """
+    Disposición espectral de un grafo conexo: coordenadas a partir de los dos vectores
+    propios no triviales de la adyacencia normalizada. Cuesta O(aristas) por iteración
+    de Lanczos, por lo que sirve para grafos grandes.
+    """
+    size = adjacency.shape[0]
+    degrees = np.asarray(adjacency.sum(axis=1)).ravel().astype(float)
+    scale = sparse.diags(1.0 / np.sqrt(degrees))
+    normalized = scale @ adjacency.astype(float) @ scale
+    # Vector inicial fijo para que el resultado sea reproducible
+    v0 = np.random.RandomState(seed).rand(size)
+    _, vectors = eigsh(normalized, k=3, which='LA', v0=v0)
+    # eigsh ordena de menor a mayor; el último es el vector trivial
+    positions = vectors[:, [1, 0]]
+    # El signo de un vector propio es arbitrario: se fija para que sea estable
+    for axis in range(2):
+        column = positions[:, axis]
+        if column[np.argmax(np.abs(column))] < 0:
+            positions[:, axis] = -column
+    return positions
+
+
+def _normalize(positions):
+    """
+    Centra la disposición y la escala al cuadrado [-1, 1].
+    """
+    positions = positions - positions.mean(axis=0)
+    extent = np.abs(positions).max()
+    return positions / extent if extent > 0 else positions
+
+
+def compute_layout(graph, seed=42, spring_limit=500, iterations=50):
+    """
+    Calcula una disposición determinista del grafo.
+
+    Cada componente conexa se dispone por separado: las pequeñas con spring_layout
+    (Fruchterman-Reingold, O(n²) por iteración) y las grandes con una disposición
+    espectral aproximada. Luego las componentes se acomodan en filas, de mayor a menor.
+
+    :param seed: Semilla de las disposiciones.
+    :param spring_limit: Tamaño máximo de componente que se dispone con spring_layout.
+    :param iterations: Iteraciones de spring_layout.
+    :return: Arreglo (n x 2) con la posición de cada nodo.
+    """
+    size = len(graph)
+    positions = np.zeros((size, 2))
+    if size == 0:
+        return positions
+
+    count, labels = csgraph.connected_components(graph.adjacency, directed=False)
+    components = [np.flatnonzero(labels == component) for component in range(count)]
+    components.sort(key=lambda nodes: (-len(nodes), nodes[0]))
+
+    layouts = []
+    for nodes in components:
+        if len(nodes) == 1:
+            layout = np.zeros((1, 2))
+        elif len(nodes) <= max(spring_limit, 3):
+            # La disposición espectral necesita más de 3 nodos (eigsh con k=3)
+            subgraph = nx.from_scipy_sparse_array(graph.adjacency[nodes][:, nodes])
+            pos = nx.spring_layout(subgraph, weight='weight', iterations=iterations, seed=seed)
+            layout = _normalize(np.array([pos[i] for i in range(len(nodes))]))
+        else:
+            layout = _normalize(_spectral_layout(graph.adjacency[nodes][:, nodes], seed))
+        # Cada componente ocupa un área proporcional a su número de nodos
+        layouts.append((nodes, layout * np.sqrt(len(nodes))))
+
+    # Acomodo en filas (estantes) de ancho similar al de la componente más grande
+    row_width = max(2 * np.sqrt(len(components[0])), 2 * np.sqrt(size / 4))
+    x = y = row_height = 0.0
+    for nodes, layout in layouts:
+        radius = max(np.sqrt(len(nodes)), 0.5)
+        if x > 0 and x + 2 * radius > row_width:
+            x, y = 0.0, y - row_height
+            row_height = 0.0
+        positions[nodes] = layout + (x + radius, y - radius)
+        x += 2 * radius + 0.5
+        row_height = max(row_height, 2 * radius + 0.5)
+    return _normalize(positions)
+
+
+class LayoutStore:
+    def __init__(self, directory=None, max_entries=32):
+        """
+        Disposiciones ya calculadas, identificadas por el hash del grafo y los parámetros.
+        Se guardan en memoria y, si se indica un directorio, en disco (un .npy por
+        disposición), de modo que sobreviven a los reinicios y se comparten entre workers.
+
+        :param directory: Directorio donde guardar las disposiciones (None para solo memoria).
+        :param max_entries: Disposiciones que se conservan en memoria.
+        """
+        self.directory = directory
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(graph, seed, spring_limit, iterations):
+        """
+        Clave de la disposición de un grafo con ciertos parámetros.
+        """
+        return f"{graph.digest()[:32]}-v{LAYOUT_VERSION}-s{seed}-l{spring_limit}-i{iterations}"
+
+    def _path(self, key):
+        """
+        Ruta del archivo de una disposición.
+        """
+        return os.path.join(self.directory, f"{key}.npy")
+
+    def get(self, key):
+        """
+        Devuelve la disposición guardada, o None.
+        """
+        with self._lock:
+            positions = self._memory.get(key)
+            if positions is not None:
+                self._memory.move_to_end(key)
+                return positions
+        if self.directory:
+            try:
+                positions = np.load(self._path(key))
+            except (OSError, ValueError):
+                return None
+            self._remember(key, positions)
+            return positions
+        return None
+
+    def put(self, key, positions):
+        """
+        Guarda una disposición en memoria y, si corresponde, en disco (escritura atómica).
+        """
+        self._remember(key, positions)
+        if self.directory:
+            tmp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "wb") as layout_file:
+                    np.save(layout_file, positions)
+                os.replace(tmp_path, self._path(key))
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def _remember(self, key, positions):
+        """
+        Guarda una disposición en la memoria, descartando la menos usada si hace falta.
+        """
+        with self._lock:
+            self._memory[key] = positions
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def lookup(self, graph, seed=42, spring_limit=500, iterations=50):
+        """
+        Busca la disposición guardada del grafo, sin calcularla.
+
+        :return: Tupla (clave, posiciones o None).
+        """
+        key = self.key(graph, seed, spring_limit, iterations)
+        positions = self.get(key)
+        Metrics.record_cache('graph_layout', positions is not None)
+        return key, positions
+
+    def layout(self, graph, seed=42, spring_limit=500, iterations=50):
+        """
+        Disposición del grafo: la guardada si el grafo no cambió, o una nueva.
+
+        :return: Arreglo (n x 2) con la posición de cada nodo.
+        """
+        key, positions = self.lookup(graph, seed, spring_limit, iterations)
+        if positions is None:
+            with Metrics.stage('graph_layout'):
+                positions = compute_layout(graph, seed, spring_limit, iterations)
+            self.put(key, positions)
+        return positions
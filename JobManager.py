@@ -0,0 +1,285 @@
+# job_manager.py
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Estados posibles de un trabajo
+PENDING = 'pendiente'
+RUNNING = 'ejecutando'
+DONE = 'completado'
+FAILED = 'error'
+FINISHED_STATES = (DONE, FAILED)
+
+
+class MemoryJobStore:
+    def __init__(self, max_jobs=1000, max_bytes=256 * 1024 * 1024):
+        """
+        Almacén de trabajos en la memoria del proceso.
+
+        Si los trabajos terminados superan max_jobs o sus resultados superan max_bytes,
+        se eliminan los terminados más antiguos (los que están en curso no se eliminan).
+
+        :param max_jobs: Número máximo de trabajos guardados.
+        :param max_bytes: Tamaño máximo aproximado (JSON) de los resultados guardados.
+        """
+        self.max_jobs = max_jobs
+        self.max_bytes = max_bytes
+        self._jobs = {}
+        self._finished = OrderedDict()  # id -> (momento de término, bytes), del más antiguo al más nuevo
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def save(self, job):
+        """
+        Guarda (o reemplaza) un trabajo.
+        """
+        size = len(json.dumps(job['result'])) if job['finished'] is not None else 0
+        with self._lock:
+            self._forget(job['id'])
+            self._jobs[job['id']] = dict(job)
+            if job['finished'] is not None:
+                self._finished[job['id']] = (job['finished'], size)
+                self._bytes += size
+            while self._finished and (len(self._jobs) > self.max_jobs or self._bytes > self.max_bytes):
+                oldest = next(iter(self._finished))
+                self._forget(oldest)
+                del self._jobs[oldest]
+
+    def _forget(self, job_id):
+        """
+        Quita un trabajo del índice de terminados (con el lock tomado).
+        """
+        finished = self._finished.pop(job_id, None)
+        if finished is not None:
+            self._bytes -= finished[1]
+
+    def load(self, job_id):
+        """
+        Devuelve una copia del trabajo, o None si no existe.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def delete(self, job_id):
+        """
+        Elimina un trabajo si existe.
+        """
+        with self._lock:
+            self._forget(job_id)
+            self._jobs.pop(job_id, None)
+
+    def list_ids(self):
+        """
+        Devuelve los IDs de todos los trabajos guardados.
+        """
+        with self._lock:
+            return list(self._jobs)
+
+    def expire(self, limit):
+        """
+        Elimina los trabajos terminados antes de limit, usando solo el índice de terminados.
+
+        :param limit: Momento (time.time()) límite.
+        """
+        with self._lock:
+            expired = [job_id for job_id, (finished, _) in self._finished.items() if finished < limit]
+            for job_id in expired:
+                self._forget(job_id)
+                del self._jobs[job_id]
+
+
+class FileJobStore:
+    def __init__(self, directory):
+        """
+        Almacén de trabajos en archivos JSON locales (uno por trabajo). Permite que
+        otros procesos del mismo host (por ejemplo, otros workers de gunicorn)
+        consulten el estado de un trabajo sin un servicio externo.
+
+        :param directory: Directorio donde se guardan los trabajos.
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, job_id):
+        """
+        Ruta del archivo JSON de un trabajo.
+        """
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def save(self, job):
+        """
+        Guarda (o reemplaza) un trabajo.
+        """
+        # Escritura atómica para que un lector nunca vea un JSON a medias
+        tmp_path = f"{self._path(job['id'])}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as job_file:
+            json.dump(job, job_file)
+        os.replace(tmp_path, self._path(job['id']))
+
+    def load(self, job_id):
+        """
+        Devuelve una copia del trabajo, o None si no existe.
+        """
+        try:
+            with open(self._path(job_id), encoding="utf-8") as job_file:
+                return json.load(job_file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def delete(self, job_id):
+        """
+        Elimina un trabajo si existe.
+        """
+        try:
+            os.remove(self._path(job_id))
+        except FileNotFoundError:
+            pass
+
+    def list_ids(self):
+        """
+        Devuelve los IDs de todos los trabajos guardados.
+        """
+        return [name[:-5] for name in os.listdir(self.directory) if name.endswith(".json")]
+
+    def expire(self, limit):
+        """
+        Elimina los trabajos terminados antes de limit. Solo se leen los archivos no
+        modificados desde limit: un trabajo se escribe por última vez al terminar.
+
+        :param limit: Momento (time.time()) límite.
+        """
+        with os.scandir(self.directory) as files:
+            candidates = [f.name[:-5] for f in files
+                          if f.name.endswith(".json") and f.stat().st_mtime < limit]
+        for job_id in candidates:
+            job = self.load(job_id)
+            if job is not None and job['finished'] is not None and job['finished'] < limit:
+                self.delete(job_id)
+
+
+class JobManager:
+    def __init__(self, max_workers=2, ttl=3600, store=None, poll_interval=0.5):
+        """
+        Ejecuta análisis costosos en segundo plano y guarda su estado y resultado.
+
+        Las solicitudes idénticas (misma clave) mientras un trabajo está en curso se
+        unifican en un solo trabajo.
+
+        :param max_workers: Número de hilos que ejecutan trabajos.
+        :param ttl: Segundos que se conserva un trabajo terminado.
+        :param store: Almacén de trabajos (por defecto, MemoryJobStore).
+        :param poll_interval: Intervalo (s) con el que wait revisa el almacén.
+        """
+        self.ttl = ttl
+        self.store = store or MemoryJobStore()
+        self.poll_interval = poll_interval
+        self._executor = None
+        self._max_workers = max_workers
+        self._inflight = {}  # clave -> id del trabajo en curso
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._changes = 0  # Contador de actualizaciones, para no perder avisos en wait
+
+    def _get_executor(self):
+        """
+        Crea los hilos bajo demanda (ver RenderPool._get_executor).
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="trabajo")
+        return self._executor
+
+    def submit(self, key, job_type, function):
+        """
+        Registra un trabajo y lo ejecuta en segundo plano.
+
+        :param key: Clave que identifica trabajos equivalentes (tipo, parámetros, corpus).
+        :param job_type: Nombre del tipo de análisis, informativo.
+        :param function: Función sin argumentos cuyo resultado se guarda (serializable a JSON).
+        :return: Diccionario con el estado del trabajo.
+        """
+        self._expire()
+        with self._lock:
+            job_id = self._inflight.get(key)
+            if job_id is not None:
+                job = self.store.load(job_id)
+                if job is not None and job['status'] not in FINISHED_STATES:
+                    return job
+
+            job = {
+                'id': uuid.uuid4().hex,
+                'type': job_type,
+                'status': PENDING,
+                'result': None,
+                'error': None,
+                'created': time.time(),
+                'finished': None,
+            }
+            self.store.save(job)
+            self._inflight[key] = job['id']
+            self._get_executor().submit(self._run, key, job, function)
+            return dict(job)
+
+    def _run(self, key, job, function):
+        """
+        Ejecuta el trabajo y guarda su resultado o su error.
+        """
+        self._update(job, status=RUNNING)
+        try:
+            result = function()
+        except Exception as e:
+            self._update(job, status=FAILED, error=str(e), finished=time.time())
+        else:
+            self._update(job, status=DONE, result=result, finished=time.time())
+        finally:
+            with self._lock:
+                if self._inflight.get(key) == job['id']:
+                    del self._inflight[key]
+
+    def _update(self, job, **changes):
+        """
+        Actualiza el trabajo en el almacén y despierta a quienes esperan cambios.
+        """
+        job.update(changes)
+        self.store.save(job)
+        with self._lock:
+            self._changes += 1
+            self._changed.notify_all()
+
+    def get(self, job_id):
+        """
+        Devuelve el estado de un trabajo, o None si no existe (o ya expiró).
+        """
+        return self.store.load(job_id)
+
+    def wait(self, job_id, last_status=None, timeout=15):
+        """
+        Espera hasta que el estado del trabajo sea distinto de last_status o pase el timeout.
+
+        :return: Diccionario con el estado del trabajo, o None si no existe.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            # El almacén se lee sin el lock; el contador indica si hubo cambios mientras tanto
+            with self._lock:
+                changes = self._changes
+            job = self.store.load(job_id)
+            if job is None or job['status'] != last_status:
+                return job
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return job
+            with self._lock:
+                if self._changes == changes:
+                    # Se revisa el almacén periódicamente por si otro proceso lo actualiza
+                    self._changed.wait(min(remaining, self.poll_interval))
+
+    def _expire(self):
+        """
+        Elimina los trabajos terminados hace más de ttl segundos.
+        """
+        self.store.expire(time.time() - self.ttl)
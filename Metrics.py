@@ -0,0 +1,281 @@
+# metrics.py
+import threading
+import time
+from contextlib import contextmanager
+
+# Límites de los histogramas: segundos (latencias) y bytes (tamaños de respuesta)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 512 * 1024, 1024 ** 2, 5 * 1024 ** 2, 20 * 1024 ** 2)
+
+# Descripción de cada métrica, usada en las líneas # HELP
+METRIC_HELP = {
+    'app_stage_duration_seconds': 'Duración de cada etapa del lector, el analizador y el renderizado.',
+    'app_payload_bytes': 'Tamaño de los resultados producidos por cada etapa.',
+    'app_cache_requests_total': 'Consultas a cada caché, por resultado (hit o miss).',
+    'app_cache_hit_ratio': 'Proporción de aciertos de cada caché desde el inicio del proceso.',
+    'app_http_request_duration_seconds': 'Duración de las solicitudes HTTP por endpoint.',
+    'app_http_response_bytes': 'Tamaño del cuerpo de las respuestas HTTP por endpoint.',
+}
+
+# Pila de colectores activos en cada hilo (para el perfil de una sola solicitud)
+_local = threading.local()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        """
+        Histograma acumulativo con límites fijos, en el formato de Prometheus.
+
+        :param buckets: Límites superiores de los intervalos, en orden creciente.
+        """
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """
+        Registra una observación.
+        """
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """
+        Registro de métricas del proceso: histogramas y contadores con etiquetas.
+
+        Cada proceso (por ejemplo, cada worker de gunicorn) tiene su propio registro;
+        /metrics expone el del worker que atiende la solicitud.
+        """
+        self._lock = threading.Lock()
+        self._histograms = {}  # (nombre, etiquetas) -> Histogram
+        self._counters = {}  # (nombre, etiquetas) -> valor
+
+    @staticmethod
+    def _labels(labels):
+        """
+        Etiquetas como tupla ordenada, usable como clave de diccionario.
+        """
+        return tuple(sorted(labels.items()))
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        """
+        Registra una observación en un histograma, creándolo si no existe.
+        """
+        key = (name, self._labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def increment(self, name, amount=1, **labels):
+        """
+        Incrementa un contador, creándolo si no existe.
+        """
+        key = (name, self._labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def counter(self, name, **labels):
+        """
+        Valor actual de un contador (0 si no existe).
+        """
+        with self._lock:
+            return self._counters.get((name, self._labels(labels)), 0)
+
+    def clear(self):
+        """
+        Elimina todas las métricas registradas.
+        """
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self):
+        """
+        Exporta las métricas en el formato de texto de Prometheus (versión 0.0.4).
+
+        :return: Texto con una línea por serie.
+        """
+        with self._lock:
+            histograms = {key: (list(h.buckets), list(h.counts), h.count, h.sum)
+                          for key, h in self._histograms.items()}
+            counters = dict(self._counters)
+
+        # Proporción de aciertos derivada de los contadores de cada caché
+        caches = {dict(labels)['cache'] for (name, labels) in counters if name == 'app_cache_requests_total'}
+        gauges = {}
+        for cache in caches:
+            hits = counters.get(('app_cache_requests_total', self._labels({'cache': cache, 'result': 'hit'})), 0)
+            misses = counters.get(('app_cache_requests_total', self._labels({'cache': cache, 'result': 'miss'})), 0)
+            if hits + misses:
+                gauges[('app_cache_hit_ratio', (('cache', cache),))] = hits / (hits + misses)
+
+        lines = []
+        for metric_type, series in (('counter', counters), ('gauge', gauges), ('histogram', histograms)):
+            for name in sorted({name for name, _ in series}):
+                lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for (series_name, labels), value in sorted(series.items()):
+                    if series_name != name:
+                        continue
+                    if metric_type != 'histogram':
+                        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                        continue
+                    buckets, counts, count, total = value
+                    for bound, bucket_count in zip(buckets, counts):
+                        bucket_labels = labels + (('le', _format_value(bound)),)
+                        lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {bucket_count}")
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    """
+    Etiquetas en la sintaxis de Prometheus: {clave="valor",...}.
+    """
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def _format_value(value):
+    """
+    Número en la sintaxis de Prometheus.
+    """
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+# Registro compartido por todo el proceso
+REGISTRY = MetricsRegistry()
+
+
+class StageCollector:
+    def __init__(self):
+        """
+        Acumula las etapas medidas en el hilo actual mientras está activo, para
+        obtener el desglose de una sola solicitud.
+        """
+        self.stages = []  # Lista de (etapa, segundos) en el orden en que terminaron
+        self._active = False
+
+    def start(self):
+        """
+        Empieza a recibir las etapas medidas en este hilo.
+        """
+        if not self._active:
+            stack = getattr(_local, 'collectors', None)
+            if stack is None:
+                stack = _local.collectors = []
+            stack.append(self)
+            self._active = True
+        return self
+
+    def stop(self):
+        """
+        Deja de recibir etapas. Puede llamarse más de una vez.
+        """
+        if self._active:
+            _local.collectors.remove(self)
+            self._active = False
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def totals(self):
+        """
+        Tiempo total y número de llamadas por etapa.
+
+        :return: Diccionario etapa -> {'segundos', 'llamadas'}, en orden de aparición.
+        """
+        totals = {}
+        for stage_name, seconds in self.stages:
+            total = totals.setdefault(stage_name, {'segundos': 0.0, 'llamadas': 0})
+            total['segundos'] += seconds
+            total['llamadas'] += 1
+        return totals
+
+
+def record_stage(name, seconds):
+    """
+    Registra la duración de una etapa en el histograma y en los colectores activos del hilo.
+    """
+    REGISTRY.observe('app_stage_duration_seconds', seconds, stage=name)
+    for collector in getattr(_local, 'collectors', ()):
+        collector.stages.append((name, seconds))
+
+
+@contextmanager
+def stage(name):
+    """
+    Mide la duración del bloque como una etapa. También se puede usar como decorador.
+
+    :param name: Nombre de la etapa (por ejemplo, 'bibtex_parse' o 'network_layout').
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def record_size(name, size):
+    """
+    Registra el tamaño en bytes del resultado de una etapa.
+    """
+    REGISTRY.observe('app_payload_bytes', size, buckets=SIZE_BUCKETS, stage=name)
+
+
+def record_cache(cache, hit):
+    """
+    Registra una consulta a una caché.
+
+    :param cache: Nombre de la caché.
+    :param hit: True si el resultado estaba en la caché.
+    """
+    REGISTRY.increment('app_cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+
+def run_collecting(function, args):
+    """
+    Ejecuta function(*args) recolectando sus etapas. Se usa en los procesos del pool
+    de renderizado, cuyo registro no es visible desde el proceso que atiende la solicitud.
+
+    :return: Tupla (resultado, lista de (etapa, segundos)).
+    """
+    with StageCollector() as collector:
+        result = function(*args)
+    return result, collector.stages
+
+
+def merge_stages(stages):
+    """
+    Registra en este proceso las etapas medidas en otro (ver run_collecting).
+    """
+    for name, seconds in stages:
+        record_stage(name, seconds)
+
+
+def render_text():
+    """
+    Métricas del proceso en el formato de texto de Prometheus.
+    """
+    return REGISTRY.render()
@@ -0,0 +1,403 @@
+# renderer.py
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+import networkx as nx
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from wordcloud import WordCloud
+
+import Metrics
+
+# Las funciones render_* usan la API orientada a objetos de matplotlib (Figure),
+# sin el estado global de pyplot, por lo que son seguras en hilos y se pueden
+# ejecutar en procesos separados. Reciben solo datos simples (serializables).
+
+
+def _figure_to_bytes(fig, fmt):
+    """
+    Guarda una figura en memoria.
+
+    :param fig: Figura de matplotlib.
+    :param fmt: Formato de la imagen ('png', 'webp' o 'svg').
+    :return: Bytes de la imagen.
+    """
+    with Metrics.stage('savefig'):
+        FigureCanvasAgg(fig)
+        img_buffer = BytesIO()
+        fig.savefig(img_buffer, format=fmt)
+        return img_buffer.getvalue()
+
+
+def render_bar_chart(labels, counts, title, xlabel, ylabel, fmt='png'):
+    """
+    Dibuja un gráfico de barras horizontales.
+
+    :return: Bytes de la imagen.
+    """
+    with Metrics.stage('bar_chart_draw'):
+        fig = Figure(figsize=(10, 6))
+        ax = fig.add_subplot()
+        ax.barh(labels, counts, color='skyblue')
+        ax.set_title(title)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        fig.tight_layout()
+    return _figure_to_bytes(fig, fmt)
+
+
+def render_word_cloud(frequencies, fmt='png'):
+    """
+    Genera una nube de palabras a partir de un diccionario palabra -> frecuencia.
+
+    :return: Bytes de la imagen.
+    """
+    with Metrics.stage('word_cloud_layout'):
+        wordcloud = WordCloud(width=800, height=400, background_color="white").generate_from_frequencies(frequencies)
+
+    with Metrics.stage('savefig'):
+        if fmt == 'svg':
+            return wordcloud.to_svg(embed_font=False).encode('utf-8')
+
+        img_buffer = BytesIO()
+        wordcloud.to_image().save(img_buffer, format=fmt.upper())
+        return img_buffer.getvalue()
+
+
+def render_network(graph, fmt='png', seed=None):
+    """
+    Calcula la disposición del grafo de journals, artículos y países y lo dibuja.
+
+    :param graph: Grafo de networkx con el atributo "type" en cada nodo.
+    :param seed: Semilla de spring_layout (None para una disposición distinta en cada llamada).
+    :return: Bytes de la imagen.
+    """
+    with Metrics.stage('network_layout'):
+        pos = nx.spring_layout(graph, k=1, iterations=50, seed=seed)
+    journals = [node for node, attr in graph.nodes(data=True) if attr["type"] == "journal"]
+    articles = [node for node, attr in graph.nodes(data=True) if attr["type"] == "article"]
+    countries = [node for node, attr in graph.nodes(data=True) if attr["type"] == "country"]
+
+    with Metrics.stage('network_draw'):
+        fig = Figure(figsize=(25, 25))
+        ax = fig.add_subplot()
+        nx.draw_networkx_nodes(graph, pos, nodelist=journals, node_color="lightcoral", node_size=2000, label="Journals", ax=ax)
+        nx.draw_networkx_nodes(graph, pos, nodelist=articles, node_color="skyblue", node_size=1500, label="Articles", ax=ax)
+        nx.draw_networkx_nodes(graph, pos, nodelist=countries, node_color="lightgreen", node_size=1000, label="Countries", ax=ax)
+        nx.draw_networkx_edges(graph, pos, edge_color="gray", alpha=0.5, ax=ax)
+        nx.draw_networkx_labels(graph, pos, font_size=5, font_weight="bold", ax=ax)
+    return _figure_to_bytes(fig, fmt)
+
+
+# Color de cada tipo de nodo en los grafos de co-ocurrencia
+NODE_COLORS = {'journal': 'lightcoral', 'article': 'skyblue', 'term': 'lightgreen'}
+
+
+def render_cooccurrence(positions, sources, targets, weights, labels, types, fmt='png', max_labels=150):
+    """
+    Dibuja un grafo de co-ocurrencia con una disposición ya calculada. Las aristas se
+    dibujan en una sola LineCollection, por lo que el costo crece linealmente con su número.
+
+    :param positions: Arreglo (n x 2) con la posición de cada nodo.
+    :param sources: Índice del nodo de origen de cada arista.
+    :param targets: Índice del nodo de destino de cada arista.
+    :param weights: Peso de cada arista.
+    :param labels: Texto de cada nodo.
+    :param types: Tipo de cada nodo ('journal', 'article' o 'term').
+    :param max_labels: Se escriben solo las etiquetas de los max_labels nodos de mayor grado.
+    :return: Bytes de la imagen.
+    """
+    with Metrics.stage('cooccurrence_draw'):
+        positions = np.asarray(positions).reshape(-1, 2)
+        weights = np.asarray(weights, dtype=float)
+        fig = Figure(figsize=(25, 25))
+        ax = fig.add_subplot()
+        ax.set_axis_off()
+
+        if len(weights):
+            segments = np.stack([positions[sources], positions[targets]], axis=1)
+            widths = 0.3 + 2.0 * np.log1p(weights) / np.log1p(weights.max())
+            ax.add_collection(LineCollection(segments, colors='gray', linewidths=widths, alpha=0.3, zorder=1))
+
+        degrees = np.bincount(np.concatenate([sources, targets]).astype(int), minlength=len(labels))
+        sizes = 20 + 400 * np.sqrt(degrees / max(degrees.max(), 1)) if len(labels) else []
+        for node_type, color in NODE_COLORS.items():
+            nodes = [i for i, t in enumerate(types) if t == node_type]
+            if nodes:
+                ax.scatter(positions[nodes, 0], positions[nodes, 1], s=np.asarray(sizes)[nodes],
+                           c=color, label=node_type, zorder=2, edgecolors='white', linewidths=0.5)
+
+        for i in np.argsort(-degrees, kind='stable')[:max_labels]:
+            ax.annotate(labels[i], positions[i], fontsize=7, ha='center', va='center', zorder=3)
+        if len(labels):
+            ax.legend(loc='upper right')
+        ax.autoscale_view()
+    return _figure_to_bytes(fig, fmt)
+
+
+class RenderPoolBusy(Exception):
+    """
+    La cola de renderizado está llena.
+    """
+
+
+class RenderTimeout(Exception):
+    """
+    Un trabajo de renderizado superó su tiempo máximo.
+    """
+
+
+class RenderPoolBroken(Exception):
+    """
+    Un proceso del pool terminó de forma inesperada mientras renderizaba; el pool se
+    recrea para los trabajos siguientes.
+    """
+
+
+class RenderPool:
+    def __init__(self, max_workers=None, timeout=60, max_queue=16):
+        """
+        Pool de procesos acotado para renderizar figuras fuera del hilo de la solicitud.
+
+        :param max_workers: Número de procesos (None usa el número de CPUs; 0 renderiza
+                            en el hilo que llama, útil en desarrollo).
+        :param timeout: Segundos máximos que se espera cada trabajo.
+        :param max_queue: Número máximo de trabajos pendientes o en ejecución.
+        """
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_queue = max_queue
+        self._executor = None
+        self._pending = 0
+        self._slots = {}  # Future que ocupa un lugar en la cola -> pool que lo ejecuta
+        self._retired = {}  # Pool retirado por un trabajo colgado -> sus procesos
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        """
+        Crea el pool bajo demanda, para que no exista antes de que gunicorn haga fork
+        (lo mismo vale para los hilos de JobManager).
+        """
+        if self._executor is None:
+            # "spawn" evita heredar hilos y locks del proceso padre
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def _discard(self, executor):
+        """
+        Descarta un pool roto (un proceso murió) para que el siguiente trabajo cree uno
+        nuevo. Si otro hilo ya lo reemplazó, el pool nuevo se conserva.
+        """
+        with self._lock:
+            if self._executor is executor:
+                logging.warning("Pool de renderizado roto, se reinicia")
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def _abandon(self, future, executor):
+        """
+        Deja de esperar un trabajo. Si aún no empezó se cancela; si ya está en ejecución
+        no se puede interrumpir dentro del pool, así que se libera su lugar en la cola y
+        el pool se retira: los trabajos siguientes van a un pool nuevo y los procesos del
+        viejo se terminan cuando ya no tiene otros trabajos pendientes.
+        """
+        if future.cancel() or future.done():
+            return
+        with self._lock:
+            if self._slots.pop(future, None) is not None:
+                self._pending -= 1
+            if self._executor is executor:
+                logging.warning("Un renderizado no terminó a tiempo; se reinicia el pool")
+                self._executor = None
+            retire = executor not in self._retired
+            if retire:
+                # ProcessPoolExecutor no ofrece (antes de Python 3.14) cómo terminar sus
+                # procesos; se toman antes de shutdown, que olvida la lista
+                self._retired[executor] = list((getattr(executor, '_processes', None) or {}).values())
+        if retire:
+            executor.shutdown(wait=False)
+        self._reap(executor)
+
+    def _reap(self, executor):
+        """
+        Termina los procesos de un pool retirado si ya no tiene trabajos pendientes.
+        """
+        with self._lock:
+            if executor not in self._retired or any(owner is executor for owner in self._slots.values()):
+                return
+            processes = self._retired.pop(executor)
+        for process in processes:
+            process.terminate()
+
+    def _release(self, future):
+        """
+        Libera un lugar en la cola cuando un trabajo termina (si no se liberó antes al abandonarlo).
+        """
+        with self._lock:
+            executor = self._slots.pop(future, None)
+            if executor is not None:
+                self._pending -= 1
+        if executor is not None and executor in self._retired:
+            self._reap(executor)
+
+    def submit(self, job):
+        """
+        Encola un trabajo de renderizado.
+
+        :param job: Tupla (función, argumentos), por ejemplo la de BibtexAnalyzer.plot_graph_job.
+        :return: Future con los bytes de la imagen.
+        :raises RenderPoolBusy: Si ya hay max_queue trabajos pendientes.
+        """
+        return self._submit(job)[0]
+
+    def _submit(self, job):
+        """
+        Igual que submit, pero devuelve también el pool que recibió el trabajo.
+
+        :return: Tupla (Future, ProcessPoolExecutor).
+        """
+        function, args = job
+        with self._lock:
+            if self._pending >= self.max_queue:
+                raise RenderPoolBusy(f"Hay {self._pending} trabajos de renderizado pendientes")
+            self._pending += 1
+            try:
+                executor = self._get_executor()
+                try:
+                    future = executor.submit(function, *args)
+                except BrokenProcessPool:
+                    # Un proceso murió: se descarta el pool y se crea uno nuevo
+                    logging.warning("Pool de renderizado roto, se reinicia")
+                    executor.shutdown(wait=False)
+                    self._executor = None
+                    executor = self._get_executor()
+                    future = executor.submit(function, *args)
+            except Exception:
+                self._pending -= 1
+                raise
+            self._slots[future] = executor
+        future.add_done_callback(self._release)
+        return future, executor
+
+    def _result(self, future, executor, timeout):
+        """
+        Espera el resultado de un trabajo encolado con _submit.
+
+        :raises TimeoutError: Si no termina dentro de timeout segundos (el trabajo se abandona).
+        :raises RenderPoolBroken: Si el proceso que lo ejecutaba murió.
+        """
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            self._abandon(future, executor)
+            raise
+        except BrokenProcessPool as e:
+            self._discard(executor)
+            raise RenderPoolBroken("Un proceso de renderizado terminó de forma inesperada") from e
+
+    def render(self, job, timeout=None):
+        """
+        Renderiza un trabajo y espera su resultado (ver compute).
+
+        :param job: Tupla (función, argumentos).
+        :param timeout: Segundos máximos de espera (por defecto, self.timeout).
+        :return: Bytes de la imagen.
+        :raises RenderTimeout: Si el trabajo no termina a tiempo.
+        :raises RenderPoolBroken: Si el proceso que lo renderizaba murió.
+        """
+        function, _ = job
+        with Metrics.stage('render_total'):
+            data = self.compute(job, timeout)
+        Metrics.record_size(function.__name__, len(data))
+        return data
+
+    def compute(self, job, timeout=None):
+        """
+        Ejecuta un trabajo en el pool y espera su resultado, que puede ser cualquier
+        valor serializable (por ejemplo, la disposición de un grafo).
+
+        Un trabajo que supera el tiempo máximo se abandona (ver _abandon): no sigue
+        ocupando la cola ni retrasa a los trabajos siguientes.
+
+        Las etapas medidas dentro del proceso del pool se registran en las métricas de
+        este proceso.
+
+        :param job: Tupla (función, argumentos).
+        :param timeout: Segundos máximos de espera (por defecto, self.timeout).
+        :return: Resultado de la función.
+        :raises RenderTimeout: Si el trabajo no termina a tiempo.
+        :raises RenderPoolBroken: Si el proceso que lo ejecutaba murió.
+        """
+        function, args = job
+        if self.max_workers == 0:
+            return function(*args)
+        future, executor = self._submit((Metrics.run_collecting, (function, args)))
+        try:
+            result, stages = self._result(future, executor, timeout or self.timeout)
+        except TimeoutError:
+            raise RenderTimeout(f"El renderizado superó {timeout or self.timeout} segundos")
+        Metrics.merge_stages(stages)
+        return result
+
+    def render_many(self, jobs, timeout=None):
+        """
+        Renderiza varios trabajos en paralelo y espera todos los resultados.
+
+        Los trabajos se encolan por tandas que caben en la cola (max_queue menos los
+        pendientes de otras solicitudes), así que un lote más grande que la cola no
+        falla con RenderPoolBusy si el pool está libre.
+
+        :param jobs: Lista de tuplas (función, argumentos).
+        :param timeout: Segundos máximos de espera de cada tanda (por defecto, self.timeout).
+        :return: Lista de bytes de las imágenes, en el mismo orden que jobs.
+        :raises RenderPoolBusy: Si la cola está llena por otras solicitudes.
+        :raises RenderTimeout: Si algún trabajo no termina a tiempo.
+        :raises RenderPoolBroken: Si un proceso del pool murió.
+        """
+        if self.max_workers == 0:
+            return [self.render(job) for job in jobs]
+
+        timeout = timeout or self.timeout
+        results = []
+        with Metrics.stage('render_total'):
+            while len(results) < len(jobs):
+                with self._lock:
+                    window = max(1, self.max_queue - self._pending)
+                batch = jobs[len(results):len(results) + window]
+                futures = []
+                try:
+                    for function, args in batch:
+                        futures.append(self._submit((Metrics.run_collecting, (function, args))))
+                    deadline = time.monotonic() + timeout
+                    for future, executor in futures:
+                        try:
+                            data, stages = self._result(future, executor, max(0, deadline - time.monotonic()))
+                        except TimeoutError:
+                            raise RenderTimeout(f"El renderizado superó {timeout} segundos")
+                        Metrics.merge_stages(stages)
+                        results.append(data)
+                except Exception:
+                    for future, executor in futures:
+                        self._abandon(future, executor)
+                    raise
+        for (function, _), data in zip(jobs, results):
+            Metrics.record_size(function.__name__, len(data))
+        return results
+
+    def shutdown(self):
+        """
+        Detiene los procesos del pool.
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
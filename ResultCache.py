@@ -0,0 +1,181 @@
+# result_cache.py
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import Metrics
+
+
+class ResultCache:
+    def __init__(self, max_entries=128, max_bytes=64 * 1024 * 1024, ttl=3600, name='result_cache'):
+        """
+        Caché LRU acotada para resultados ya calculados (imágenes, tablas de frecuencia).
+
+        Cada resultado se guarda junto con su ETag fuerte (hash SHA-256 del contenido
+        serializado), de modo que las rutas pueden responder 304 sin volver a renderizar.
+
+        :param max_entries: Número máximo de resultados guardados.
+        :param max_bytes: Tamaño máximo total (en bytes serializados) de los resultados.
+        :param ttl: Segundos que un resultado permanece válido (None para no expirar).
+        :param name: Nombre con el que se reportan los aciertos en las métricas.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.name = name
+        self._lock = threading.Lock()
+        self._items = OrderedDict()  # clave -> (valor, etag, tamaño, expiración)
+        self._inflight = {}  # clave -> Future del cálculo en curso
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(corpus_version, endpoint, params=None):
+        """
+        Construye la clave de un resultado a partir de la versión del corpus,
+        el endpoint y sus parámetros.
+        """
+        # JSON y no una tupla de pares: los valores pueden ser listas o diccionarios (no hashables)
+        return (corpus_version, endpoint, json.dumps(params or {}, sort_keys=True, default=str))
+
+    @staticmethod
+    def _serialize(value):
+        """
+        Representación en bytes del resultado, usada para el ETag y el tamaño.
+        """
+        if isinstance(value, bytes):
+            return value
+        if isinstance(value, str):
+            return value.encode("utf-8")
+        return json.dumps(value, sort_keys=True).encode("utf-8")
+
+    def get(self, key):
+        """
+        Devuelve (valor, etag) si el resultado está en caché y no ha expirado.
+
+        :param key: Clave creada con make_key.
+        :return: Tupla (valor, etag) o None.
+        """
+        with self._lock:
+            cached = self._lookup(key)
+            if cached is None:
+                self.misses += 1
+                Metrics.record_cache(self.name, False)
+                return None
+            self.hits += 1
+            Metrics.record_cache(self.name, True)
+            return cached
+
+    def _lookup(self, key):
+        """
+        Devuelve (valor, etag) si el resultado está vigente, o None (el lock debe estar tomado).
+        """
+        item = self._items.get(key)
+        if item is None:
+            return None
+        value, etag, size, expires = item
+        if expires is not None and expires < time.monotonic():
+            self._remove(key)
+            return None
+        self._items.move_to_end(key)
+        return value, etag
+
+    def put(self, key, value):
+        """
+        Guarda un resultado y descarta los menos usados si se superan los límites.
+
+        :param key: Clave creada con make_key.
+        :param value: Resultado (bytes, str o estructura serializable a JSON).
+        :return: ETag fuerte del resultado.
+        """
+        payload = self._serialize(value)
+        etag = hashlib.sha256(payload).hexdigest()
+        size = len(payload)
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+
+        with self._lock:
+            if key in self._items:
+                self._remove(key)
+            # Un resultado más grande que la caché completa no se guarda
+            if size <= self.max_bytes:
+                self._items[key] = (value, etag, size, expires)
+                self._bytes += size
+                while len(self._items) > self.max_entries or self._bytes > self.max_bytes:
+                    self._remove(next(iter(self._items)))
+        return etag
+
+    def get_or_compute(self, key, compute):
+        """
+        Devuelve el resultado en caché o lo calcula con compute() y lo guarda.
+
+        Si varias solicitudes piden a la vez la misma clave ausente, solo la primera
+        la calcula; las demás esperan ese mismo resultado (o su excepción).
+
+        :param key: Clave creada con make_key.
+        :param compute: Función sin argumentos que calcula el resultado.
+        :return: Tupla (valor, etag).
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            # Otro hilo pudo terminar el cálculo entre get y este punto
+            cached = self._lookup(key)
+            if cached is not None:
+                return cached
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+            result = value, self.put(key, value)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def _remove(self, key):
+        """
+        Elimina una clave (el lock debe estar tomado).
+        """
+        _, _, size, _ = self._items.pop(key)
+        self._bytes -= size
+
+    def __len__(self):
+        """
+        Número de resultados guardados.
+        """
+        return len(self._items)
+
+    def count(self, predicate):
+        """
+        Número de resultados guardados cuya clave cumple predicate.
+        """
+        with self._lock:
+            return sum(1 for key in self._items if predicate(key))
+
+    def clear(self, predicate=None):
+        """
+        Vacía la caché, o elimina solo los resultados cuya clave cumple predicate.
+        """
+        with self._lock:
+            if predicate is None:
+                self._items.clear()
+                self._bytes = 0
+                return
+            for key in [key for key in self._items if predicate(key)]:
+                self._remove(key)
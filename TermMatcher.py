@@ -0,0 +1,181 @@
+# term_matcher.py
+import re
+
+
+class TermMatcher:
+    def __init__(self, categories, equivalences):
+        """
+        Compila los términos de la taxonomía en un único motor de búsqueda.
+
+        Todos los términos (variables, equivalencias y las dos partes de los términos
+        con guion) se combinan en un trie y en una sola expresión regular, de modo que
+        cada abstract se recorre una única vez sin importar cuántos términos existan.
+        Los conteos son idénticos a los de ``str.count``: por cada término se cuentan
+        apariciones no solapadas, de izquierda a derecha.
+
+        :param categories: Diccionario categoría -> lista de variables.
+        :param equivalences: Diccionario variable -> lista de términos equivalentes.
+        """
+        self.patterns = []  # Términos distintos a buscar (en minúsculas)
+        self.contributions = []  # Por patrón: lista de (categoría, clave, peso)
+        self.layout = {}  # Orden de claves por categoría, igual al de analyze_frequency
+        pattern_ids = {}
+
+        for category, variables in categories.items():
+            keys = self.layout.setdefault(category, [])
+            for variable in variables:
+                for eq in equivalences.get(variable, [variable]):
+                    eq_lower = eq.lower()
+                    if eq_lower not in keys:
+                        keys.append(eq_lower)
+
+                    # Si la variable contiene un guion, se cuentan ambas partes por separado
+                    if "-" in eq_lower:
+                        parts = map(str.strip, eq_lower.split("-", 1))
+                    else:
+                        parts = [eq_lower]
+
+                    for part in parts:
+                        if part not in pattern_ids:
+                            pattern_ids[part] = len(self.patterns)
+                            self.patterns.append(part)
+                            self.contributions.append([])
+                        self._add_contribution(pattern_ids[part], category, eq_lower)
+
+        self._empty_pattern = pattern_ids.get("")
+        self._trie = self._build_trie()
+        self._regex = self._build_regex()
+        self._self_overlapping = self._find_self_overlapping()
+        self._prefix_matches = self._build_prefix_matches()
+
+    def _add_contribution(self, pattern_id, category, key):
+        """
+        Registra que cada aparición del patrón suma uno a (categoría, clave).
+        Si el mismo par ya estaba registrado, incrementa su peso.
+        """
+        contributions = self.contributions[pattern_id]
+        for i, (cat, k, weight) in enumerate(contributions):
+            if cat == category and k == key:
+                contributions[i] = (cat, k, weight + 1)
+                return
+        contributions.append((category, key, 1))
+
+    def _build_trie(self):
+        """
+        Construye un trie de caracteres; la clave None marca el fin de un patrón.
+        """
+        trie = {}
+        for pattern_id, pattern in enumerate(self.patterns):
+            if not pattern:
+                continue
+            node = trie
+            for char in pattern:
+                node = node.setdefault(char, {})
+            node[None] = pattern_id
+        return trie
+
+    def _build_regex(self):
+        """
+        Convierte el trie en una expresión regular compacta dentro de un lookahead.
+
+        ``finditer`` devuelve cada posición donde empieza algún término y el grupo 1
+        contiene el término más largo que empieza ahí (las ramas del trie son
+        disjuntas y los sufijos opcionales son codiciosos). Los demás términos que
+        empiezan en esa posición son justamente los prefijos de ese término.
+        """
+        def to_regex(node):
+            branches = []
+            for char, child in node.items():
+                if char is None:
+                    continue
+                branches.append(re.escape(char) + to_regex(child))
+            if not branches:
+                return ""
+            body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+            if None in node:
+                # El prefijo ya es un término completo; el resto es opcional
+                return "(?:" + body + ")?"
+            return body
+
+        if not self._trie:
+            return None
+        return re.compile("(?=(" + to_regex(self._trie) + "))")
+
+    def _build_prefix_matches(self):
+        """
+        Para cada patrón, lista los patrones que son prefijos suyos (incluido él mismo),
+        separando los que pueden solaparse consigo mismos.
+        """
+        prefix_matches = {}
+        for pattern in self.patterns:
+            if not pattern:
+                continue
+            ids = []
+            node = self._trie
+            for char in pattern:
+                node = node[char]
+                if None in node:
+                    pattern_id = node[None]
+                    ids.append((pattern_id, pattern_id in self._self_overlapping))
+            prefix_matches[pattern] = ids
+        return prefix_matches
+
+    def _find_self_overlapping(self):
+        """
+        Identifica los patrones con un borde propio (prefijo igual a sufijo), los únicos
+        que pueden aparecer solapados consigo mismos, como "aa" en "aaa".
+        """
+        overlapping = set()
+        for pattern_id, pattern in enumerate(self.patterns):
+            if any(pattern[:size] == pattern[-size:] for size in range(1, len(pattern))):
+                overlapping.add(pattern_id)
+        return overlapping
+
+    def count(self, text):
+        """
+        Cuenta las apariciones de cada patrón en un texto (ya en minúsculas).
+
+        :param text: Texto en el que buscar.
+        :return: Diccionario disperso {índice de patrón: conteo}.
+        """
+        counts = {}
+        if self._empty_pattern is not None:
+            counts[self._empty_pattern] = len(text) + 1
+        if self._regex is None:
+            return counts
+
+        prefix_matches = self._prefix_matches
+        next_allowed = {}  # Posición mínima de inicio para no solapar un mismo patrón
+        for match in self._regex.finditer(text):
+            for pattern_id, overlapping in prefix_matches[match.group(1)]:
+                if overlapping:
+                    start = match.start()
+                    if start < next_allowed.get(pattern_id, 0):
+                        continue
+                    next_allowed[pattern_id] = start + len(self.patterns[pattern_id])
+                counts[pattern_id] = counts.get(pattern_id, 0) + 1
+        return counts
+
+    def new_table(self, populated=True):
+        """
+        Crea una tabla de frecuencias vacía con la estructura de analyze_frequency.
+
+        :param populated: Si es False, las categorías quedan sin claves (corpus vacío).
+        :return: Diccionario categoría -> {término: 0}.
+        """
+        if not populated:
+            return {category: {} for category in self.layout}
+        return {category: dict.fromkeys(keys, 0) for category, keys in self.layout.items()}
+
+    def accumulate(self, table, counts, sign=1):
+        """
+        Suma (o resta, con sign=-1) los conteos de patrones a una tabla de frecuencias.
+
+        :param table: Tabla creada con new_table.
+        :param counts: Conteos devueltos por count.
+        :param sign: 1 para sumar, -1 para restar.
+        """
+        for pattern_id, count in counts.items():
+            for category, key, weight in self.contributions[pattern_id]:
+                table[category][key] += sign * weight * count
+        return table
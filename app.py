@@ -1,5 +1,14 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, Response, url_for, g
+import cProfile
 import io
+import json
+import os
+import gzip
+import base64
+import multiprocessing
+import tempfile
+import pstats
+import time
 import matplotlib
 
 matplotlib.use('Agg')  # Establece el backend a uno sin GUI
@@ -8,9 +17,302 @@ import random
 from flask_cors import CORS
 # En app.py
 from BibtexAnalyzer import BibtexAnalyzer
+import Metrics
+from CorpusRegistry import RELOAD_STARTED, CorpusNotFound, CorpusRegistry
+from CorpusStore import DEFAULT_BIB_PATH
+from GraphEngine import GRAPH_KINDS, LayoutStore
+from JobManager import JobManager, FileJobStore, MemoryJobStore, FINISHED_STATES
+from Renderer import RenderPool, RenderPoolBroken, RenderPoolBusy, RenderTimeout
+from ResultCache import ResultCache
 app = Flask(__name__)  # Primero creas la aplicación Flask
 CORS(app)  # Luego habilitas CORS para todas las rutas
 
+# Tipos MIME de los formatos servidos por las rutas /imagen/*
+IMAGE_MIMETYPES = {'png': 'image/png', 'webp': 'image/webp', 'svg': 'image/svg+xml'}
+
+# Corpus que se pueden analizar (?corpus=id): CORPORA="id=ruta.bib,id2=directorio". Sin
+# configurar, un único corpus 'principal' con todo_filtrado.bib
+CORPUS_RUTAS = CorpusRegistry.parse(os.environ.get('CORPORA', f'principal={DEFAULT_BIB_PATH}'))
+
+
+# Cada corpus tiene su almacén e índices; si los corpus cargados superan CORPUS_MAX_BYTES
+# (estimados), se descargan los usados hace más tiempo. Los resultados renderizados de
+# todos los corpus comparten una caché, con un único límite RESULT_CACHE_*
+corpus_registry = CorpusRegistry(
+    CORPUS_RUTAS,
+    default=os.environ.get('CORPUS_DEFAULT'),
+    max_bytes=int(os.environ['CORPUS_MAX_BYTES']) if os.environ.get('CORPUS_MAX_BYTES') else None,
+    result_cache=ResultCache(
+        max_entries=int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 128)),
+        max_bytes=int(os.environ.get('RESULT_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+        ttl=float(os.environ.get('RESULT_CACHE_TTL', 3600)),
+    ),
+)
+
+# Segundos entre revisiones de los archivos de los corpus (0 desactiva la recarga automática)
+INTERVALO_VIGILANCIA = float(os.environ.get('CORPUS_WATCH_INTERVAL', 5))
+
+# Pool de procesos para renderizar fuera del hilo de la solicitud (RENDER_WORKERS=0 renderiza en el hilo)
+render_pool = RenderPool(
+    max_workers=int(os.environ['RENDER_WORKERS']) if 'RENDER_WORKERS' in os.environ else None,
+    timeout=float(os.environ.get('RENDER_TIMEOUT', 60)),
+    max_queue=int(os.environ.get('RENDER_MAX_QUEUE', 16)),
+)
+
+# Trabajos en segundo plano; JOB_STORE_DIR guarda su estado en archivos locales y, si no
+# se define, JOB_MAX_JOBS y JOB_MAX_BYTES acotan los trabajos terminados en memoria
+job_manager = JobManager(
+    max_workers=int(os.environ.get('JOB_WORKERS', 2)),
+    ttl=float(os.environ.get('JOB_TTL', 3600)),
+    store=FileJobStore(os.environ['JOB_STORE_DIR']) if os.environ.get('JOB_STORE_DIR') else MemoryJobStore(
+        max_jobs=int(os.environ.get('JOB_MAX_JOBS', 1000)),
+        max_bytes=int(os.environ.get('JOB_MAX_BYTES', 256 * 1024 * 1024)),
+    ),
+)
+
+
+
+def configurar_procesos(workers):
+    """
+    Ajusta los valores por defecto al número de workers de gunicorn (se llama en el
+    maestro antes de crear los workers, cuando aún no hay trabajos ni procesos de
+    renderizado):
+    - Con más de un worker, cada uno tendría su propia tabla de trabajos en memoria y
+      una consulta que llega a otro worker no encontraría el trabajo; sin JOB_STORE_DIR,
+      los trabajos se guardan en un directorio temporal compartido.
+    - Sin RENDER_WORKERS, los procesos de renderizado se reparten entre los workers en
+      lugar de crear un pool por CPU en cada uno.
+
+    :param workers: Número de workers de gunicorn.
+    """
+    if workers > 1 and not os.environ.get('JOB_STORE_DIR'):
+        job_manager.store = FileJobStore(os.path.join(tempfile.gettempdir(), 'bibtex_trabajos'))
+    if 'RENDER_WORKERS' not in os.environ:
+        render_pool.max_workers = max(1, multiprocessing.cpu_count() // workers)
+
+
+# Disposiciones de los grafos de co-ocurrencia; GRAPH_LAYOUT_DIR las guarda también en disco
+layout_store = LayoutStore(os.environ.get('GRAPH_LAYOUT_DIR'))
+
+# Nodos que se dibujan como máximo en la imagen de un grafo de co-ocurrencia
+MAX_NODOS_IMAGEN = int(os.environ.get('GRAPH_IMAGE_MAX_NODES', 500))
+# Nodos que devuelve /grafo/datos cuando la solicitud no indica max_nodos
+MAX_NODOS_DATOS = int(os.environ.get('GRAPH_DATA_MAX_NODES', 2000))
+
+# Perfil de una sola solicitud con ?perfil=etapas|cprofile (o la cabecera X-Perfil);
+# desactivado salvo que PROFILING_ENABLED=1, porque cprofile hace lenta la solicitud
+PERFILADO_HABILITADO = os.environ.get('PROFILING_ENABLED', '').lower() in ('1', 'true', 'si', 'sí')
+MODOS_PERFIL = ('etapas', 'cprofile')
+
+
+@app.before_request
+def iniciar_vigilancia():
+    # En cada proceso (worker) que atiende solicitudes; no en el maestro de gunicorn
+    corpus_registry.start_watcher(INTERVALO_VIGILANCIA)
+
+
+@app.before_request
+def iniciar_medicion():
+    g.inicio = time.perf_counter()
+    modo = request.args.get('perfil') or request.headers.get('X-Perfil')
+    if PERFILADO_HABILITADO and modo in MODOS_PERFIL:
+        g.perfil = modo
+        g.etapas = Metrics.StageCollector().start()
+        if modo == 'cprofile':
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+
+@app.after_request
+def registrar_medicion(response):
+    duracion = time.perf_counter() - g.inicio
+    endpoint = request.endpoint or 'desconocido'
+    Metrics.REGISTRY.observe('app_http_request_duration_seconds', duracion, endpoint=endpoint,
+                             method=request.method, status=str(response.status_code))
+    if not response.is_streamed:
+        Metrics.REGISTRY.observe('app_http_response_bytes', response.calculate_content_length() or 0,
+                                 buckets=Metrics.SIZE_BUCKETS, endpoint=endpoint)
+    if g.get('perfil'):
+        response = respuesta_perfil(response, duracion)
+    return response
+
+
+@app.teardown_request
+def terminar_perfil(_error=None):
+    # Si la solicitud falló antes de after_request, el perfil se detiene aquí
+    etapas = g.pop('etapas', None)
+    if etapas is not None:
+        etapas.stop()
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+
+
+def respuesta_perfil(response, duracion):
+    """
+    Agrega el desglose por etapas de la solicitud en la cabecera Server-Timing (visible
+    en las herramientas de desarrollo del navegador). Con el modo cprofile, la respuesta
+    se reemplaza por el informe de cProfile en texto.
+    """
+    etapas = g.etapas.stop().totals()
+    server_timing = [f"{nombre};dur={total['segundos'] * 1000:.2f};desc=\"{total['llamadas']} llamadas\""
+                     for nombre, total in etapas.items()]
+    server_timing.append(f"total;dur={duracion * 1000:.2f}")
+
+    if g.perfil == 'cprofile':
+        g.profiler.disable()
+        informe = io.StringIO()
+        informe.write(f"Solicitud: {request.method} {request.full_path} -> {response.status_code}\n")
+        informe.write(f"Duración total: {duracion * 1000:.2f} ms\n\nEtapas:\n")
+        for nombre, total in etapas.items():
+            informe.write(f"  {nombre:<30} {total['segundos'] * 1000:>10.2f} ms  {total['llamadas']} llamadas\n")
+        informe.write("\n")
+        pstats.Stats(g.profiler, stream=informe).sort_stats('cumulative').print_stats(50)
+        response = app.response_class(informe.getvalue(), mimetype='text/plain')
+
+    response.headers['Server-Timing'] = ", ".join(server_timing)
+    response.cache_control.no_store = True
+    return response
+
+
+def cuerpo_json():
+    """
+    Cuerpo JSON de la solicitud si es un objeto; si falta o es de otro tipo, un diccionario vacío.
+    """
+    body = request.get_json(silent=True)
+    return body if isinstance(body, dict) else {}
+
+
+def analizador():
+    """
+    Crea un analizador del corpus indicado con ?corpus=id (o "corpus" en el cuerpo JSON),
+    o del corpus por defecto. El corpus queda en g.corpus para usar su caché de resultados.
+    """
+    corpus_id = request.args.get('corpus') or cuerpo_json().get('corpus')
+    if corpus_id is not None and not isinstance(corpus_id, str):
+        raise CorpusNotFound(corpus_id)
+    g.corpus = corpus_registry.get(corpus_id)
+    return BibtexAnalyzer(g.corpus.store)
+
+
+def clave_resultado(analyzer, endpoint, params=None):
+    """
+    Clave de un resultado del corpus de la solicitud (ver Corpus.result_key).
+    """
+    return g.corpus.result_key(analyzer.corpus_version, endpoint, params)
+
+
+def obtener_resultado(key, compute):
+    """
+    Igual que get_or_compute de la caché del corpus, salvo en las solicitudes perfiladas:
+    ahí se recalcula siempre, para medir el trabajo real y no una lectura de la caché.
+    """
+    result_cache = g.corpus.result_cache
+    if g.get('perfil'):
+        data = compute()
+        return data, result_cache.put(key, data)
+    return result_cache.get_or_compute(key, compute)
+
+
+def renderizar_base64(job):
+    """
+    Renderiza un trabajo en el pool y devuelve la imagen en base64.
+    """
+    data = render_pool.render(job)
+    with Metrics.stage('base64_encode'):
+        encoded = base64.b64encode(data).decode('utf-8')
+    Metrics.record_size('base64_encode', len(encoded))
+    return encoded
+
+
+# Cálculo de cada imagen en base64, compartido por las rutas síncronas y los trabajos
+def generar_grafico_base64(analyzer, variable1, variable2):
+    return renderizar_base64(analyzer.plot_graph_job(variable1, variable2))
+
+
+def generar_nube_base64(analyzer):
+    # Asegúrate de haber ejecutado `analyze_frequency` previamente para tener `frequencyTable` completo
+    analyzer.analyze_frequency()
+    return renderizar_base64(analyzer.plot_word_cloud_job())
+
+
+def generar_grafo_base64(analyzer):
+    # Llama a la función que genera el grafo
+    analyzer.create_graph()  # Primero crea el grafo con nodos y aristas
+    # Luego genera la disposición y configuración del grafo en el pool de renderizado
+    return renderizar_base64(analyzer.generate_graph_job())
+
+
+@app.errorhandler(RenderPoolBusy)
+def render_ocupado(error):
+    return jsonify({'status': 'error', 'message': str(error)}), 503
+
+
+@app.errorhandler(RenderPoolBroken)
+def render_interrumpido(error):
+    return jsonify({'status': 'error', 'message': str(error)}), 503
+
+
+@app.errorhandler(RenderTimeout)
+def render_tiempo_agotado(error):
+    return jsonify({'status': 'error', 'message': str(error)}), 504
+
+
+@app.errorhandler(CorpusNotFound)
+def corpus_no_encontrado(error):
+    return jsonify({'status': 'error', 'message': f'Corpus no registrado: {error.args[0]}'}), 404
+
+
+def respuesta_cacheada(analyzer, endpoint, params, compute):
+    """
+    Devuelve el resultado de compute() desde la caché (por versión del corpus,
+    endpoint y parámetros) con un ETag fuerte. Si el cliente envía If-None-Match
+    con el mismo ETag se responde 304 sin cuerpo.
+    """
+    key = clave_resultado(analyzer, endpoint, params)
+    data, etag = obtener_resultado(key, compute)
+
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+    else:
+        response = jsonify({'status': 'success', 'data': data})
+    response.set_etag(etag)
+    response.cache_control.no_cache = True  # El navegador revalida siempre con el ETag
+    return response
+
+
+def respuesta_imagen(analyzer, endpoint, params, render):
+    """
+    Devuelve la imagen en bytes (sin base64 ni JSON) con su Content-Type y ETag.
+    El formato se elige con ?formato=png|webp|svg; los SVG se comprimen con gzip
+    cuando el cliente lo acepta.
+
+    :param render: Función que recibe el formato y devuelve los bytes de la imagen.
+    """
+    formato = request.args.get('formato', 'png').lower()
+    if formato not in IMAGE_MIMETYPES:
+        return jsonify({'status': 'error', 'message': f'Formato no soportado: {formato}'}), 400
+
+    comprimir = formato == 'svg' and 'gzip' in request.accept_encodings
+    params = dict(params or {}, formato=formato, gzip=comprimir)
+
+    def generar():
+        data = render(formato)
+        # mtime=0: los mismos bytes (y el mismo ETag) en cada worker y en cada renderizado
+        return gzip.compress(data, mtime=0) if comprimir else data
+
+    key = clave_resultado(analyzer, endpoint, params)
+    data, etag = obtener_resultado(key, generar)
+
+    response = app.response_class(data, mimetype=IMAGE_MIMETYPES[formato])
+    if comprimir:
+        response.content_encoding = 'gzip'
+    if formato == 'svg':
+        response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
 # Ruta principal para servir la interfaz
 @app.route('/')
 def home():
@@ -18,18 +320,46 @@ def home():
 
 
 # Endpoint para generar estadísticos (Requerimiento 2 - 4 gráficos)
+def variables_validas(*valores):
+    """
+    Indica si todos los valores son textos no vacíos (los nombres de campo que reciben
+    las rutas en el cuerpo JSON).
+    """
+    return all(isinstance(valor, str) and valor for valor in valores)
+
+
 @app.route('/generar_grafico', methods=['POST'])
 def estadisticos():
     # Obtén los valores de variable1 y variable2 desde la solicitud o usa valores predeterminados
-    variable1 = request.json.get('variable1')
-    variable2 = request.json.get('variable2')
-    
-    # Crea una instancia del analizador y genera el gráfico
-    analyzer = BibtexAnalyzer()
-    wordcloud_base64 = analyzer.plot_graph(variable1, variable2)
-    
-    # Devolver la imagen de la nube de palabras en formato base64
-    return jsonify({'status': 'success', 'data': wordcloud_base64})
+    body = cuerpo_json()
+    variable1 = body.get('variable1')
+    variable2 = body.get('variable2')
+    if not variables_validas(variable1, variable2):
+        return jsonify({'status': 'error', 'message': 'variable1 y variable2 deben ser textos no vacíos'}), 400
+
+    # Crea una instancia del analizador y genera el gráfico (o lo toma de la caché)
+    analyzer = analizador()
+    params = {'variable1': variable1, 'variable2': variable2}
+
+    # Devolver la imagen del gráfico en formato base64
+    return respuesta_cacheada(analyzer, 'generar_grafico', params,
+                              lambda: generar_grafico_base64(analyzer, variable1, variable2))
+
+
+@app.route('/tabla_cruzada', methods=['GET'])
+def tabla_cruzada():
+    """
+    Endpoint que devuelve la tabla cruzada (pares y cantidades) de dos campos en JSON,
+    para que el frontend grafique sin renderizar en el servidor.
+    """
+    variable1 = request.args.get('variable1')
+    variable2 = request.args.get('variable2')
+    limite = request.args.get('limite', type=int)
+
+    analyzer = analizador()
+    params = {'variable1': variable1, 'variable2': variable2, 'limite': limite}
+    return respuesta_cacheada(analyzer, 'tabla_cruzada', params,
+                              lambda: analyzer.cross_tab(variable1, variable2, limite))
 
 
 @app.route('/frecuencia', methods=['GET'])
@@ -38,38 +368,245 @@ def frecuencia():
     Endpoint para analizar la frecuencia de aparición de variables en los abstracts.
     """
     # Crear una instancia de BibtexAnalyzer
-    analyzer = BibtexAnalyzer()
-
-    # Ejecutar el análisis de frecuencia
-    frequency_data = analyzer.analyze_frequency()
+    analyzer = analizador()
 
-    # Retornar los datos de frecuencia como respuesta JSON
-    return jsonify({'status': 'success', 'data': frequency_data})
+    # Ejecutar el análisis de frecuencia y retornar los datos como respuesta JSON
+    return respuesta_cacheada(analyzer, 'frecuencia', None, analyzer.analyze_frequency)
 
 @app.route('/nube_palabras', methods=['GET'])
 def nube_palabras():
     """
     Endpoint para generar una nube de palabras y retornarla en formato base64.
     """
-    analyzer = BibtexAnalyzer()
-    # Asegúrate de haber ejecutado `analyze_frequency` previamente para tener `frequencyTable` completo
-    analyzer.analyze_frequency()
-    
-    # Generar la nube de palabras
-    wordcloud_base64 = analyzer.plot_word_cloud()
-    
+    analyzer = analizador()
+
     # Devolver la imagen de la nube de palabras en formato base64
-    return jsonify({'status': 'success', 'data': wordcloud_base64})
+    return respuesta_cacheada(analyzer, 'nube_palabras', None, lambda: generar_nube_base64(analyzer))
 
 @app.route('/generar_grafo', methods=['GET'])
 def generar_grafo():
-    analyzer = BibtexAnalyzer()
-    # Llama a la función que genera el grafo
-    analyzer.create_graph()  # Primero crea el grafo con nodos y aristas
-    wordcloud_base64 = analyzer.generate_graph()  # Luego genera la disposición y configuración del grafo
+    analyzer = analizador()
 
-    # Devolver la imagen de la nube de palabras en formato base64
-    return jsonify({'status': 'success', 'data': wordcloud_base64})
+    # Devolver la imagen del grafo en formato base64
+    return respuesta_cacheada(analyzer, 'generar_grafo', None, lambda: generar_grafo_base64(analyzer))
+
+# Versiones binarias de las imágenes: evitan el base64 y pueden cachearse en el navegador
+@app.route('/imagen/grafico', methods=['GET'])
+def imagen_grafico():
+    variable1 = request.args.get('variable1')
+    variable2 = request.args.get('variable2')
+    analyzer = analizador()
+    params = {'variable1': variable1, 'variable2': variable2}
+    return respuesta_imagen(analyzer, 'imagen_grafico', params,
+                            lambda fmt: render_pool.render(analyzer.plot_graph_job(variable1, variable2, fmt)))
+
+
+@app.route('/imagen/nube_palabras', methods=['GET'])
+def imagen_nube_palabras():
+    analyzer = analizador()
+
+    def generar(fmt):
+        analyzer.analyze_frequency()
+        return render_pool.render(analyzer.plot_word_cloud_job(fmt))
+
+    return respuesta_imagen(analyzer, 'imagen_nube_palabras', None, generar)
+
+
+def parametros_grafo(max_nodos=None):
+    """
+    Lee los parámetros de un grafo de co-ocurrencia: tipo, peso_minimo, grado_minimo y max_nodos.
+
+    :param max_nodos: Valor por defecto de max_nodos.
+    :return: Diccionario de parámetros, o None si el tipo no es válido.
+    """
+    params = {
+        'tipo': request.args.get('tipo'),
+        'peso_minimo': request.args.get('peso_minimo', 1, type=int),
+        'grado_minimo': request.args.get('grado_minimo', 1, type=int),
+        'max_nodos': request.args.get('max_nodos', max_nodos, type=int),
+    }
+    return params if params['tipo'] in GRAPH_KINDS else None
+
+
+def tipo_no_soportado():
+    return jsonify({'status': 'error',
+                    'message': f"Tipo de grafo no soportado: {request.args.get('tipo')}. "
+                               f"Valores válidos: {', '.join(GRAPH_KINDS)}"}), 400
+
+
+@app.route('/imagen/grafo', methods=['GET'])
+def imagen_grafo():
+    """
+    Sin ?tipo=, el grafo de los 10 journals principales. Con ?tipo=terminos|journal_termino|
+    journal_articulo_termino, el grafo de co-ocurrencia de todo el corpus (con los mismos
+    umbrales que /grafo/datos y como máximo GRAPH_IMAGE_MAX_NODES nodos por defecto).
+    """
+    analyzer = analizador()
+
+    if 'tipo' in request.args:
+        params = parametros_grafo(MAX_NODOS_IMAGEN)
+        if params is None:
+            return tipo_no_soportado()
+        return respuesta_imagen(analyzer, 'imagen_grafo', params, lambda fmt: render_pool.render(
+            analyzer.cooccurrence_job(params['tipo'], params['peso_minimo'], params['grado_minimo'],
+                                      params['max_nodos'], layout_store, fmt, render_pool.compute)))
+
+    def generar(fmt):
+        analyzer.create_graph()
+        return render_pool.render(analyzer.generate_graph_job(fmt))
+
+    return respuesta_imagen(analyzer, 'imagen_grafo', None, generar)
+
+
+@app.route('/grafo/datos', methods=['GET'])
+def grafo_datos():
+    """
+    Nodos (con posición x/y) y aristas de un grafo de co-ocurrencia en JSON, para
+    dibujarlo en el navegador. Parámetros: tipo, peso_minimo, grado_minimo y max_nodos
+    (por defecto, GRAPH_DATA_MAX_NODES).
+    """
+    params = parametros_grafo(MAX_NODOS_DATOS)
+    if params is None:
+        return tipo_no_soportado()
+
+    analyzer = analizador()
+    return respuesta_cacheada(analyzer, 'grafo_datos', params, lambda: analyzer.cooccurrence_data(
+        params['tipo'], params['peso_minimo'], params['grado_minimo'], params['max_nodos'], layout_store))
+
+@app.route('/analisis/lote', methods=['POST'])
+def analisis_lote():
+    """
+    Varios análisis en una sola solicitud y un solo recorrido del corpus. Cuerpo JSON:
+    {"salidas": [{"tipo": "pares", "variable1": "year", "variable2": "journal"},
+                 {"tipo": "frecuencia"}, {"tipo": "top_journals", "limite": 10}],
+     "imagenes": false, "formato": "png", "corpus": "..."}.
+    Con "imagenes": true cada resultado incluye su imagen en base64, renderizadas en paralelo.
+    """
+    body = cuerpo_json()
+    salidas = body.get('salidas')
+    if not isinstance(salidas, list) or not salidas or not all(isinstance(s, dict) for s in salidas):
+        return jsonify({'status': 'error', 'message': 'Se espera una lista no vacía de salidas'}), 400
+    imagenes = bool(body.get('imagenes', False))
+    formato = str(body.get('formato', 'png')).lower()
+    if formato not in IMAGE_MIMETYPES:
+        return jsonify({'status': 'error', 'message': f'Formato no soportado: {formato}'}), 400
+
+    analyzer = analizador()
+    params = {'salidas': json.dumps(salidas, sort_keys=True), 'imagenes': imagenes,
+              'formato': formato if imagenes else None}
+    try:
+        return respuesta_cacheada(analyzer, 'analisis_lote', params, lambda: analyzer.analyze_batch(
+            salidas, imagenes, formato, render_pool.render_many))
+    except ValueError as error:
+        return jsonify({'status': 'error', 'message': str(error)}), 400
+
+# Análisis asíncronos: se devuelve un ID de trabajo y el resultado se consulta después.
+# Tipo de trabajo -> (endpoint síncrono equivalente, parámetros aceptados, función)
+TIPOS_TRABAJO = {
+    'grafico': ('generar_grafico', ('variable1', 'variable2'), generar_grafico_base64),
+    'nube_palabras': ('nube_palabras', (), generar_nube_base64),
+    'grafo': ('generar_grafo', (), generar_grafo_base64),
+}
+
+
+@app.route('/trabajos', methods=['POST'])
+def crear_trabajo():
+    """
+    Crea un trabajo en segundo plano. Cuerpo JSON: {"tipo": "grafico" | "nube_palabras" | "grafo", ...}.
+    Las solicitudes idénticas mientras el trabajo está en curso devuelven el mismo ID.
+    """
+    body = cuerpo_json()
+    tipo = body.get('tipo')
+    if not isinstance(tipo, str) or tipo not in TIPOS_TRABAJO:
+        return jsonify({'status': 'error', 'message': f'Tipo de trabajo no soportado: {tipo}'}), 400
+
+    endpoint, nombres, funcion = TIPOS_TRABAJO[tipo]
+    params = {nombre: body.get(nombre) for nombre in nombres}
+    if not variables_validas(*params.values()):
+        return jsonify({'status': 'error',
+                        'message': f"{', '.join(nombres)} deben ser textos no vacíos"}), 400
+    analyzer = analizador()
+
+    # Misma clave que la ruta síncrona: ambas comparten la caché de resultados del corpus
+    key = clave_resultado(analyzer, endpoint, params)
+    result_cache = g.corpus.result_cache
+    trabajo = job_manager.submit(
+        key, tipo, lambda: result_cache.get_or_compute(key, lambda: funcion(analyzer, **params))[0])
+    response = jsonify({'status': 'success', 'data': trabajo})
+    response.status_code = 202
+    response.headers['Location'] = url_for('consultar_trabajo', job_id=trabajo['id'])
+    return response
+
+
+@app.route('/trabajos/<job_id>', methods=['GET'])
+def consultar_trabajo(job_id):
+    """
+    Devuelve el estado del trabajo y, cuando termina, su resultado (imagen en base64).
+    """
+    trabajo = job_manager.get(job_id)
+    if trabajo is None:
+        return jsonify({'status': 'error', 'message': 'Trabajo no encontrado'}), 404
+    return jsonify({'status': 'success', 'data': trabajo})
+
+
+@app.route('/trabajos/<job_id>/eventos', methods=['GET'])
+def eventos_trabajo(job_id):
+    """
+    Server-Sent Events con cada cambio de estado del trabajo, hasta que termina.
+    """
+    if job_manager.get(job_id) is None:
+        return jsonify({'status': 'error', 'message': 'Trabajo no encontrado'}), 404
+
+    def eventos():
+        estado = None
+        while True:
+            trabajo = job_manager.wait(job_id, estado)
+            if trabajo is None:
+                return
+            if trabajo['status'] == estado:
+                yield ': sigue en curso\n\n'  # Comentario para mantener viva la conexión
+                continue
+            estado = trabajo['status']
+            yield f"event: estado\ndata: {json.dumps(trabajo)}\n\n"
+            if estado in FINISHED_STATES:
+                return
+
+    return Response(eventos(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+@app.route('/corpus', methods=['GET'])
+def listar_corpus():
+    """
+    Corpus registrados: si están cargados, cuántas entradas tienen, su memoria
+    estimada y si hay una recarga en curso.
+    """
+    return jsonify({'status': 'success', 'data': corpus_registry.status()})
+
+
+@app.route('/corpus/<corpus_id>/recargar', methods=['POST'])
+def recargar_corpus(corpus_id):
+    """
+    Vuelve a parsear el corpus en segundo plano. Mientras tanto se sigue respondiendo
+    con la versión anterior; la nueva reemplaza a la anterior de una sola vez al terminar.
+    Responde 202 si la recarga empezó; si ya había una en curso ('en_curso') o el corpus
+    no está cargado ('no_cargado'), responde 200 sin iniciar otra.
+    """
+    recarga = corpus_registry.reload(corpus_id)
+    response = jsonify({'status': 'success', 'data': {
+        'id': corpus_id,
+        'recarga': recarga,
+        'recarga_iniciada': recarga == RELOAD_STARTED,
+    }})
+    response.status_code = 202 if recarga == RELOAD_STARTED else 200
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+def metricas():
+    """
+    Métricas del proceso (latencias por etapa y por endpoint, llamadas, aciertos de
+    las cachés y tamaños de las respuestas) en el formato de texto de Prometheus.
+    """
+    return Response(Metrics.render_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 # Para pruebas locales, podemos usar el puerto estándar
 if __name__ == '__main__':
@@ -0,0 +1,186 @@
+# benchmark.py
+"""
+Benchmarks de las etapas costosas del lector y del analizador.
+
+Para cada tamaño de corpus genera un .bib sintético determinista y mide, por etapa,
+el tiempo de pared, el pico de memoria asignada (tracemalloc, en una ejecución
+aparte) y el rendimiento en entradas por segundo. Los resultados se guardan en JSON
+y pueden compararse con una línea base guardada previamente.
+
+Uso:
+    python benchmarks/benchmark.py --tamanos 1000 10000 100000 --salida resultados.json
+    python benchmarks/benchmark.py --linea-base benchmarks/linea_base.json --tolerancia 0.25
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from BibtexAnalyzer import BibtexAnalyzer  # noqa: E402
+from BibtexReader import BibtexReader  # noqa: E402
+from CorpusStore import CorpusStore  # noqa: E402
+from corpus_sintetico import generate_entries, write_bib  # noqa: E402
+
+
+def measure_time(function):
+    """
+    Ejecuta una función midiendo el tiempo de pared.
+
+    :return: Segundos transcurridos.
+    """
+    gc.collect()
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def measure_memory(function):
+    """
+    Ejecuta una función midiendo el pico de memoria asignada con tracemalloc. Se mide
+    en una ejecución aparte porque tracemalloc hace mucho más lento el código.
+
+    :return: Bytes pico.
+    """
+    gc.collect()
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def fresh_analyzer(bib_path, *steps):
+    """
+    Crea un analizador con un almacén propio (sin estructuras derivadas en caché) y
+    ejecuta los pasos previos que la etapa necesita, fuera de la medición.
+    """
+    analyzer = BibtexAnalyzer(CorpusStore(bib_path))
+    for step in steps:
+        getattr(analyzer, step)()
+    return analyzer
+
+
+def stages(bib_path):
+    """
+    Etapas a medir: nombre -> función que prepara el estado y devuelve lo que se mide.
+    """
+    return {
+        # Parseo completo (reescribe la caché) y carga desde la caché binaria
+        'load_entries': lambda: lambda: BibtexReader(bib_path).load_entries(rebuild_cache=True),
+        'load_entries_cache': lambda: lambda: BibtexReader(bib_path).load_entries(),
+        'analyze_frequency': lambda: fresh_analyzer(bib_path).analyze_frequency,
+        'plot_graph': lambda: (lambda analyzer: lambda: analyzer.plot_graph('year', 'journal'))(
+            fresh_analyzer(bib_path)),
+        'create_graph': lambda: fresh_analyzer(bib_path).create_graph,
+        'plot_word_cloud': lambda: fresh_analyzer(bib_path, 'analyze_frequency').plot_word_cloud,
+        'generate_graph': lambda: fresh_analyzer(bib_path, 'create_graph').generate_graph,
+    }
+
+
+def run_stages(bib_path, size, memory=True):
+    """
+    Ejecuta cada etapa sobre un corpus y devuelve sus métricas.
+
+    :param memory: Si es False no se mide la memoria (evita una segunda ejecución).
+    :return: Diccionario etapa -> {'segundos', 'memoria_pico', 'entradas_por_segundo'}.
+    """
+    results = {}
+    for stage, prepare in stages(bib_path).items():
+        elapsed = measure_time(prepare())
+        results[stage] = {
+            'segundos': round(elapsed, 6),
+            'memoria_pico': measure_memory(prepare()) if memory else None,
+            'entradas_por_segundo': round(size / elapsed, 2) if elapsed > 0 else None,
+        }
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compara los tiempos con la línea base.
+
+    :return: Lista de regresiones (tamaño, etapa, segundos base, segundos actuales).
+    """
+    regressions = []
+    for size, stages in results['tamanos'].items():
+        for stage, metrics in stages.items():
+            reference = baseline.get('tamanos', {}).get(size, {}).get(stage)
+            if reference is None:
+                continue
+            ratio = metrics['segundos'] / reference['segundos'] if reference['segundos'] else 1
+            status = 'REGRESIÓN' if ratio > 1 + tolerance else 'ok'
+            print(f"{size:>8} {stage:<20} {reference['segundos']:>10.4f}s -> {metrics['segundos']:>10.4f}s "
+                  f"({ratio:.2f}x) {status}")
+            if status != 'ok':
+                regressions.append((size, stage, reference['segundos'], metrics['segundos']))
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmarks de BibtexReader y BibtexAnalyzer.")
+    arg_parser.add_argument("--tamanos", type=int, nargs="+", default=[1000, 10000, 100000])
+    arg_parser.add_argument("--palabras-abstract", type=int, default=150)
+    arg_parser.add_argument("--densidad-terminos", type=float, default=0.05)
+    arg_parser.add_argument("--sesgo-journals", type=float, default=1.1)
+    arg_parser.add_argument("--semilla", type=int, default=42)
+    arg_parser.add_argument("--sin-memoria", action="store_true",
+                            help="No medir memoria (cada etapa se ejecuta una sola vez).")
+    arg_parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados.")
+    arg_parser.add_argument("--linea-base", help="Archivo JSON de una ejecución anterior para comparar.")
+    arg_parser.add_argument("--tolerancia", type=float, default=0.25,
+                            help="Aumento relativo de tiempo tolerado antes de marcar regresión.")
+    args = arg_parser.parse_args()
+
+    results = {
+        'entorno': {
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'parametros': {
+            'palabras_abstract': args.palabras_abstract,
+            'densidad_terminos': args.densidad_terminos,
+            'sesgo_journals': args.sesgo_journals,
+            'semilla': args.semilla,
+        },
+        'tamanos': {},
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.tamanos:
+            bib_path = os.path.join(directory, f"corpus_{size}.bib")
+            write_bib(bib_path, generate_entries(
+                size, args.palabras_abstract, args.densidad_terminos, args.sesgo_journals, seed=args.semilla,
+            ))
+            print(f"Corpus de {size} entradas...")
+            size_results = run_stages(bib_path, size, memory=not args.sin_memoria)
+            for stage, metrics in size_results.items():
+                memory = f"{metrics['memoria_pico'] / 1e6:.1f} MB" if metrics['memoria_pico'] is not None else "-"
+                print(f"  {stage:<20} {metrics['segundos']:>10.4f}s {memory:>12} "
+                      f"{metrics['entradas_por_segundo']} entradas/s")
+            results['tamanos'][str(size)] = size_results
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as output:
+            json.dump(results, output, indent=2)
+        print(f"Resultados guardados en {args.salida}")
+
+    if args.linea_base:
+        with open(args.linea_base, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get('parametros') != results['parametros']:
+            print("Aviso: la línea base se generó con otros parámetros del corpus.")
+        regressions = compare(results, baseline, args.tolerancia)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
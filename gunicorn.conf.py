@@ -0,0 +1,49 @@
+# gunicorn.conf.py
+# Configuración de gunicorn: el corpus se carga una sola vez en el proceso maestro y
+# los workers lo comparten (copy-on-write) en lugar de tener cada uno su copia.
+import gc
+import multiprocessing
+import os
+
+# Importa la aplicación en el maestro antes de crear los workers
+preload_app = True
+
+# Procesos worker (WEB_CONCURRENCY, por defecto uno por CPU); todos comparten el corpus del maestro
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+
+# Hilos por worker: las rutas SSE (/trabajos/<id>/eventos) mantienen conexiones abiertas
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+
+def when_ready(server):
+    """
+    Hook de gunicorn que se ejecuta en el maestro antes de crear los workers.
+
+    Ajusta el almacén de trabajos y el pool de renderizado al número de workers
+    (ver app.configurar_procesos), carga los corpus registrados (hasta el límite de
+    memoria) y sus estructuras derivadas, y congela el recolector de basura:
+    gc.freeze() mueve todos los objetos existentes a una generación permanente que el
+    recolector ya no recorre, de modo que sus páginas de memoria no se modifican
+    (ni se duplican) en los workers.
+    """
+    from app import configurar_procesos, corpus_registry
+    from BibtexAnalyzer import preload
+
+    configurar_procesos(server.cfg.workers)
+    total = corpus_registry.preload(preload)
+    gc.collect()
+    gc.freeze()
+    server.log.info("Corpus precargado en el maestro: %s entradas, %s objetos congelados",
+                    total, gc.get_freeze_count())
+
+
+def post_worker_init(worker):
+    """
+    Hook de gunicorn que se ejecuta en cada worker antes de atender solicitudes.
+    Con preload_app los corpus ya están cargados; solo se vuelven a leer si sus
+    archivos cambiaron desde que los cargó el maestro.
+    """
+    from app import corpus_registry
+
+    total = sum(corpus.store.warm_up() for corpus in corpus_registry.corpora() if corpus.loaded)
+    worker.log.info("Corpus disponibles en el worker: %s entradas", total)
@@ -56,41 +56,31 @@ function generarTablaFrecuencia(data) {
 document.getElementById("generar-frecuencia").addEventListener("click", generarFrecuencia);
 
 
+// Muestra una imagen servida en binario por el backend (rutas /imagen/*).
+// El navegador puede cachearla y revalidarla con su ETag.
+function mostrarImagen(url, alt) {
+    return new Promise((resolve, reject) => {
+        const resultContainer = document.getElementById('imagenes-generadas');
+
+        const img = document.createElement('img');
+        img.alt = alt;
+        img.onload = () => {
+            // Limpiar el contenedor antes de mostrar la imagen
+            resultContainer.innerHTML = '';
+            resultContainer.appendChild(img);
+            resolve();
+        };
+        img.onerror = () => reject(new Error(`Error al obtener la imagen: ${alt}`));
+        img.src = url;
+    });
+}
+
 // Función para cargar y mostrar la nube de palabras
 async function cargarNubePalabras() {
     console.log("Cargando la nube de palabras...");
 
     try {
-        const response = await fetch('/nube_palabras', {
-            method: 'GET',
-            headers: {
-                'Content-Type': 'application/json'
-            }
-        });
-
-        if (!response.ok) {
-            throw new Error('Error al obtener la nube de palabras');
-        }
-
-        const data = await response.json();
-        
-        if (data.status === 'success') {
-            const resultContainer = document.getElementById('imagenes-generadas');
-            
-            // Limpiar el contenedor antes de mostrar la nube de palabras
-            resultContainer.innerHTML = '';
-
-            // Crear la imagen de la nube de palabras
-            const img = document.createElement('img');
-            img.src = `data:image/png;base64,${data.data}`;
-            img.alt = 'Nube de Palabras';
-
-            // Agregar la imagen al contenedor
-            resultContainer.appendChild(img);
-        } else {
-            console.error("No se recibió una respuesta exitosa para la nube de palabras.");
-        }
-
+        await mostrarImagen('/imagen/nube_palabras', 'Nube de Palabras');
     } catch (error) {
         console.error("Error al cargar la nube de palabras:", error);
     }
@@ -107,36 +97,7 @@ async function cargarGrafo() {
     console.log("Cargando el grafo...");
 
     try {
-        const response = await fetch('/generar_grafo', {
-            method: 'GET',
-            headers: {
-                'Content-Type': 'application/json'
-            }
-        });
-
-        if (!response.ok) {
-            throw new Error('Error al obtener la imagen del grafo');
-        }
-
-        const data = await response.json();
-
-        if (data.status === 'success') {
-            const resultContainer = document.getElementById('imagenes-generadas');
-            
-            // Limpiar el contenedor antes de mostrar el grafo
-            resultContainer.innerHTML = '';
-
-            // Crear la imagen del grafo
-            const img = document.createElement('img');
-            img.src = `data:image/png;base64,${data.data}`;
-            img.alt = 'Grafo de Journals, Artículos y Países';
-
-            // Agregar la imagen al contenedor
-            resultContainer.appendChild(img);
-        } else {
-            console.error("No se recibió una respuesta exitosa para el grafo.");
-        }
-
+        await mostrarImagen('/imagen/grafo', 'Grafo de Journals, Artículos y Países');
     } catch (error) {
         console.error("Error al cargar el grafo:", error);
     }
@@ -157,51 +118,94 @@ async function generarGrafico() {
     const variable2 = document.getElementById("variable2").value;
 
     try {
-        // Hacer la solicitud al backend para obtener el gráfico
-        const response = await fetch('/generar_grafico', {
-            method: 'POST', // Usamos POST porque enviaremos los datos al backend
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                variable1: variable1,
-                variable2: variable2
-            })
-        });
+        // El backend devuelve directamente la imagen PNG del gráfico
+        const params = new URLSearchParams({ variable1: variable1, variable2: variable2 });
+        await mostrarImagen(`/imagen/grafico?${params}`, 'Gráfico generado');
+    } catch (error) {
+        console.error("Hubo un error al generar el gráfico:", error);
+    }
 
-        // Verificamos si la respuesta es exitosa
-        if (!response.ok) {
-            throw new Error('Error al generar el gráfico');
-        }
+    console.log("Finalizó la solicitud para generar el gráfico.");
+}
 
-        // Convertir la respuesta a JSON
-        const data = await response.json();
-        console.log("Datos recibidos del backend:", data);
+// Asignar evento al botón para generar el gráfico
+document.getElementById('generar-estadisticos').addEventListener('click', generarGrafico);
 
-        // Comprobar si la respuesta es exitosa
-        if (data.status === 'success') {
-            const resultContainer = document.getElementById('imagenes-generadas');
-            
-            // Limpiar el contenedor antes de mostrar el gráfico
-            resultContainer.innerHTML = '';
 
-            // Crear la imagen del gráfico
-            const img = document.createElement('img');
-            img.src = `data:image/png;base64,${data.data}`; // Se espera que el backend retorne la imagen en base64
-            img.alt = 'Gráfico generado';
+// Colores de cada tipo de nodo del grafo de co-ocurrencia (los mismos que en la imagen del servidor)
+const COLORES_NODO = { journal: 'lightcoral', article: 'skyblue', term: 'lightgreen' };
+
+// Dibuja en un canvas los nodos (con su posición x/y en [-1, 1]) y aristas de /grafo/datos
+function dibujarGrafo(datos) {
+    const resultContainer = document.getElementById('imagenes-generadas');
+    const canvas = document.createElement('canvas');
+    canvas.width = 1200;
+    canvas.height = 1200;
+    canvas.style.maxWidth = '100%';
+    const ctx = canvas.getContext('2d');
+
+    const margen = 40;
+    const escala = (canvas.width - 2 * margen) / 2;
+    const punto = (nodo) => [margen + (nodo.x + 1) * escala, margen + (1 - nodo.y) * escala];
+    // reduce en lugar de Math.max(...lista): con muchos elementos el spread supera el límite de argumentos
+    const pesoMaximo = datos.edges.reduce((maximo, arista) => Math.max(maximo, arista.weight), 1);
+    const gradoMaximo = datos.nodes.reduce((maximo, nodo) => Math.max(maximo, nodo.degree), 1);
+
+    // Aristas primero, para que queden debajo de los nodos
+    ctx.strokeStyle = 'rgba(128, 128, 128, 0.3)';
+    for (const arista of datos.edges) {
+        const [x1, y1] = punto(datos.nodes[arista.source]);
+        const [x2, y2] = punto(datos.nodes[arista.target]);
+        ctx.lineWidth = 0.3 + 2 * Math.log1p(arista.weight) / Math.log1p(pesoMaximo);
+        ctx.beginPath();
+        ctx.moveTo(x1, y1);
+        ctx.lineTo(x2, y2);
+        ctx.stroke();
+    }
 
-            // Agregar la imagen al contenedor
-            resultContainer.appendChild(img);
-        } else {
-            console.error("No se recibió una respuesta exitosa para el gráfico.");
+    ctx.font = '10px sans-serif';
+    ctx.textAlign = 'center';
+    for (const nodo of datos.nodes) {
+        const [x, y] = punto(nodo);
+        const radio = 3 + 10 * Math.sqrt(nodo.degree / gradoMaximo);
+        ctx.fillStyle = COLORES_NODO[nodo.type] || 'gray';
+        ctx.beginPath();
+        ctx.arc(x, y, radio, 0, 2 * Math.PI);
+        ctx.fill();
+        // Solo se etiquetan los nodos con más vecinos, para que el texto sea legible
+        if (nodo.degree >= gradoMaximo / 4) {
+            ctx.fillStyle = 'black';
+            ctx.fillText(nodo.label, x, y - radio - 2);
         }
+    }
+
+    resultContainer.innerHTML = '';
+    resultContainer.appendChild(canvas);
+}
+
+// Función para cargar y dibujar el grafo de co-ocurrencia
+async function cargarGrafoCoocurrencia() {
+    console.log("Cargando el grafo de co-ocurrencia...");
+
+    const params = new URLSearchParams({
+        tipo: document.getElementById('tipo-grafo').value,
+        peso_minimo: document.getElementById('peso-minimo').value,
+        max_nodos: document.getElementById('max-nodos').value,
+    });
 
+    try {
+        const response = await fetch(`/grafo/datos?${params}`);
+        if (!response.ok) {
+            throw new Error('Error al obtener el grafo de co-ocurrencia');
+        }
+        const data = await response.json();
+        dibujarGrafo(data.data);
     } catch (error) {
-        console.error("Hubo un error al generar el gráfico:", error);
+        console.error("Error al cargar el grafo de co-ocurrencia:", error);
     }
 
-    console.log("Finalizó la solicitud para generar el gráfico.");
+    console.log("Finalizó la carga del grafo de co-ocurrencia.");
 }
 
-// Asignar evento al botón para generar el gráfico
-document.getElementById('generar-estadisticos').addEventListener('click', generarGrafico);
+// Asignar evento al botón para cargar el grafo de co-ocurrencia
+document.getElementById('generar-grafo-coocurrencia').addEventListener('click', cargarGrafoCoocurrencia);
@@ -0,0 +1,58 @@
+# conftest.py
+import os
+import sys
+
+import pytest
+
+# Los módulos del proyecto están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Abstracts con términos de la taxonomía que se solapan entre sí ("programming" y
+# "block programming", "scratch" y "scratchjr"), partes de términos con guion y
+# apariciones repetidas y solapadas de un mismo término
+ABSTRACTS = [
+    "Block programming with Scratch and ScratchJr improved computational thinking test scores.",
+    "We used CFA and EFA (confirmatory factor analysis) to study validity and reliability.",
+    "Pair programming, pair programming and more programming: programmingprogramming.",
+    "Unplugged activities - CSUnplugged - and robotics with KIBO robots in kindergarten.",
+    "Self-efficacy, self-perceived motivation and engagement in problem-based learning.",
+    "",
+    "sem sem sem SEMSEM: structural equation model of item response theory (IRT).",
+    "Loops, loops and conditionals; events; variables; functions and parallelism.",
+]
+
+
+def make_entries(count, start=0):
+    """
+    Entradas de prueba: los abstracts de ABSTRACTS en ciclo, con journals y años repetidos.
+    """
+    entries = []
+    for i in range(start, start + count):
+        entry = {
+            'ENTRYTYPE': 'article',
+            'ID': f'id{i}',
+            'title': f'Title {i}',
+            'journal': f'Journal {i % 4}',
+            'year': str(2015 + i % 6),
+        }
+        if i % 9 != 8:
+            entry['abstract'] = ABSTRACTS[i % len(ABSTRACTS)]
+        entries.append(entry)
+    return entries
+
+
+def bib_text(entries):
+    """
+    Texto BibTeX de una lista de entradas.
+    """
+    blocks = []
+    for entry in entries:
+        fields = ",\n".join(
+            f"  {key} = {{{value}}}" for key, value in entry.items() if key not in ('ENTRYTYPE', 'ID'))
+        blocks.append(f"@{entry['ENTRYTYPE']}{{{entry['ID']},\n{fields}\n}}\n")
+    return "\n".join(blocks)
+
+
+@pytest.fixture
+def sample_entries():
+    return make_entries(60)
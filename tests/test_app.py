@@ -0,0 +1,79 @@
+# test_app.py
+import time
+from types import SimpleNamespace
+
+import pytest
+from flask import g
+
+import app as aplicacion
+from JobManager import FileJobStore, MemoryJobStore
+from ResultCache import ResultCache
+
+
+def test_several_workers_share_job_store_and_split_render_processes(monkeypatch):
+    monkeypatch.delenv('JOB_STORE_DIR', raising=False)
+    monkeypatch.delenv('RENDER_WORKERS', raising=False)
+    monkeypatch.setattr(aplicacion.job_manager, 'store', MemoryJobStore())
+    monkeypatch.setattr(aplicacion.render_pool, 'max_workers', None)
+    monkeypatch.setattr(aplicacion.multiprocessing, 'cpu_count', lambda: 8)
+
+    aplicacion.configurar_procesos(4)
+    assert isinstance(aplicacion.job_manager.store, FileJobStore)
+    assert aplicacion.render_pool.max_workers == 2
+
+
+def test_single_worker_keeps_memory_job_store(monkeypatch):
+    monkeypatch.delenv('JOB_STORE_DIR', raising=False)
+    store = MemoryJobStore()
+    monkeypatch.setattr(aplicacion.job_manager, 'store', store)
+    monkeypatch.setattr(aplicacion.render_pool, 'max_workers', None)
+    aplicacion.configurar_procesos(1)
+    assert aplicacion.job_manager.store is store
+
+
+@pytest.fixture
+def cliente():
+    return aplicacion.app.test_client()
+
+
+@pytest.mark.parametrize('body', [
+    {'variable1': ['journal'], 'variable2': 'year'},
+    {'variable1': 'journal', 'variable2': {'campo': 'year'}},
+    {'variable1': 'journal'},
+    {},
+])
+def test_chart_rejects_non_text_variables(cliente, body):
+    response = cliente.post('/generar_grafico', json=body)
+    assert response.status_code == 400
+    assert response.get_json()['status'] == 'error'
+
+
+@pytest.mark.parametrize('body', [
+    {'tipo': 'grafico', 'variable1': {'campo': 'journal'}, 'variable2': 'year'},
+    {'tipo': 'grafico', 'variable1': 'journal', 'variable2': ['year']},
+    {'tipo': 'grafico'},
+    {'tipo': ['grafico']},
+    ['grafico'],
+])
+def test_job_rejects_invalid_body(cliente, body):
+    assert cliente.post('/trabajos', json=body).status_code == 400
+
+
+def test_non_text_corpus_is_not_found(cliente):
+    response = cliente.post('/generar_grafico', json={'variable1': 'journal', 'variable2': 'year', 'corpus': ['x']})
+    assert response.status_code == 404
+
+
+def test_gzipped_svg_is_identical_across_renders(monkeypatch):
+    analyzer = SimpleNamespace(corpus_version='v1')
+    responses = []
+    for offset in (0, 3600):
+        monkeypatch.setattr(time, 'time', lambda offset=offset: 1_700_000_000 + offset)
+        with aplicacion.app.test_request_context('/imagen/grafico?formato=svg',
+                                                 headers={'Accept-Encoding': 'gzip'}):
+            # Cada vuelta con su propia caché, como dos workers distintos
+            g.corpus = SimpleNamespace(result_cache=ResultCache(), result_key=ResultCache.make_key)
+            response = aplicacion.respuesta_imagen(analyzer, 'imagen_grafico', None, lambda fmt: b'<svg/>')
+            responses.append((response.content_encoding, response.get_data(), response.get_etag()))
+    assert responses[0][0] == 'gzip'
+    assert responses[0] == responses[1]
@@ -0,0 +1,104 @@
+# test_compact_entries.py
+import pickle
+import threading
+
+from CompactEntries import TYPE_SAMPLE, CompactEntries, _DictionaryColumn, _TextColumn
+
+
+def make_entries(count, start=0):
+    return [
+        {
+            'ENTRYTYPE': 'article',
+            'ID': f'id{i}',
+            'title': f'Título {i}',
+            'journal': f'Journal {i % 3}',
+            'year': str(2000 + i % 5),
+        }
+        for i in range(start, start + count)
+    ]
+
+
+def test_entries_read_like_dicts():
+    entries = make_entries(10) + [{'ENTRYTYPE': 'book', 'ID': 'libro', 'abstract': 'Texto'}]
+    store = CompactEntries(entries)
+    assert [dict(entry) for entry in store] == entries
+    assert [list(entry) for entry in store] == [list(entry) for entry in entries]
+    assert store[-1].get('journal') is None
+    assert 'abstract' in store[-1] and 'abstract' not in store[0]
+
+
+def test_extending_copy_does_not_change_original_while_iterating():
+    entries = make_entries(50)
+    original = CompactEntries(entries)
+    iterator = iter(original)
+    first = dict(next(iterator))
+
+    clone = original.copy()
+    clone.extend([{'ID': 'nuevo', 'campo_nuevo': 'valor', 'journal': 'Otro journal'}])
+
+    assert [first] + [dict(entry) for entry in iterator] == entries
+    assert 'campo_nuevo' not in original._columns
+    assert len(original) == 50 and len(clone) == 51
+    assert dict(clone[-1]) == {'ID': 'nuevo', 'campo_nuevo': 'valor', 'journal': 'Otro journal'}
+    assert original.nbytes() > 0
+
+
+def test_extending_copies_concurrently_with_readers():
+    original = CompactEntries(make_entries(200))
+    expected = [dict(entry) for entry in original]
+    errors = []
+    stop = threading.Event()
+
+    def read():
+        try:
+            while not stop.is_set():
+                assert [dict(entry) for entry in original] == expected
+                original.nbytes()
+        except Exception as error:  # noqa: BLE001 - se reporta en el hilo principal
+            errors.append(error)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        current = original
+        for i in range(200):
+            current = current.copy()
+            current.extend([{'ID': f'extra{i}', f'campo{i}': f'valor {i}'}])
+    finally:
+        stop.set()
+        reader.join()
+
+    assert not errors
+    assert len(original) == 200 and len(current) == 400
+    assert dict(current[-1]) == {'ID': 'extra199', 'campo199': 'valor 199'}
+
+
+def test_both_copies_extended_keep_their_own_entries():
+    original = CompactEntries(make_entries(5))
+    first, second = original.copy(), original.copy()
+    first.extend(make_entries(2, start=100))
+    second.extend(make_entries(3, start=200))
+    assert [entry['ID'] for entry in first][5:] == ['id100', 'id101']
+    assert [entry['ID'] for entry in second][5:] == ['id200', 'id201', 'id202']
+    assert len(original) == 5
+
+
+def test_column_type_revised_after_small_first_batch():
+    store = CompactEntries([{'ID': 'a', 'issn': '1234-5678'}])
+    # Un solo valor distinto de uno: parece un campo de texto
+    assert isinstance(store._columns['issn'], _TextColumn)
+
+    more = [{'ID': f'b{i}', 'issn': f'0000-000{i % 3}'} for i in range(TYPE_SAMPLE)]
+    store.extend(more)
+    assert isinstance(store._columns['issn'], _DictionaryColumn)
+    assert [entry['issn'] for entry in store] == ['1234-5678'] + [entry['issn'] for entry in more]
+    assert 'issn' not in store._provisional
+
+
+def test_pickle_round_trip():
+    store = CompactEntries(make_entries(20))
+    copy = store.copy()
+    copy.extend(make_entries(5, start=20))
+    restored = pickle.loads(pickle.dumps(store))
+    assert [dict(entry) for entry in restored] == make_entries(20)
+    assert pickle.loads(pickle.dumps(store[3])) == make_entries(20)[3]
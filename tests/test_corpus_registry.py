@@ -0,0 +1,87 @@
+# test_corpus_registry.py
+import pytest
+
+from BibtexAnalyzer import BibtexAnalyzer, preload
+from CorpusRegistry import NOT_LOADED, RELOAD_RUNNING, RELOAD_STARTED, CorpusRegistry
+from CorpusStore import get_store
+from conftest import bib_text, make_entries
+
+
+@pytest.fixture
+def corpus_paths(tmp_path):
+    paths = {}
+    for name, count in (('a', 30), ('b', 50)):
+        path = tmp_path / f'{name}.bib'
+        path.write_text(bib_text(make_entries(count)), encoding='utf-8')
+        paths[name] = str(path)
+    return paths
+
+
+def make_registry(paths, **kwargs):
+    return CorpusRegistry(paths, **kwargs)
+
+
+def test_registry_store_reloads_in_background_without_touching_shared_store(corpus_paths):
+    registry = make_registry(corpus_paths)
+    store = registry.get('a').store
+    assert store.background
+    assert store is not get_store(corpus_paths['a'])
+    assert not get_store(corpus_paths['a']).background
+
+
+def test_reload_reports_corpus_not_loaded(corpus_paths):
+    registry = make_registry(corpus_paths)
+    assert registry.reload('b') == NOT_LOADED
+    registry.get('b')
+    assert registry.reload('b') in (RELOAD_STARTED, RELOAD_RUNNING)
+
+
+def test_memory_includes_derived_structures(corpus_paths):
+    registry = make_registry(corpus_paths)
+    corpus = registry.get('b')
+    entries_only = corpus.memory()
+    analyzer = BibtexAnalyzer(corpus.store)
+    analyzer.analyze_frequency()
+    analyzer.frame.column('journal')
+    assert corpus.memory() > entries_only
+
+
+def test_corpora_share_one_result_cache(corpus_paths):
+    registry = make_registry(corpus_paths)
+    a, b = registry.get('a'), registry.get('b')
+    assert a.result_cache is b.result_cache
+    a.result_cache.put(a.result_key('v1', 'frecuencias'), {'x': 1})
+    b.result_cache.put(b.result_key('v1', 'frecuencias'), {'x': 2})
+    assert a.result_cache.get(a.result_key('v1', 'frecuencias'))[0] == {'x': 1}
+
+    a.unload()
+    assert a.result_cache.get(a.result_key('v1', 'frecuencias')) is None
+    assert b.result_cache.get(b.result_key('v1', 'frecuencias'))[0] == {'x': 2}
+    assert registry.status()['resultados_cacheados'] == 1
+
+
+def test_preload_stops_at_memory_limit(corpus_paths):
+    single = make_registry({'a': corpus_paths['a']})
+    single.preload(preload)
+    limit = single.memory() + 1
+
+    registry = make_registry(corpus_paths, default='a', max_bytes=limit)
+    assert registry.preload(preload) == 30
+    assert [corpus.id for corpus in registry.corpora() if corpus.loaded] == ['a']
+
+
+def test_limit_applies_when_a_loaded_corpus_grows(corpus_paths):
+    registry = make_registry(corpus_paths)
+    a, b = registry.get('a'), registry.get('b')
+    registry.max_bytes = a.memory() + b.memory() + 1
+
+    BibtexAnalyzer(b.store).analyze_frequency()
+    assert not a.loaded and b.loaded
+
+    registry.max_bytes = None
+    registry.get('a'), registry.get('b')
+    registry.max_bytes = registry.memory() + 1
+    with open(corpus_paths['a'], 'a', encoding='utf-8') as bib_file:
+        bib_file.write(bib_text(make_entries(200, start=30)))
+    registry.get('a').store._reload()
+    assert a.loaded and not b.loaded
@@ -0,0 +1,189 @@
+# test_frequency_index.py
+import os
+
+import pytest
+
+from BibtexAnalyzer import TERM_MATCHER, BibtexAnalyzer, preload
+from ChunkedEntries import ChunkedEntries
+from CorpusStore import CorpusStore
+from FrequencyIndex import FrequencyIndex
+from conftest import bib_text, make_entries
+
+
+def full_rebuild(entries):
+    return FrequencyIndex.build(TERM_MATCHER, entries)
+
+
+def test_appended_index_equals_full_rebuild(sample_entries):
+    index = full_rebuild(sample_entries)
+    entries = list(sample_entries)
+    versions = [(index, list(entries))]
+    for batch in (1, 2, 7, 3, 30, 1):
+        new_entries = make_entries(batch, start=len(entries))
+        index = index.extended(new_entries, len(entries))
+        entries += new_entries
+        versions.append((index, list(entries)))
+
+    # Cada versión (también las anteriores, que comparten capas) sigue igual a recalcular
+    for version, version_entries in versions:
+        rebuilt = full_rebuild(version_entries)
+        assert version.table() == rebuilt.table()
+        assert sorted(version.items()) == sorted(rebuilt.items())
+        assert len(version) == len(version_entries)
+
+
+@pytest.mark.parametrize('chunk_size', [None, 7])
+def test_parallel_build_equals_serial(sample_entries, chunk_size):
+    entries = sample_entries + make_entries(25, start=60)
+    serial = FrequencyIndex.build(TERM_MATCHER, entries)
+    parallel = FrequencyIndex.build(TERM_MATCHER, entries, workers=2, chunk_size=chunk_size)
+    assert parallel.table() == serial.table()
+    assert parallel.items() == serial.items()
+    assert len(parallel) == len(serial)
+    # El índice paralelo se sigue extendiendo igual que el serial
+    new_entries = make_entries(5, start=85)
+    assert parallel.extended(new_entries, 85).table() == serial.extended(new_entries, 85).table()
+
+
+def test_revised_equals_full_rebuild(sample_entries):
+    base = full_rebuild(sample_entries)
+    new_entries = [dict(entry) for entry in sample_entries[:50]] + make_entries(3, start=80)
+    new_entries[4]['abstract'] = 'Scratch, Scratch and block programming'
+    new_entries[7]['ID'] = 'renombrada'
+
+    revised = base.revised(sample_entries, new_entries)
+    rebuilt = full_rebuild(new_entries)
+    assert revised.table() == rebuilt.table()
+    assert sorted(revised.items()) == sorted(rebuilt.items())
+    assert len(revised) == len(new_entries)
+    # El original no cambia
+    assert base.table() == full_rebuild(sample_entries).table()
+    # Si cambió casi todo conviene reconstruir
+    assert base.revised(sample_entries, make_entries(60, start=100)) is None
+
+
+def test_updates_and_removals_after_extending(sample_entries):
+    base = full_rebuild(sample_entries)
+    index = base.extended(make_entries(5, start=60), 60)
+    entries = dict(enumerate(sample_entries + make_entries(5, start=60)))
+
+    replacement = {'abstract': 'Scratch, Scratch and block programming'}
+    index.update(3, replacement)
+    entries[3] = replacement
+    index.remove(10)
+    del entries[10]
+    index.remove(62)
+    del entries[62]
+    index.remove(10)  # Eliminar dos veces no cambia nada
+
+    rebuilt = FrequencyIndex(TERM_MATCHER)
+    rebuilt.add_many(entries.items())
+    assert index.table() == rebuilt.table()
+    assert sorted(index.items()) == sorted(rebuilt.items())
+    # El índice original no se modificó
+    assert base.table() == full_rebuild(sample_entries).table()
+
+
+def test_many_appends_keep_few_layers():
+    index = full_rebuild(make_entries(10))
+    size = 10
+    for _ in range(200):
+        index = index.extended(make_entries(1, start=size), size)
+        size += 1
+    assert len(index._layers) <= 12
+    assert index.table() == full_rebuild(make_entries(size)).table()
+
+
+def test_chunked_entries_append_without_changing_copies(sample_entries):
+    entries = ChunkedEntries(sample_entries)
+    snapshot = entries.copy()
+    for start in range(60, 100, 4):
+        entries.extend(make_entries(4, start=start))
+    assert list(snapshot) == sample_entries
+    assert list(entries) == make_entries(100)
+    assert entries[75] == make_entries(100)[75]
+    assert entries[-1]['ID'] == 'id99'
+    assert entries[::10] == make_entries(100)[::10]
+    assert len(entries._chunks) <= 8
+
+
+@pytest.mark.parametrize('compact', [True, False])
+def test_store_append_equals_full_load(tmp_path, compact):
+    path = str(tmp_path / 'corpus.bib')
+    with open(path, 'w', encoding='utf-8') as bib_file:
+        bib_file.write(bib_text(make_entries(40)))
+    store = CorpusStore(path, compact=compact)
+    BibtexAnalyzer(store).analyze_frequency()
+    first_entries = store.entries
+
+    with open(path, 'a', encoding='utf-8') as bib_file:
+        bib_file.write("\n" + bib_text(make_entries(5, start=40)))
+    os.utime(path, ns=(1, 1))
+
+    appended = BibtexAnalyzer(store)
+    fresh = BibtexAnalyzer(CorpusStore(path, compact=compact))
+    assert appended.analyze_frequency() == fresh.analyze_frequency()
+    assert [dict(entry) for entry in appended.entries] == [dict(entry) for entry in fresh.entries]
+    assert len(first_entries) == 40
+    # El índice se extendió en lugar de reconstruirse
+    assert store._derived.get((store.version, 'frequency')) is not None
+
+
+def test_store_revises_index_after_edit(tmp_path):
+    path = str(tmp_path / 'corpus.bib')
+    entries = make_entries(40)
+    with open(path, 'w', encoding='utf-8') as bib_file:
+        bib_file.write(bib_text(entries))
+    store = CorpusStore(path)
+    BibtexAnalyzer(store).analyze_frequency()
+
+    entries = entries[:-2]
+    entries[5] = dict(entries[5], abstract='Robotics and Arduino in the classroom')
+    with open(path, 'w', encoding='utf-8') as bib_file:
+        bib_file.write(bib_text(entries))
+    os.utime(path, ns=(1, 1))
+
+    assert store.entries[5]['abstract'] == 'Robotics and Arduino in the classroom'
+    # El índice se actualizó en lugar de reconstruirse
+    assert store._derived.get((store.version, 'frequency')) is not None
+    assert BibtexAnalyzer(store).analyze_frequency() == \
+        BibtexAnalyzer(CorpusStore(path)).analyze_frequency()
+
+
+def test_edit_before_tail_is_not_treated_as_append(tmp_path):
+    path = str(tmp_path / 'corpus.bib')
+    text = bib_text(make_entries(40))
+    with open(path, 'w', encoding='utf-8') as bib_file:
+        bib_file.write(text)
+    store = CorpusStore(path)
+    store.warm_up()
+
+    # Edición del mismo largo al principio más un agregado al final: el archivo crece y
+    # los últimos bytes de la versión cargada siguen en el mismo lugar
+    edited = text.replace('Block programming with Scratch', 'Block programming with Arduino', 1)
+    assert len(edited) == len(text) and edited != text
+    with open(path, 'w', encoding='utf-8') as bib_file:
+        bib_file.write(edited + "\n" + bib_text(make_entries(2, start=40)))
+    os.utime(path, ns=(1, 1))
+
+    assert store._append_hasher(store._state[2], store._stat_version()) is None
+    assert 'Arduino' in store.entries[0]['abstract']
+    assert BibtexAnalyzer(store).analyze_frequency() == \
+        BibtexAnalyzer(CorpusStore(path)).analyze_frequency()
+
+
+def test_store_index_workers_are_used_by_default(tmp_path, monkeypatch):
+    path = str(tmp_path / 'corpus.bib')
+    with open(path, 'w', encoding='utf-8') as bib_file:
+        bib_file.write(bib_text(make_entries(10)))
+    calls = []
+    build = FrequencyIndex.build.__func__
+    monkeypatch.setattr(FrequencyIndex, 'build', classmethod(
+        lambda cls, matcher, entries, workers=None, chunk_size=None:
+        calls.append(workers) or build(cls, matcher, entries)))
+
+    preload_store = CorpusStore(path, index_workers=3)
+    preload(preload_store)
+    BibtexAnalyzer(CorpusStore(path, index_workers=2)).analyze_frequency(workers=4)
+    BibtexAnalyzer(CorpusStore(path, index_workers=2)).analyze_frequency()
+    assert calls == [3, 4, 2]
@@ -0,0 +1,48 @@
+# test_graph_engine.py
+import numpy as np
+from scipy import sparse
+
+from BibtexAnalyzer import GRAPH_SEED, BibtexAnalyzer
+from CorpusStore import CorpusStore
+from GraphEngine import CooccurrenceGraph, LayoutStore, compute_layout
+from conftest import bib_text, make_entries
+
+
+def test_small_components_use_spring_layout_below_spectral_minimum():
+    # Dos componentes de 2 y 3 nodos: con spring_limit=0 no pueden ir a la disposición espectral
+    adjacency = sparse.csr_matrix(np.array([
+        [0, 1, 0, 0, 0],
+        [1, 0, 0, 0, 0],
+        [0, 0, 0, 2, 1],
+        [0, 0, 2, 0, 1],
+        [0, 0, 1, 1, 0],
+    ]))
+    graph = CooccurrenceGraph([str(i) for i in range(5)], list('abcde'), ['term'] * 5, adjacency)
+    positions = compute_layout(graph, spring_limit=0)
+    assert positions.shape == (5, 2)
+    assert np.all(np.isfinite(positions))
+
+
+def test_cooccurrence_job_computes_layout_with_compute_and_keeps_it(tmp_path):
+    path = tmp_path / 'corpus.bib'
+    path.write_text(bib_text(make_entries(40)), encoding='utf-8')
+    analyzer = BibtexAnalyzer(CorpusStore(str(path)))
+    layouts = LayoutStore()  # Solo en memoria
+    computed = []
+
+    def compute(job):
+        function, args = job
+        computed.append(function)
+        return function(*args)
+
+    function, args = analyzer.cooccurrence_job('terminos', layouts=layouts, fmt='svg', compute=compute)
+    assert computed == [compute_layout]
+    assert function(*args).startswith(b'<?xml')
+
+    # Los demás formatos reutilizan la disposición guardada en el proceso que la pidió
+    for fmt in ('png', 'webp'):
+        _, other_args = analyzer.cooccurrence_job('terminos', layouts=layouts, fmt=fmt, compute=compute)
+        assert np.array_equal(other_args[0], args[0])
+    assert computed == [compute_layout]
+    graph = analyzer.cooccurrence_graph('terminos').filtered()
+    assert np.array_equal(args[0], compute_layout(graph, GRAPH_SEED))
@@ -0,0 +1,67 @@
+# test_job_manager.py
+import os
+import threading
+import time
+
+from JobManager import DONE, FileJobStore, JobManager, MemoryJobStore
+
+
+def finished_job(job_id, finished, result='x'):
+    return {'id': job_id, 'type': 'prueba', 'status': DONE, 'result': result,
+            'error': None, 'created': finished, 'finished': finished}
+
+
+def test_memory_store_expires_from_finished_index():
+    store = MemoryJobStore()
+    store.save(finished_job('viejo', 100.0))
+    store.save(finished_job('nuevo', 300.0))
+    store.save({**finished_job('en_curso', None), 'status': 'ejecutando'})
+
+    loads = []
+    original_load = store.load
+    store.load = lambda job_id: loads.append(job_id) or original_load(job_id)
+    store.expire(200.0)
+    assert loads == []
+    assert sorted(store.list_ids()) == ['en_curso', 'nuevo']
+
+
+def test_memory_store_caps_finished_jobs():
+    store = MemoryJobStore(max_jobs=3, max_bytes=50)
+    store.save({**finished_job('en_curso', None), 'status': 'ejecutando'})
+    for i in range(4):
+        store.save(finished_job(f'j{i}', float(i), result='a' * 10))
+    # Se eliminan los terminados más antiguos; el trabajo en curso se conserva
+    assert sorted(store.list_ids()) == ['en_curso', 'j2', 'j3']
+
+    store.save(finished_job('grande', 10.0, result='b' * 40))
+    assert sorted(store.list_ids()) == ['en_curso', 'grande']
+
+
+def test_file_store_expires_only_old_files(tmp_path):
+    store = FileJobStore(str(tmp_path))
+    store.save(finished_job('viejo', 100.0))
+    store.save(finished_job('reciente', time.time()))
+    os.utime(tmp_path / 'viejo.json', (100.0, 100.0))
+    store.expire(time.time() - 60)
+    assert store.list_ids() == ['reciente']
+
+
+def test_wait_does_not_hold_lock_during_store_io():
+    manager = JobManager(max_workers=1, poll_interval=5)
+    release = threading.Event()
+    job = manager.submit('clave', 'prueba', lambda: release.wait(5) and 42)
+
+    original_load = manager.store.load
+
+    def load(job_id):
+        # Otro hilo debe poder tomar el lock mientras wait lee el almacén
+        assert manager._lock.acquire(timeout=1)
+        manager._lock.release()
+        return original_load(job_id)
+
+    manager.store.load = load
+    threading.Timer(0.2, release.set).start()
+    status = manager.wait(job['id'], last_status='pendiente', timeout=5)
+    while status['status'] != DONE:
+        status = manager.wait(job['id'], last_status=status['status'], timeout=5)
+    assert status['result'] == 42
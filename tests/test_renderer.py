@@ -0,0 +1,62 @@
+# test_renderer.py
+import os
+import time
+
+import pytest
+
+import Renderer
+from Renderer import RenderPool, RenderPoolBroken, RenderTimeout
+
+JOB = (Renderer.render_bar_chart, (['a', 'b'], [3, 1], 'Título', 'x', 'y', 'svg'))
+
+
+@pytest.fixture
+def pool():
+    pool = RenderPool(max_workers=1, timeout=60)
+    yield pool
+    pool.shutdown()
+
+
+def test_dead_worker_is_reported_and_pool_recreated(pool):
+    assert pool.render(JOB).startswith(b'<?xml')
+    broken = pool._executor
+
+    # Un proceso que muere durante el trabajo rompe el pool
+    with pytest.raises(RenderPoolBroken):
+        pool.render((os._exit, (1,)))
+    assert pool._executor is not broken
+    assert pool._pending == 0
+
+    assert pool.render(JOB).startswith(b'<?xml')
+    assert pool.render_many([JOB, JOB])[1].startswith(b'<?xml')
+
+
+def test_render_many_reports_dead_worker(pool):
+    with pytest.raises(RenderPoolBroken):
+        pool.render_many([JOB, (os._exit, (1,)), JOB])
+    assert pool.render_many([JOB])[0].startswith(b'<?xml')
+
+
+def test_hung_renders_do_not_fill_the_queue():
+    pool = RenderPool(max_workers=1, timeout=60, max_queue=2)
+    try:
+        assert pool.render(JOB).startswith(b'<?xml')
+        for _ in range(3):
+            hung = pool._get_executor()
+            with pytest.raises(RenderTimeout):
+                pool.render((time.sleep, (60,)), timeout=1)
+            # El lugar en la cola se libera y el pool se reemplaza sin esperar al trabajo colgado
+            assert pool._pending == 0
+            assert pool._executor is not hung
+        start = time.monotonic()
+        assert pool.render(JOB).startswith(b'<?xml')
+        assert time.monotonic() - start < 30
+    finally:
+        pool.shutdown()
+
+
+def test_render_many_timeout_releases_every_slot(pool):
+    with pytest.raises(RenderTimeout):
+        pool.render_many([JOB, (time.sleep, (60,)), (time.sleep, (60,))], timeout=3)
+    assert pool._pending == 0
+    assert pool.render_many([JOB])[0].startswith(b'<?xml')
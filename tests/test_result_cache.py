@@ -0,0 +1,60 @@
+# test_result_cache.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ResultCache import ResultCache
+
+
+def test_concurrent_misses_compute_once():
+    cache = ResultCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return {'valor': 42}
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: cache.get_or_compute('clave', compute), range(8)))
+    assert len(calls) == 1
+    assert all(result == results[0] for result in results)
+    assert results[0][0] == {'valor': 42}
+
+
+def test_waiters_receive_the_error_and_next_call_retries():
+    cache = ResultCache()
+    started = threading.Event()
+
+    def failing():
+        started.set()
+        time.sleep(0.2)
+        raise RuntimeError("falló")
+
+    errors = []
+
+    def waiter():
+        started.wait()
+        try:
+            cache.get_or_compute('clave', lambda: 'no debería calcularse')
+        except RuntimeError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute('clave', failing)
+    thread.join()
+    assert len(errors) == 1
+    assert cache.get_or_compute('clave', lambda: 'nuevo')[0] == 'nuevo'
+
+
+def test_keys_accept_unhashable_param_values():
+    cache = ResultCache()
+    key = ResultCache.make_key('v1', 'generar_grafico', {'variable1': ['a', 'b'], 'variable2': {'x': 1}})
+    assert key == ResultCache.make_key('v1', 'generar_grafico', {'variable2': {'x': 1}, 'variable1': ['a', 'b']})
+    assert key != ResultCache.make_key('v1', 'generar_grafico', {'variable1': ['a'], 'variable2': {'x': 1}})
+    cache.put(key, 'imagen')
+    assert cache.get(key)[0] == 'imagen'
@@ -0,0 +1,103 @@
+# test_term_matcher.py
+import pytest
+
+from BibtexAnalyzer import CATEGORIES, EQUIVALENCES, TERM_MATCHER, BibtexAnalyzer
+from CorpusStore import CorpusStore
+from FrequencyIndex import FrequencyIndex
+from TermMatcher import TermMatcher
+from conftest import bib_text, make_entries
+
+
+def reference_frequency(entries, categories, equivalences):
+    """
+    Implementación original de analyze_frequency, con un str.count por término y abstract.
+    """
+    frequency_data = {category: {} for category in categories}
+    for entry in entries:
+        abstract = entry.get('abstract', '').lower()
+        for category, variables in categories.items():
+            for variable in variables:
+                for eq in equivalences.get(variable, [variable]):
+                    eq_lower = eq.lower()
+                    if "-" in eq_lower:
+                        part1, part2 = map(str.strip, eq_lower.split("-", 1))
+                        count = abstract.count(part1) + abstract.count(part2)
+                    else:
+                        count = abstract.count(eq_lower)
+                    if eq_lower not in frequency_data[category]:
+                        frequency_data[category][eq_lower] = 0
+                    frequency_data[category][eq_lower] += count
+    return frequency_data
+
+
+def matcher_frequency(matcher, entries):
+    table = matcher.new_table(populated=bool(entries))
+    for entry in entries:
+        matcher.accumulate(table, matcher.count(entry.get('abstract', '').lower()))
+    return table
+
+
+def test_taxonomy_counts_equal_str_count(sample_entries):
+    assert matcher_frequency(TERM_MATCHER, sample_entries) == \
+        reference_frequency(sample_entries, CATEGORIES, EQUIVALENCES)
+
+
+def test_analyzer_equals_str_count(tmp_path, sample_entries):
+    path = tmp_path / 'corpus.bib'
+    path.write_text(bib_text(sample_entries), encoding='utf-8')
+    table = BibtexAnalyzer(CorpusStore(str(path))).analyze_frequency()
+    assert table == reference_frequency(sample_entries, CATEGORIES, EQUIVALENCES)
+    # Mismo orden de categorías y términos que la implementación original
+    reference = reference_frequency(sample_entries, CATEGORIES, EQUIVALENCES)
+    assert [list(terms) for terms in table.values()] == [list(terms) for terms in reference.values()]
+
+
+# Taxonomía pequeña con términos que se solapan entre sí (uno es prefijo, sufijo o parte
+# de otro), términos que se solapan consigo mismos ("aa", "aba", "abab") y términos con
+# guion, incluido uno con una parte vacía y uno repetido en dos categorías
+OVERLAPPING_CATEGORIES = {
+    'letras': ['aa', 'a', 'aba', 'abab', 'b'],
+    'guiones': ['a-b', 'x - xx', 'ab-'],
+    'repetidos': ['aa', 'ba'],
+}
+OVERLAPPING_EQUIVALENCES = {
+    'aa': ['aa', 'AAA', 'a'],
+    'b': ['b', 'bb', 'bab'],
+}
+
+
+@pytest.mark.parametrize('text', [
+    'aaaaaaa',
+    'abababab',
+    'babababbab',
+    'x xx xxx xxxx',
+    'aa-b ab- abab-aba',
+    '',
+    'AAAA BBB aBa',
+    'sin coincidencias',
+])
+def test_overlapping_terms_equal_str_count(text):
+    matcher = TermMatcher(OVERLAPPING_CATEGORIES, OVERLAPPING_EQUIVALENCES)
+    entries = [{'abstract': text}]
+    assert matcher_frequency(matcher, entries) == \
+        reference_frequency(entries, OVERLAPPING_CATEGORIES, OVERLAPPING_EQUIVALENCES)
+
+
+def test_overlapping_terms_over_many_abstracts():
+    matcher = TermMatcher(OVERLAPPING_CATEGORIES, OVERLAPPING_EQUIVALENCES)
+    texts = ['aaaaaaa', 'abababab', 'babab', 'x xx xxx', 'ab-ab', 'aab baa']
+    entries = [{'abstract': texts[i % len(texts)] * (1 + i % 3)} for i in range(30)] + [{}]
+    assert matcher_frequency(matcher, entries) == \
+        reference_frequency(entries, OVERLAPPING_CATEGORIES, OVERLAPPING_EQUIVALENCES)
+
+
+def test_empty_corpus_equals_str_count():
+    assert FrequencyIndex.build(TERM_MATCHER, []).table() == reference_frequency([], CATEGORIES, EQUIVALENCES)
+    assert matcher_frequency(TERM_MATCHER, []) == reference_frequency([], CATEGORIES, EQUIVALENCES)
+
+
+def test_self_overlapping_taxonomy_terms():
+    # "programmingprogramming" y "sem sem sem SEMSEM" del fixture, más repeticiones largas
+    entries = make_entries(8) + [{'abstract': 'semsemsem sem-sem ' * 5}, {'abstract': 'scratchscratchjr ' * 3}]
+    assert matcher_frequency(TERM_MATCHER, entries) == \
+        reference_frequency(entries, CATEGORIES, EQUIVALENCES)